@@ -0,0 +1,131 @@
+# backend/analytics.py
+# Progression analytics (top set, estimated 1RM, tonnage, PRs) read from the
+# exercise_session_stats rollup, which triggers keep up to date as sets are
+# completed (see migrations/0006_exercise_session_stats.sql). All
+# aggregation and PR detection is done in SQL over the rollup rows.
+import datetime
+
+# Estimated 1RM formulas, mapped to their rollup column
+E1RM_FORMULAS = {"epley": "e1rm_epley", "brzycki": "e1rm_brzycki"}
+
+
+def parse_date_range(args):
+    """
+    Parses the optional ?from=YYYY-MM-DD&to=YYYY-MM-DD query arguments (both
+    inclusive) into (start, end) start_time bounds, end being exclusive.
+    Raises ValueError for malformed dates.
+    """
+    start = args.get("from")
+    end = args.get("to")
+    if start:
+        start = datetime.date.fromisoformat(start).isoformat()
+    if end:
+        end = (datetime.date.fromisoformat(end) + datetime.timedelta(days=1)).isoformat()
+    return start or None, end or None
+
+
+def get_exercise_progress(
+    query_db_func, user_id, exercise_id, start=None, end=None, formula="epley"
+):
+    """
+    Returns one row per session of a user's exercise within [start, end):
+    top set, both 1RM estimates, tonnage and whether the session set a new
+    best estimated 1RM (is_pr) compared with every earlier session.
+    """
+    e1rm_column = E1RM_FORMULAS[formula]
+
+    # The best estimate before the range (prior_best) seeds the running best
+    # inside it (window_best), so PRs are judged against the whole history.
+    # MAX(COALESCE(a, b), COALESCE(b, a)) is the larger of the two, ignoring
+    # NULLs; the first session ever has no previous best and is not a PR.
+    return query_db_func(
+        f"""
+        SELECT
+            session_id,
+            start_time,
+            DATE(start_time) AS date,
+            top_weight,
+            top_reps,
+            e1rm_epley,
+            e1rm_brzycki,
+            tonnage,
+            total_reps,
+            set_count,
+            COALESCE(
+                {e1rm_column} > MAX(COALESCE(window_best, prior_best),
+                                    COALESCE(prior_best, window_best)),
+                0
+            ) AS is_pr
+        FROM (
+            SELECT
+                stats.*,
+                MAX(stats.{e1rm_column}) OVER (
+                    ORDER BY stats.start_time, stats.session_id
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ) AS window_best,
+                prior.prior_best
+            FROM exercise_session_stats stats,
+                 (
+                     SELECT MAX({e1rm_column}) AS prior_best
+                     FROM exercise_session_stats
+                     WHERE user_id = ? AND exercise_id = ?
+                       AND ? IS NOT NULL AND start_time < ?
+                 ) prior
+            WHERE stats.user_id = ?
+              AND stats.exercise_id = ?
+              AND (? IS NULL OR stats.start_time >= ?)
+              AND (? IS NULL OR stats.start_time < ?)
+        )
+        ORDER BY start_time, session_id
+    """,
+        (user_id, exercise_id, start, start, user_id, exercise_id, start, start, end, end),
+    )
+
+
+def get_stats(query_db_func, user_id, start=None, end=None, formula="epley"):
+    """
+    Returns a user's per exercise totals within [start, end): sessions,
+    sets, reps, tonnage, heaviest top set, best estimated 1RM and the number
+    of sessions that set a new best estimated 1RM.
+    """
+    e1rm_column = E1RM_FORMULAS[formula]
+
+    # PRs need each exercise's running best over its full history, which is
+    # a window over the rollup rows rather than over individual sets
+    return query_db_func(
+        f"""
+        SELECT
+            ranked.exercise_id,
+            e.title,
+            COUNT(*) AS sessions,
+            SUM(ranked.set_count) AS sets,
+            SUM(ranked.total_reps) AS reps,
+            SUM(ranked.tonnage) AS tonnage,
+            MAX(ranked.top_weight) AS top_weight,
+            MAX(ranked.{e1rm_column}) AS best_e1rm,
+            SUM(ranked.{e1rm_column} > ranked.previous_best) AS prs
+        FROM (
+            SELECT
+                exercise_id,
+                start_time,
+                set_count,
+                total_reps,
+                tonnage,
+                top_weight,
+                {e1rm_column},
+                MAX({e1rm_column}) OVER (
+                    PARTITION BY exercise_id
+                    ORDER BY start_time, session_id
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ) AS previous_best
+            FROM exercise_session_stats
+            WHERE user_id = ?
+              AND (? IS NULL OR start_time < ?)
+        ) ranked
+        JOIN exercise e ON ranked.exercise_id = e.id
+        WHERE ? IS NULL OR ranked.start_time >= ?
+        GROUP BY ranked.exercise_id, e.title
+        ORDER BY e.title
+    """,
+        (user_id, end, end, start, start),
+    )
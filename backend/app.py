@@ -1,209 +1,723 @@
-from flask import Flask, request, jsonify, g, render_template, redirect, url_for
-from .database import get_db, close_db, init_db, query_db, insert_db
-
-# Import the new openai_service module
-from . import openai_service
+# backend/app.py
+# The app is built by create_app(). Routes and CLI commands live on the
+# blueprint below, and create_app() registers it together with the
+# extensions (instrumentation, auth, backups, assets).
+import time
+
+# Set first, so STARTUP_PROFILE can report how long importing the app took
+_import_started = time.perf_counter()
+
+# Settings are read from the environment once, when each module is
+# imported, so a .env file must be loaded before anything else
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from flask import (
+    Blueprint,
+    Flask,
+    current_app,
+    request,
+    jsonify,
+    g,
+    render_template,
+    redirect,
+    url_for,
+    stream_with_context,
+)
+from .database import (
+    DATABASE,
+    get_db,
+    close_db,
+    init_db,
+    migrate_db,
+    query_db,
+    insert_db,
+)
+
+# Completed-session messages are generated in the background by message_worker
+from . import message_worker
+from . import reference_cache
+from . import instrumentation
+from . import analytics
+from . import personal_records
+from . import export
+from . import bulk_import
+from . import backup
+from . import auth
+from . import progression
+from . import assets
+from . import sync
+from . import synthetic
+from . import benchmark
+from . import catalog
 import click
+import cProfile
+import csv
 import datetime
+import io
+import json
+import os
+import pstats
 import sqlite3
+import sys
+
+# Print how long importing the app and create_app() took, with the slowest
+# calls of create_app(), in every process that creates the app (each
+# gunicorn worker, each CLI command)
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "") not in ("", "0")
+STARTUP_PROFILE_LINES = 15
+
+# Page size for /api/sessions/recent
+RECENT_SESSIONS_LIMIT = 10
+RECENT_SESSIONS_MAX_LIMIT = 100
+
+# cli_group=None registers the commands as `flask <command>`
+bp = Blueprint("main", __name__, cli_group=None)
+
+
+def create_app(test_config=None):
+    """Creates the app. test_config overrides app.config, e.g. OPENAI_CHAT_CLIENT."""
+    started = time.perf_counter()
+    profiler = cProfile.Profile() if STARTUP_PROFILE else None
+    if profiler is not None:
+        profiler.enable()
+
+    app = Flask(__name__)
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+
+    # Register database closing with the app
+    app.teardown_appcontext(close_db)
+
+    # Per-request SQL statement counts and timings (Server-Timing, /metrics)
+    instrumentation.init_app(app)
+
+    # Identifies the user of each request as g.user, see auth.py
+    auth.init_app(app)
 
-app = Flask(__name__)
+    # Scheduled database snapshots, see backup.py
+    backup.init_app(app)
 
-# Register database closing with the app
-app.teardown_appcontext(close_db)
+    # Fingerprinted, precompressed static files, linked with asset_url()
+    assets.init_app(app)
+
+    app.register_blueprint(bp)
+
+    # Bring an existing database up to date on startup. A missing database is
+    # left for init-db to create.
+    if os.path.exists(DATABASE):
+        with app.app_context():
+            migrate_db()
+
+    if profiler is not None:
+        profiler.disable()
+        _print_startup_profile(profiler, time.perf_counter() - started)
+    return app
+
+
+def _print_startup_profile(profiler, create_duration):
+    print(
+        f"Startup profile (pid {os.getpid()}): imported backend.app in "
+        f"{_import_duration * 1000:.1f} ms ({len(sys.modules)} modules loaded), "
+        f"create_app() in {create_duration * 1000:.1f} ms"
+    )
+    stats = pstats.Stats(profiler, stream=sys.stdout)
+    stats.sort_stats("cumulative").print_stats(STARTUP_PROFILE_LINES)
 
 
 # Add a command to initialize the database
 @click.command("init-db")
 def init_db_command():
-    """Clear the existing data and create new tables."""
+    """Create the tables if needed and apply pending migrations."""
     init_db()
     click.echo("Initialized the database.")
 
 
-app.cli.add_command(init_db_command)
+bp.cli.add_command(init_db_command)
 
 
-# --- Helper function to populate previous session data ---
-# Renamed function for consistency
-def populate_previous_session_data_for_session(session_id):
+@click.command("rebuild-prs")
+def rebuild_prs_command():
+    """Recompute the personal record index from the full workout history."""
+    db = get_db()
+    record_count = personal_records.rebuild_personal_records(db)
+    db.commit()
+    click.echo(f"Rebuilt {record_count} personal records.")
+
+
+bp.cli.add_command(rebuild_prs_command)
+
+
+@click.command("user-token")
+@click.argument("name")
+def user_token_command(name):
+    """Create a user if needed and print a new token for them."""
+    db = get_db()
+    user_id, token = auth.issue_token(db, name)
+    db.commit()
+    click.echo(f"User {name} (id {user_id}) token: {token}")
+    click.echo(f"Log in on a device by opening /login?token={token}")
+
+
+bp.cli.add_command(user_token_command)
+
+
+def get_cli_user_id(name):
+    """The id of the user named on the command line."""
+    user = query_db("SELECT id FROM user WHERE name = ?", (name,), one=True)
+    if user is None:
+        raise click.BadParameter(f"No user named {name}", param_hint="--user")
+    return user["id"]
+
+
+@click.command("export")
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(sorted(export.EXPORT_FORMATS)),
+    default="csv",
+    show_default=True,
+)
+@click.option("--since", help="Only sessions started at or after this time.")
+@click.option("--after-id", type=int, help="Only sets after this exercise_set id.")
+@click.option("--output", type=click.File("w"), default="-", help="Defaults to stdout.")
+@click.option("--user", "user_name", help="Only this user's history, defaults to every user.")
+def export_command(export_format, since, after_id, output, user_name):
+    """Stream the workout history as CSV or JSON Lines."""
+    try:
+        since = export.parse_since(since)
+    except ValueError:
+        raise click.BadParameter("expected YYYY-MM-DD[THH:MM:SS]", param_hint="--since")
+    user_id = get_cli_user_id(user_name) if user_name else None
+    last_set_id, chunks = export.generate_export(
+        get_db(), export_format, since, after_id, user_id
+    )
+    for chunk in chunks:
+        output.write(chunk)
+    # Pass this as --after-id next time to export only new sets
+    click.echo(f"Exported sets up to id {last_set_id}.", err=True)
+
+
+bp.cli.add_command(export_command)
+
+
+@click.command("import")
+@click.argument("input_file", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--format",
+    "import_format",
+    type=click.Choice(bulk_import.IMPORT_FORMATS),
+    help="Defaults to the file extension, csv otherwise.",
+)
+@click.option("--batch-size", type=int, help="Sets inserted per transaction.")
+@click.option("--user", "user_name", help="User the history belongs to.")
+def import_command(input_file, import_format, batch_size, user_name):
+    """Import workout history from a CSV or JSON Lines file."""
+    if import_format is None:
+        import_format = "jsonl" if input_file.name.endswith((".jsonl", ".ndjson")) else "csv"
+    if user_name:
+        user_id = get_cli_user_id(user_name)
+    else:
+        user = auth.get_default_user()
+        if user is None:
+            raise click.UsageError(
+                "--user is required when requests need a token, see DEFAULT_USER_ID."
+            )
+        user_id = user["id"]
+    try:
+        stats = bulk_import.import_records(
+            get_db(), user_id, bulk_import.iter_records(input_file, import_format), batch_size
+        )
+    except bulk_import.ImportBatchError as e:
+        if e.stats["exercises_created"]:
+            reference_cache.invalidate()
+        raise click.ClickException(
+            f"Database error importing history: {e}. {e.stats['inserted']} sets were "
+            "imported before it, run the import again to continue."
+        )
+    if stats["exercises_created"]:
+        reference_cache.invalidate()
+    for error in stats["errors"]:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+    click.echo(
+        f"Imported {stats['inserted']} sets ({stats['skipped']} already present, "
+        f"{stats['failed']} failed) and {stats['sessions_created']} sessions "
+        f"in {stats['seconds']}s, {stats['rows_per_second']} rows/s."
+    )
+
+
+bp.cli.add_command(import_command)
+
+
+@click.command("backup")
+def backup_command():
+    """Take a compressed snapshot of the database now."""
+    path = backup.create_snapshot()
+    click.echo(f"Wrote {path} ({os.path.getsize(path)} bytes).")
+
+
+bp.cli.add_command(backup_command)
+
+
+@click.command("restore")
+@click.argument("snapshot", required=False)
+@click.confirmation_option(prompt="Replace the database with the snapshot?")
+def restore_command(snapshot):
+    """Restore a snapshot, the newest one if none is given."""
+    if snapshot is None:
+        snapshots = backup.list_snapshots()
+        if not snapshots:
+            raise click.ClickException(f"No snapshots in {backup.BACKUP_DIR}.")
+        snapshot = snapshots[-1]
+    backup.restore_snapshot(get_db(), snapshot)
+    click.echo(f"Restored {snapshot}.")
+
+
+bp.cli.add_command(restore_command)
+
+
+@click.command("seed-synthetic")
+@click.option("--users", type=int, default=3, show_default=True)
+@click.option("--programs", type=int, default=4, show_default=True)
+@click.option("--years", type=float, default=3, show_default=True)
+@click.option("--seed", type=int, default=synthetic.SYNTHETIC_SEED, show_default=True)
+def seed_synthetic_command(users, programs, years, seed):
+    """Fill the database with generated sessions for load testing."""
+    started = datetime.datetime.now()
+    stats = synthetic.seed_synthetic(get_db(), users, programs, years, seed)
+    reference_cache.invalidate()
+    seconds = (datetime.datetime.now() - started).total_seconds()
+    click.echo(
+        f"Created {stats['sessions']} sessions with {stats['sets']} sets for "
+        f"{stats['users']} users in {stats['programs']} programs in {seconds:.1f}s."
+    )
+
+
+bp.cli.add_command(seed_synthetic_command)
+
+
+@click.command("benchmark")
+@click.option("--iterations", type=int, default=benchmark.BENCHMARK_ITERATIONS, show_default=True)
+@click.option("--warmup", type=int, default=benchmark.BENCHMARK_WARMUP, show_default=True)
+@click.option(
+    "--baseline",
+    type=click.Path(dir_okay=False),
+    default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "baseline.json"
+    ),
+    show_default="benchmarks/baseline.json",
+)
+@click.option("--save-baseline", is_flag=True, help="Write the results as the new baseline.")
+@click.option(
+    "--tolerance",
+    type=float,
+    default=benchmark.LATENCY_TOLERANCE,
+    show_default=True,
+    help="How much median latency may grow, 0.5 is 50%.",
+)
+def benchmark_command(iterations, warmup, baseline, save_baseline, tolerance):
+    """Benchmark every API route and compare with the baseline."""
+    db = get_db()
+    # The write routes write to the database, so it is checked before they run
+    if not synthetic.is_synthetic(db):
+        raise click.ClickException(
+            "The benchmark writes to the database and only runs on generated history, "
+            "create one with `flask init-db` and `flask seed-synthetic`."
+        )
+    baseline_results = None
+    if not save_baseline and os.path.exists(baseline):
+        baseline_results = benchmark.load_baseline(baseline)
+        dataset = benchmark.get_dataset(db)
+        if baseline_results["dataset"] != dataset:
+            raise click.ClickException(
+                f"The baseline was recorded on a different dataset ({baseline_results['dataset']}, "
+                f"this database has {dataset}), benchmark a database created with the default "
+                "`flask seed-synthetic`."
+            )
+
+    try:
+        # As user 1, the first user of the synthetic dataset
+        results = benchmark.run_benchmark(
+            current_app._get_current_object(), db, 1, iterations, warmup
+        )
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"{'route':<42} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}")
+    for name, route in results["routes"].items():
+        click.echo(
+            f"{name:<42} {route['p50_ms']:>9.2f} {route['p95_ms']:>9.2f} {route['queries']:>8}"
+        )
+
+    if save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+        benchmark.save_baseline(baseline, results)
+        click.echo(f"Saved the baseline to {baseline}.")
+        return
+    if baseline_results is None:
+        click.echo("No baseline to compare with, create one with --save-baseline.")
+        return
+
+    regressions = benchmark.compare(results, baseline_results, tolerance)
+    if regressions:
+        raise click.ClickException(
+            "Regressions against the baseline:\n" + "\n".join(regressions)
+        )
+    click.echo("No regressions against the baseline.")
+
+
+bp.cli.add_command(benchmark_command)
+
+
+# --- Helper function to materialize the sets for a new session ---
+def create_session_sets(session_id, day_id):
     """
-    Finds previous session data for exercises in the given session
-    and populates the new session's sets.
-    Assumes 'set_number' column in exercise_set is the set number (1, 2, ...).
+    Creates all warmup and working exercise_set rows for a new session in a
+    single INSERT ... SELECT driven by day_exercise/exercise, and returns the
+    created sets in the same shape as session_sets_created_info.
     """
-    db = get_db()  # Get database connection
+    db = get_db()
 
-    # Get the exercises for the newly created session (ordered by day_exercise.exercise_sequence)
-    session_exercises = query_db(
+    # set_numbers expands each exercise's warmup_sets/working_sets counts into
+    # rows 1..n, so no per-set round trips are needed. Rows are inserted in
+    # exercise_sequence order, warmups before working sets, so the generated
+    # ids follow the same order the old per-set loop produced.
+    db.execute(
         """
-        SELECT de.exercise_id, de.exercise_sequence
+        WITH RECURSIVE
+            set_numbers(n) AS (
+                SELECT 1
+                UNION ALL
+                SELECT n + 1 FROM set_numbers
+                WHERE n < (
+                    SELECT MAX(MAX(COALESCE(warmup_sets, 0), COALESCE(working_sets, 0)))
+                    FROM exercise
+                )
+            ),
+            set_types(set_type, type_order) AS (
+                VALUES ('warmup', 1), ('working', 2)
+            )
+        INSERT INTO exercise_set (session_id, exercise_id, set_number, set_type, weight, reps, completed)
+        SELECT ?, e.id, sn.n, st.set_type, NULL, NULL, FALSE
         FROM day_exercise de
-        JOIN session s ON de.day_id = s.day_id
-        WHERE s.id = ?
-        ORDER BY de.exercise_sequence
+        JOIN exercise e ON de.exercise_id = e.id
+        JOIN set_types st
+        JOIN set_numbers sn
+            ON sn.n <= CASE st.set_type
+                           WHEN 'warmup' THEN COALESCE(e.warmup_sets, 0)
+                           ELSE COALESCE(e.working_sets, 0)
+                       END
+        WHERE de.day_id = ?
+        ORDER BY de.exercise_sequence, de.id, st.type_order, sn.n
+    """,
+        (session_id, day_id),
+    )
+
+    created_sets = query_db(
+        """
+        SELECT id, exercise_id, set_type, set_number
+        FROM exercise_set
+        WHERE session_id = ?
+        ORDER BY id
     """,
         (session_id,),
     )
 
-    for session_exercise in session_exercises:
-        exercise_id = session_exercise["exercise_id"]
-        # exercise_sequence_in_day is not needed for set matching
+    return [dict(s) for s in created_sets]
 
-        # Find the most recent previous session ID for this exercise
-        # Join exercise_set with session and order sessions by start_time descending.
-        # Exclude the current session.
-        last_session = query_db(
-            """
-            SELECT es.session_id
+
+# --- Helper function to populate previous session data ---
+# Renamed function for consistency
+def populate_previous_session_data_for_session(
+    session_id, program_id, day_exercises, session_sets
+):
+    """
+    Prescribes the weight and reps of a new session's sets. Working sets
+    follow the program's progression rules (see progression.py); other sets,
+    and exercises without an applicable rule, repeat the previous session.
+    day_exercises are the day's day_exercise rows in sequence order and
+    session_sets the rows returned by create_session_sets.
+    Assumes 'set_number' column in exercise_set is the set number (1, 2, ...).
+    Runs at most two queries plus the update, whatever the rules or history.
+    """
+    db = get_db()  # Get database connection
+    rules = progression.get_program_rules(query_db, program_id)
+
+    # Resolve the sets of the most recent previous sessions for every
+    # exercise in this session in one windowed query. Sessions are ranked per
+    # exercise by start_time (id breaks ties), so rank 1 is the last time
+    # that exercise was performed; the rules ask for up to rules.lookback
+    # sessions. Only the same user's sessions count and the current session
+    # is excluded.
+    previous_sets = query_db(
+        """
+        WITH ranked_sets AS (
+            SELECT
+                es.exercise_id,
+                es.set_type,
+                es.set_number,
+                es.weight,
+                es.reps,
+                es.completed,
+                es.id,
+                DENSE_RANK() OVER (
+                    PARTITION BY es.exercise_id
+                    ORDER BY s.start_time DESC, s.id DESC
+                ) AS session_rank
             FROM exercise_set es
             JOIN session s ON es.session_id = s.id
-            WHERE es.exercise_id = ? AND s.id != ? -- Exclude current session
-            ORDER BY s.start_time DESC
-            LIMIT 1
-        """,
-            (exercise_id, session_id),
-            one=True,
+            WHERE es.session_id != ?
+              AND s.user_id = (SELECT user_id FROM session WHERE id = ?)
+              AND es.exercise_id IN (
+                  SELECT exercise_id FROM exercise_set WHERE session_id = ?
+              )
         )
+        SELECT exercise_id, set_type, set_number, weight, reps, completed, session_rank
+        FROM ranked_sets
+        WHERE session_rank <= ?
+        ORDER BY id
+    """,
+        (session_id, session_id, session_id, rules.lookback),
+    )
 
-        if last_session:
-            last_session_id = last_session["session_id"]
-
-            # Get all set data for this exercise from that last session, ordered by set number
-            # Renamed variable for consistency
-            last_session_sets = query_db(
+    # Key the previous session's sets by (exercise_id, set_type, set_number)
+    # so matching a current set is a dict lookup rather than a scan, and
+    # group working sets per exercise and session for the rules
+    previous_by_key = {}
+    working_sets_by_exercise = {}  # exercise_id -> [[sets of rank 1], [rank 2], ...]
+    for prev_set in previous_sets:
+        if prev_set["session_rank"] == 1:
+            previous_by_key[
+                (prev_set["exercise_id"], prev_set["set_type"], prev_set["set_number"])
+            ] = prev_set
+        if prev_set["set_type"] == "working":
+            sessions = working_sets_by_exercise.setdefault(prev_set["exercise_id"], [])
+            while len(sessions) < prev_set["session_rank"]:
+                sessions.append([])
+            sessions[prev_set["session_rank"] - 1].append(prev_set)
+
+    # Best estimated 1RM and session count per exercise, from the rollup
+    rollups = {}
+    if rules.needs_e1rm:
+        rollups = {
+            row["exercise_id"]: row
+            for row in query_db(
                 """
-                SELECT set_number, set_type, weight, reps
-                FROM exercise_set
-                WHERE session_id = ? AND exercise_id = ?
-                ORDER BY set_number -- Order by set number
+                SELECT exercise_id, MAX(e1rm_epley) AS best_e1rm, COUNT(*) AS session_count
+                FROM exercise_session_stats
+                WHERE user_id = (SELECT user_id FROM session WHERE id = ?)
+                  AND exercise_id IN (SELECT value FROM json_each(?))
+                GROUP BY exercise_id
             """,
-                (last_session_id, exercise_id),
+                (
+                    session_id,
+                    json.dumps([de["exercise_id"] for de in day_exercises]),
+                ),
             )
+        }
+
+    # One prescription per exercise, from the rules of its first
+    # day_exercise (a day can list an exercise twice)
+    prescriptions = {}
+    for day_exercise in day_exercises:
+        exercise_id = day_exercise["exercise_id"]
+        if exercise_id in prescriptions:
+            continue
+        rollup = rollups.get(exercise_id)
+        history = progression.ExerciseHistory(
+            working_sets_by_exercise.get(exercise_id, []),
+            rollup["best_e1rm"] if rollup else None,
+            rollup["session_count"] if rollup else 0,
+        )
+        prescriptions[exercise_id] = progression.prescribe(
+            rules.for_day_exercise(day_exercise["id"]), history
+        )
+
+    updates = []
+    for current_set in session_sets:
+        prescription = prescriptions.get(current_set["exercise_id"])
+        if prescription is not None and current_set["set_type"] == "working":
+            weight, reps = prescription(current_set["set_number"])
+            updates.append((weight, reps, current_set["id"]))
+            continue
+        prev_set = previous_by_key.get(
+            (current_set["exercise_id"], current_set["set_type"], current_set["set_number"])
+        )
+        if prev_set is None:
+            continue
+        if prev_set["weight"] is None and prev_set["reps"] is None:
+            continue
+        updates.append((prev_set["weight"], prev_set["reps"], current_set["id"]))
 
-            # Get the sets for the *current* session's exercise
-            current_session_sets = query_db(
+    if updates:
+        try:
+            # A NULL value leaves the current value untouched
+            db.executemany(
                 """
-                SELECT id, set_number, set_type, weight, reps
-                FROM exercise_set
-                WHERE session_id = ? AND exercise_id = ?
+                UPDATE exercise_set
+                SET weight = COALESCE(?, weight),
+                    reps = COALESCE(?, reps)
+                WHERE id = ?
             """,
-                (session_id, exercise_id),
+                updates,
             )
-
-            # Now, iterate through the previous sets and update the matching current sets
-            for prev_set in last_session_sets:  # Renamed variable
-                # Find the matching set in the current session by set type and set number
-                matching_current_set = next(
-                    (
-                        item
-                        for item in current_session_sets
-                        if item["set_type"] == prev_set["set_type"]
-                        and item["set_number"] == prev_set["set_number"]
-                    ),
-                    None,
-                )
-
-                if matching_current_set:
-                    # Found a match, update the weight and reps in the current session's set
-                    update_fields = {}
-                    if prev_set["weight"] is not None:
-                        # Apply progressive overload here if desired
-                        # For now, just copy the previous weight
-                        update_fields["weight"] = prev_set["weight"]
-                        # Example Progressive Overload:
-                        # if prev_set['set_type'] == 'working':
-                        #     # Ensure previous weight is treated as a number (handle None/zero)
-                        #     update_fields['weight'] = (prev_set['weight'] or 0) + 2.5 # Add 2.5kg
-
-                    if prev_set["reps"] is not None:
-                        # For now, just copy the previous reps
-                        update_fields["reps"] = prev_set["reps"]
-
-                    if update_fields:
-                        try:
-                            # Update the database for this specific set
-                            update_query = (
-                                "UPDATE exercise_set SET "
-                                + ", ".join(
-                                    [f"{field} = ?" for field in update_fields.keys()]
-                                )
-                                + " WHERE id = ?"
-                            )
-                            update_args = list(update_fields.values()) + [
-                                matching_current_set["id"]
-                            ]
-                            db.execute(update_query, update_args)
-                            # No commit here, commit will be done in create_session after populating all exercises
-
-                        except sqlite3.Error as e:
-                            print(
-                                f"Database error updating set {matching_current_set['id']}: {e}"
-                            )
-                            # Handle error as appropriate for your app
+            # No commit here, commit will be done in create_session
+        except sqlite3.Error as e:
+            print(f"Database error populating sets for session {session_id}: {e}")
+            # Handle error as appropriate for your app
 
     # db.commit() is handled by the caller (create_session)
     # db connection is managed by Flask's appcontext teardown
-    pass  # Helper function finishes
+
+
+# --- Helper function to load a whole session in one query ---
+def get_session_bundle(session_id, user_id):
+    """
+    Loads a session, its exercises in day order and the sets of every
+    exercise in a single query. Returns None if the session does not exist
+    or belongs to another user.
+    """
+    rows = query_db(
+        """
+        SELECT
+            s.id AS session_id,
+            s.start_time AS session_start_time,
+            s.day_id,
+            de.exercise_sequence,
+            e.id AS exercise_id,
+            e.title,
+            e.warmup_sets,
+            e.working_sets,
+            es.id AS set_id,
+            es.set_number,
+            es.set_type,
+            es.weight,
+            es.reps,
+            es.completed,
+            es.start_time,
+            es.end_time,
+            (SELECT COALESCE(MAX(seq), 0) FROM sync_change) AS sync_seq
+        FROM session s
+        LEFT JOIN day_exercise de ON de.day_id = s.day_id
+        LEFT JOIN exercise e ON de.exercise_id = e.id
+        LEFT JOIN exercise_set es ON es.session_id = s.id AND es.exercise_id = e.id
+        WHERE s.id = ? AND s.user_id = ?
+        ORDER BY de.exercise_sequence, de.id, es.set_number, es.id
+    """,
+        (session_id, user_id),
+    )
+    if not rows:
+        return None
+
+    # Exercises keep the same fields as /api/session/<id>/exercises, plus the
+    # exercise details and sets served by /api/session/<id>/exercise/<id>
+    exercises = {}
+    for row in rows:
+        if row["exercise_id"] is None:
+            continue  # The session's day has no exercises
+        exercise = exercises.get(row["exercise_id"])
+        if exercise is None:
+            exercise = exercises[row["exercise_id"]] = {
+                "exercise_id": row["exercise_id"],
+                "title": row["title"],
+                "exercise_sequence": row["exercise_sequence"],
+                "warmup_sets": row["warmup_sets"],
+                "working_sets": row["working_sets"],
+                "sets": [],
+                "_set_ids": set(),
+            }
+        # A day listing the same exercise twice joins its sets twice
+        if row["set_id"] is not None and row["set_id"] not in exercise["_set_ids"]:
+            exercise["_set_ids"].add(row["set_id"])
+            exercise["sets"].append(
+                {
+                    "id": row["set_id"],
+                    "session_id": session_id,
+                    "exercise_id": row["exercise_id"],
+                    "set_number": row["set_number"],
+                    "set_type": row["set_type"],
+                    "weight": row["weight"],
+                    "reps": row["reps"],
+                    "completed": row["completed"],
+                    "start_time": row["start_time"],
+                    "end_time": row["end_time"],
+                }
+            )
+
+    for exercise in exercises.values():
+        del exercise["_set_ids"]
+
+    return {
+        "session": {
+            "id": rows[0]["session_id"],
+            "start_time": rows[0]["session_start_time"],
+            "day_id": rows[0]["day_id"],
+        },
+        "exercises": list(exercises.values()),
+        # Read with the rows, so GET /api/sync?since=<sync_seq> returns
+        # exactly the changes made after the bundle was loaded
+        "sync_seq": rows[0]["sync_seq"],
+    }
 
 
 # --- Routes to serve HTML pages ---
 
 
-@app.route("/")
+@bp.route("/")
 def index():
     return render_template("index.html")
 
 
 # Route for starting a session (unchanged)
-@app.route("/start-session")
+@bp.route("/start-session")
 def start_session_page():
     return render_template("start_session.html")
 
 
-# Route for viewing exercises within a session (unchanged)
-@app.route("/session/<int:session_id>/exercises")
+# Route for viewing exercises within a session
+# The session bundle is inlined into the page so it renders without fetching
+@bp.route("/session/<int:session_id>/exercises")
 def session_exercises_page(session_id):
-    session = query_db("SELECT id FROM session WHERE id = ?", (session_id,), one=True)
-    if session is None:
+    session_bundle = get_session_bundle(session_id, g.user["id"])
+    if session_bundle is None:
         return "Session not found", 404
-    return render_template("session_exercises.html")
+    return render_template("session_exercises.html", session_bundle=session_bundle)
 
 
-# Route for viewing a specific exercise within a session (unchanged)
-@app.route("/session/<int:session_id>/exercise/<int:exercise_id>")
+# Route for viewing a specific exercise within a session
+# The session bundle is inlined into the page so it renders without fetching
+@bp.route("/session/<int:session_id>/exercise/<int:exercise_id>")
 def exercise_detail_page(session_id, exercise_id):
-    session = query_db("SELECT id FROM session WHERE id = ?", (session_id,), one=True)
-    if session is None:
+    session_bundle = get_session_bundle(session_id, g.user["id"])
+    if session_bundle is None:
         return "Session not found", 404
 
-    exercise_in_session = query_db(
-        """
-         SELECT de.exercise_id
-         FROM day_exercise de
-         JOIN session s ON de.day_id = s.day_id
-         WHERE s.id = ? AND de.exercise_id = ?
-     """,
-        (session_id, exercise_id),
-        one=True,
-    )
-
-    if exercise_in_session is None:
+    if not any(
+        exercise["exercise_id"] == exercise_id
+        for exercise in session_bundle["exercises"]
+    ):
         return "Exercise not found in this session", 404
 
-    return render_template("exercise_detail.html")
+    return render_template("exercise_detail.html", session_bundle=session_bundle)
 
 
 # Route for workout complete page, accepting session_id
 # Renamed from /workout-complete
-@app.route("/session/<int:session_id>/complete")
+@bp.route("/session/<int:session_id>/complete")
 def session_complete_page(session_id):
     # Optionally check if session exists and is completed before rendering
-    session = query_db("SELECT id FROM session WHERE id = ?", (session_id,), one=True)
+    session = query_db(
+        "SELECT id FROM session WHERE id = ? AND user_id = ?",
+        (session_id, g.user["id"]),
+        one=True,
+    )
     if session is None:
         return "Session not found", 404
 
-    # Could add logic here to mark session as completed in DB if desired
+    # The session is complete, start generating its message in the background
+    # so it is usually ready by the time workout_complete.js asks for it
+    message_worker.request_session_message(g.user["name"], session_id)
 
     return render_template(
         "workout_complete.html", session_id=session_id
@@ -213,25 +727,134 @@ def session_complete_page(session_id):
 # --- API Endpoints ---
 
 
-# Get all programs (unchanged)
-@app.route("/api/programs", methods=["GET"])
+def reference_response(key, loader, not_found_error):
+    """
+    Serves reference data through reference_cache with a strong ETag.
+    Conditional requests whose If-None-Match matches get a 304, and cache hits
+    are answered without touching the database. Clients must revalidate
+    (Cache-Control: no-cache), so edits show up on the next request.
+    """
+    entry = reference_cache.get(key, loader)
+    if entry is None:
+        return jsonify({"error": not_found_error}), 404
+    return cached_json_response(*entry)
+
+
+def cached_json_response(body, etag):
+    """A serialized JSON body with its ETag, or a 304 if the client already has it."""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+# Get all programs the user can see: their own and the shared ones
+@bp.route("/api/programs", methods=["GET"])
 def get_programs():
-    programs = query_db("SELECT * FROM program")
-    return jsonify([dict(p) for p in programs])
+    user_id = g.user["id"]
+
+    def load_programs():
+        programs = query_db(
+            "SELECT * FROM program WHERE user_id IS NULL OR user_id = ?", (user_id,)
+        )
+        return [dict(p) for p in programs]
+
+    return reference_response(("programs", user_id), load_programs, "No programs found")
 
 
-# Get days for a specific program (unchanged)
-@app.route("/api/program/<int:program_id>/days", methods=["GET"])
+# Get days for a specific program
+@bp.route("/api/program/<int:program_id>/days", methods=["GET"])
 def get_days_for_program(program_id):
-    days = query_db("SELECT * FROM day WHERE program_id = ?", (program_id,))
-    if not days:
-        return jsonify({"error": "Program not found or has no days"}), 404
-    return jsonify([dict(d) for d in days])
+    user_id = g.user["id"]
+
+    def load_days():
+        days = query_db(
+            """
+            SELECT d.*
+            FROM day d
+            JOIN program p ON d.program_id = p.id
+            WHERE d.program_id = ? AND (p.user_id IS NULL OR p.user_id = ?)
+        """,
+            (program_id, user_id),
+        )
+        return [dict(d) for d in days] or None
+
+    return reference_response(
+        ("program_days", user_id, program_id),
+        load_days,
+        "Program not found or has no days",
+    )
+
+
+# Exercise autocomplete, see catalog.py
+# ?q= is what the user has typed so far, every word matched as a prefix.
+# Without q the user's most trained exercises are returned.
+@bp.route("/api/exercises/search", methods=["GET"])
+def search_exercises():
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", catalog.EXERCISE_SEARCH_LIMIT, type=int)
+    if not 1 <= limit <= catalog.EXERCISE_SEARCH_MAX_LIMIT:
+        return (
+            jsonify(
+                {"error": f"limit must be between 1 and {catalog.EXERCISE_SEARCH_MAX_LIMIT}"}
+            ),
+            400,
+        )
+    return cached_json_response(*catalog.search(query_db, g.user["id"], query, limit))
+
+
+# Add an exercise to the catalog: {"title", "warmup_sets"?, "working_sets"?}
+@bp.route("/api/exercises", methods=["POST"])
+def create_exercise():
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    title = " ".join(str(data.get("title") or "").split())
+    if not title:
+        return jsonify({"error": "Missing title"}), 400
+    sets = {}
+    for field in ("warmup_sets", "working_sets"):
+        value = data.get(field, 0 if field == "warmup_sets" else 3)
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 10:
+            return jsonify({"error": f"{field} must be a whole number from 0 to 10"}), 400
+        sets[field] = value
+
+    db = get_db()
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        existing = db.execute(
+            "SELECT id FROM exercise WHERE title = ? COLLATE NOCASE", (title,)
+        ).fetchone()
+        if existing:
+            db.rollback()
+            return (
+                jsonify({"error": "Exercise already exists", "id": existing["id"]}),
+                409,
+            )
+        exercise_id = db.execute(
+            "INSERT INTO exercise (title, warmup_sets, working_sets) VALUES (?, ?, ?)",
+            (title, sets["warmup_sets"], sets["working_sets"]),
+        ).lastrowid
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"Database error creating exercise: {e}")
+        return jsonify({"error": "Database error creating exercise"}), 500
+
+    # The insert bumped reference_generation; drop this process's caches now
+    # rather than on the next generation check
+    reference_cache.invalidate()
+    catalog.invalidate()
+    return jsonify({"id": exercise_id, "title": title, **sets}), 201
 
 
 # Create a new session (calls renamed helper function)
 # Renamed sets_created_info to session_sets_created_info for consistency
-@app.route("/api/sessions", methods=["POST"])
+@bp.route("/api/sessions", methods=["POST"])
 def create_session():
     data = request.json
     day_id = data.get("day_id")
@@ -239,7 +862,16 @@ def create_session():
     if not day_id:
         return jsonify({"error": "Missing day_id"}), 400
 
-    day = query_db("SELECT * FROM day WHERE id = ?", (day_id,), one=True)
+    day = query_db(
+        """
+        SELECT d.*
+        FROM day d
+        JOIN program p ON d.program_id = p.id
+        WHERE d.id = ? AND (p.user_id IS NULL OR p.user_id = ?)
+    """,
+        (day_id, g.user["id"]),
+        one=True,
+    )
     if not day:
         return jsonify({"error": "Day not found"}), 404
 
@@ -247,74 +879,27 @@ def create_session():
 
     try:
         # Create the session
-        cursor = db.execute("INSERT INTO session (day_id) VALUES (?)", (day_id,))
+        cursor = db.execute(
+            "INSERT INTO session (day_id, user_id) VALUES (?, ?)", (day_id, g.user["id"])
+        )
         session_id = cursor.lastrowid
 
-        # Get the exercises for this day, in their correct sequence (day_exercise.exercise_sequence)
+        # Materialize every warmup/working set for the day in one statement
+        session_sets_created_info = create_session_sets(session_id, day_id)
+
         day_exercises = query_db(
-            "SELECT exercise_id, exercise_sequence FROM day_exercise WHERE day_id = ? ORDER BY exercise_sequence",
+            "SELECT id, exercise_id FROM day_exercise WHERE day_id = ? ORDER BY exercise_sequence, id",
             (day_id,),
         )
 
-        session_sets_created_info = []  # Renamed variable
-
-        for day_exercise in day_exercises:
-            exercise_id = day_exercise["exercise_id"]
-            exercise = query_db(
-                "SELECT * FROM exercise WHERE id = ?", (exercise_id,), one=True
-            )
-
-            if exercise:
-                for i in range(exercise["warmup_sets"] or 0):
-                    set_number = i + 1
-                    set_id = db.execute(
-                        """INSERT INTO exercise_set (session_id, exercise_id, set_number, set_type, weight, reps, completed)
-                                         VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                        (
-                            session_id,
-                            exercise_id,
-                            set_number,
-                            "warmup",
-                            None,
-                            None,
-                            False,
-                        ),
-                    ).lastrowid
-                    session_sets_created_info.append(
-                        {
-                            "id": set_id,
-                            "exercise_id": exercise_id,
-                            "set_type": "warmup",
-                            "set_number": set_number,
-                        }
-                    )
-
-                for i in range(exercise["working_sets"] or 0):
-                    set_number = i + 1
-                    set_id = db.execute(
-                        """INSERT INTO exercise_set (session_id, exercise_id, set_number, set_type, weight, reps, completed)
-                                         VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                        (
-                            session_id,
-                            exercise_id,
-                            set_number,
-                            "working",
-                            None,
-                            None,
-                            False,
-                        ),
-                    ).lastrowid
-                    session_sets_created_info.append(
-                        {
-                            "id": set_id,
-                            "exercise_id": exercise_id,
-                            "set_type": "working",
-                            "set_number": set_number,
-                        }
-                    )
+        # Prescribe weights and reps from the progression rules and the
+        # previous sessions, using the renamed helper
+        populate_previous_session_data_for_session(
+            session_id, day["program_id"], day_exercises, session_sets_created_info
+        )
 
-        # Populate with previous session data using the renamed helper
-        populate_previous_session_data_for_session(session_id)
+        # Lets the client open the first exercise without another request
+        first_exercise_id = day_exercises[0]["exercise_id"] if day_exercises else None
 
         db.commit()
 
@@ -323,6 +908,7 @@ def create_session():
                 {
                     "message": "Session created",
                     "session_id": session_id,
+                    "first_exercise_id": first_exercise_id,
                     "session_sets_created_info": session_sets_created_info,
                 }
             ),
@@ -337,34 +923,60 @@ def create_session():
         pass
 
 
-# Get exercises for a specific session (unchanged, uses correct names)
-@app.route("/api/session/<int:session_id>/exercises", methods=["GET"])
+# Get exercises for a specific session
+# A session's day never changes, so the list is cached like the reference data
+@bp.route("/api/session/<int:session_id>/exercises", methods=["GET"])
 def get_exercises_for_session(session_id):
-    session = query_db(
-        "SELECT day_id FROM session WHERE id = ?", (session_id,), one=True
-    )
-    if not session:
-        return jsonify({"error": "Session not found"}), 404
+    user_id = g.user["id"]
 
-    day_id = session["day_id"]
+    def load_session_exercises():
+        session = query_db(
+            "SELECT day_id FROM session WHERE id = ? AND user_id = ?",
+            (session_id, user_id),
+            one=True,
+        )
+        if not session:
+            return None
 
-    day_exercises = query_db(
-        """
-        SELECT de.exercise_id, e.title, de.exercise_sequence
-        FROM day_exercise de
-        JOIN exercise e ON de.exercise_id = e.id
-        WHERE de.day_id = ?
-        ORDER BY de.exercise_sequence
-    """,
-        (day_id,),
+        day_exercises = query_db(
+            """
+            SELECT de.exercise_id, e.title, de.exercise_sequence
+            FROM day_exercise de
+            JOIN exercise e ON de.exercise_id = e.id
+            WHERE de.day_id = ?
+            ORDER BY de.exercise_sequence
+        """,
+            (session["day_id"],),
+        )
+        return [dict(de) for de in day_exercises]
+
+    return reference_response(
+        ("session_exercises", user_id, session_id),
+        load_session_exercises,
+        "Session not found",
     )
 
-    return jsonify([dict(de) for de in day_exercises])
+
+# Get a whole session in one request: its exercises in order with every set
+@bp.route("/api/session/<int:session_id>/bundle", methods=["GET"])
+def get_session_bundle_api(session_id):
+    session_bundle = get_session_bundle(session_id, g.user["id"])
+    if session_bundle is None:
+        return jsonify({"error": "Session not found"}), 404
+    return jsonify(session_bundle)
 
 
 # Get details and sets for a specific exercise within a session (unchanged, uses correct names)
-@app.route("/api/session/<int:session_id>/exercise/<int:exercise_id>", methods=["GET"])
+@bp.route("/api/session/<int:session_id>/exercise/<int:exercise_id>", methods=["GET"])
 def get_session_exercise_details_api(session_id, exercise_id):
+    session = query_db(
+        "SELECT id FROM session WHERE id = ? AND user_id = ?",
+        (session_id, g.user["id"]),
+        one=True,
+    )
+    if session is None:
+        return jsonify({"error": "Session not found"}), 404
+
     exercise = query_db("SELECT * FROM exercise WHERE id = ?", (exercise_id,), one=True)
     if not exercise:
         return jsonify({"error": "Exercise not found"}), 404
@@ -382,30 +994,45 @@ def get_session_exercise_details_api(session_id, exercise_id):
     return jsonify({"exercise": dict(exercise), "sets": [dict(s) for s in sets]})
 
 
-# Update a set (unchanged, uses correct table name)
-@app.route("/api/sets/<int:set_id>", methods=["PUT"])
-def update_set(set_id):
-    data = request.json
+def parse_set_update(data):
+    """
+    Validates the weight/reps/completed fields of a set update.
+    Returns (update_fields, error); error is None when the update is valid.
+    An empty string or null clears weight/reps.
+    """
     update_fields = {}
     if "weight" in data:
         try:
             update_fields["weight"] = (
-                float(data["weight"]) if data["weight"] != "" else None
+                float(data["weight"]) if data["weight"] not in ("", None) else None
             )
-        except ValueError:
-            return jsonify({"error": "Invalid weight value"}), 400
+        except (TypeError, ValueError):
+            return None, "Invalid weight value"
 
     if "reps" in data:
         try:
-            update_fields["reps"] = int(data["reps"]) if data["reps"] != "" else None
-        except ValueError:
-            return jsonify({"error": "Invalid reps value"}), 400
+            update_fields["reps"] = (
+                int(data["reps"]) if data["reps"] not in ("", None) else None
+            )
+        except (TypeError, ValueError):
+            return None, "Invalid reps value"
 
     if "completed" in data:
         update_fields["completed"] = bool(data["completed"])
 
     if not update_fields:
-        return jsonify({"error": "No fields to update"}), 400
+        return None, "No fields to update"
+
+    return update_fields, None
+
+
+# Update a set (unchanged, uses correct table name)
+@bp.route("/api/sets/<int:set_id>", methods=["PUT"])
+def update_set(set_id):
+    data = request.json
+    update_fields, error = parse_set_update(data)
+    if error:
+        return jsonify({"error": error}), 400
 
     query = (
         "UPDATE exercise_set SET "
@@ -416,65 +1043,434 @@ def update_set(set_id):
 
     db = get_db()
     try:
-        cursor = db.execute(query, args)
-        db.commit()
-        row_count = cursor.rowcount
-        cursor.close()
-
-        if row_count == 0:
+        # Sets of other users' sessions are not found
+        previous = personal_records.get_set_before_update(db, set_id, g.user["id"])
+        if previous is None:
+            db.rollback()
             return jsonify({"error": "Set not found"}), 404
 
-        return jsonify({"message": "Set updated"})
+        db.execute(query, args)
+
+        # Check the set against the PR index in the same transaction
+        personal_record = personal_records.record_set_update(db, set_id, previous)
+        db.commit()
+
+        return jsonify({"message": "Set updated", "personal_record": personal_record})
     except sqlite3.Error as e:
         db.rollback()
         print(f"Database error updating set {set_id}: {e}")
         return jsonify({"error": "Database error updating set"}), 500
 
 
-# Get recent sessions (unchanged, uses correct names)
-@app.route("/api/sessions/recent", methods=["GET"])
+# Update many sets in one transaction
+# Takes an array of {"id": <set id>, "weight"?, "reps"?, "completed"?} and
+# returns one result per item, in the same order
+@bp.route("/api/sets", methods=["PATCH"])
+def update_sets():
+    data = request.json
+    if not isinstance(data, list):
+        return jsonify({"error": "Expected an array of set updates"}), 400
+
+    results = []
+    valid_updates = []  # (result, set_id, update_fields)
+    for item in data:
+        set_id = item.get("id") if isinstance(item, dict) else None
+        if not isinstance(set_id, int) or isinstance(set_id, bool):
+            results.append({"id": set_id, "status": 400, "error": "Invalid set id"})
+            continue
+        update_fields, error = parse_set_update(item)
+        result = {"id": set_id}
+        results.append(result)
+        if error:
+            result.update({"status": 400, "error": error})
+            continue
+        valid_updates.append((result, set_id, update_fields))
+
+    if not valid_updates:
+        return jsonify({"results": results})
+
+    db = get_db()
+    try:
+        # Check which of the user's sets exist up front so each item gets
+        # its own 404, reading the fields the PR index needs before the update
+        previous_sets = {
+            row["id"]: row
+            for row in query_db(
+                """
+                SELECT es.id, es.set_type, es.weight, es.reps, es.completed
+                FROM exercise_set es
+                JOIN session s ON es.session_id = s.id
+                WHERE es.id IN (SELECT value FROM json_each(?))
+                  AND s.user_id = ?
+            """,
+                (json.dumps([set_id for _, set_id, _ in valid_updates]), g.user["id"]),
+            )
+        }
+
+        # Items updating the same fields share one statement, so the whole
+        # batch is a handful of executemany calls and a single commit
+        updates_by_fields = {}
+        for result, set_id, update_fields in valid_updates:
+            if set_id not in previous_sets:
+                result.update({"status": 404, "error": "Set not found"})
+                continue
+            updates_by_fields.setdefault(tuple(update_fields.keys()), []).append(
+                list(update_fields.values()) + [set_id]
+            )
+            result["status"] = 200
+
+        for fields, args in updates_by_fields.items():
+            db.executemany(
+                "UPDATE exercise_set SET "
+                + ", ".join([f"{field} = ?" for field in fields])
+                + " WHERE id = ?",
+                args,
+            )
+
+        # Check each updated set against the PR index, once per set even if
+        # the batch updates it more than once
+        set_personal_records = {}
+        for result, set_id, _ in valid_updates:
+            if result["status"] == 200:
+                if set_id not in set_personal_records:
+                    set_personal_records[set_id] = personal_records.record_set_update(
+                        db, set_id, previous_sets[set_id]
+                    )
+                result["personal_record"] = set_personal_records[set_id]
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"Database error updating sets: {e}")
+        return jsonify({"error": "Database error updating sets"}), 500
+
+    return jsonify({"results": results})
+
+
+# Offline sync, see sync.py
+# Returns the user's sessions and sets changed after ?since=<seq>. Pass the
+# returned seq as since next time; when more is true another page is waiting.
+@bp.route("/api/sync", methods=["GET"])
+def get_sync_changes():
+    since = request.args.get("since", type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "since must be a sequence number"}), 400
+    return jsonify(sync.get_changes(get_db(), g.user["id"], since))
+
+
+# Applies a batch of queued client mutations in one transaction:
+# {"mutations": [{"id": <client mutation id>, "set_id": <set id>,
+#   "weight"?, "reps"?, "completed"?}, ...], "since"?: <seq>}
+# Mutations are applied in order and a mutation id that was already applied
+# is skipped, so a batch can safely be sent again. Returns one result per
+# mutation and, when since is given, the changes after it as from GET.
+@bp.route("/api/sync", methods=["POST"])
+def apply_sync_mutations():
+    data = request.json
+    mutations = data.get("mutations") if isinstance(data, dict) else None
+    if not isinstance(mutations, list):
+        return jsonify({"error": "Expected an object with a mutations array"}), 400
+    if len(mutations) > sync.SYNC_MAX_MUTATIONS:
+        return (
+            jsonify({"error": f"At most {sync.SYNC_MAX_MUTATIONS} mutations per batch"}),
+            400,
+        )
+    since = data.get("since")
+    if since is not None and (not isinstance(since, int) or since < 0):
+        return jsonify({"error": "since must be a sequence number"}), 400
+
+    user_id = g.user["id"]
+    results = []
+    db = get_db()
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        for item in mutations:
+            mutation_id = item.get("id") if isinstance(item, dict) else None
+            result = {"id": mutation_id}
+            results.append(result)
+            if not isinstance(mutation_id, str) or not mutation_id:
+                result.update({"status": 400, "error": "Invalid mutation id"})
+                continue
+            set_id = item.get("set_id")
+            if not isinstance(set_id, int) or isinstance(set_id, bool):
+                result.update({"status": 400, "error": "Invalid set id"})
+                continue
+            update_fields, error = parse_set_update(item)
+            if error:
+                result.update({"status": 400, "error": error})
+                continue
+            if sync.is_mutation_applied(db, user_id, mutation_id):
+                result.update({"status": 200, "duplicate": True})
+                continue
+
+            # Sets of other users' sessions are not found
+            previous = personal_records.get_set_before_update(db, set_id, user_id)
+            if previous is None:
+                result.update({"status": 404, "error": "Set not found"})
+                continue
+            db.execute(
+                "UPDATE exercise_set SET "
+                + ", ".join([f"{field} = ?" for field in update_fields.keys()])
+                + " WHERE id = ?",
+                list(update_fields.values()) + [set_id],
+            )
+            sync.record_mutation(db, user_id, mutation_id)
+            result.update(
+                {
+                    "status": 200,
+                    "personal_record": personal_records.record_set_update(
+                        db, set_id, previous
+                    ),
+                }
+            )
+
+        sync.prune_mutations(db)
+        db.commit()
+    except sqlite3.Error as e:
+        db.rollback()
+        print(f"Database error applying sync mutations: {e}")
+        return jsonify({"error": "Database error applying sync mutations"}), 500
+
+    response = {"results": results}
+    if since is not None:
+        response["changes"] = sync.get_changes(db, user_id, since)
+    return jsonify(response)
+
+
+# Get recent sessions, newest first, from the session_summary table
+# Paginate with ?before=<session_start_time>,<session_id> of the last row and
+# ?limit=; the next page's URL is sent in the Link header
+@bp.route("/api/sessions/recent", methods=["GET"])
 def get_recent_sessions():
-    recent_sessions = query_db(
-        """
-        SELECT
-            s.id AS session_id,
-            s.start_time AS session_start_time,
-            DATE(s.start_time) AS session_date_display,
-            d.title AS day_title,
-            p.title AS program_title,
-            GROUP_CONCAT(e.title, ', ' ORDER BY de.exercise_sequence) AS exercise_summary
-        FROM session s
-        JOIN day d ON s.day_id = d.id
-        JOIN program p ON d.program_id = p.id
-        JOIN day_exercise de ON d.id = de.day_id
-        JOIN exercise e ON de.exercise_id = e.id
-        GROUP BY s.id, s.start_time, DATE(s.start_time), d.title, p.title
-        ORDER BY s.start_time DESC, s.id DESC
-        LIMIT 10
-    """
-    )
+    try:
+        limit = int(request.args.get("limit", RECENT_SESSIONS_LIMIT))
+    except ValueError:
+        return jsonify({"error": "Invalid limit value"}), 400
+    if limit < 1:
+        return jsonify({"error": "Invalid limit value"}), 400
+    limit = min(limit, RECENT_SESSIONS_MAX_LIMIT)
+
+    before = request.args.get("before")
+    if before:
+        before_start_time, _, before_session_id = before.rpartition(",")
+        try:
+            before_session_id = int(before_session_id)
+        except ValueError:
+            return jsonify({"error": "Invalid before cursor"}), 400
+        if not before_start_time:
+            return jsonify({"error": "Invalid before cursor"}), 400
+        recent_sessions = query_db(
+            """
+            SELECT session_id, session_start_time, session_date_display,
+                   day_title, program_title, exercise_summary
+            FROM session_summary
+            WHERE user_id = ?
+              AND (session_start_time, session_id) < (?, ?)
+            ORDER BY session_start_time DESC, session_id DESC
+            LIMIT ?
+        """,
+            (g.user["id"], before_start_time, before_session_id, limit),
+        )
+    else:
+        recent_sessions = query_db(
+            """
+            SELECT session_id, session_start_time, session_date_display,
+                   day_title, program_title, exercise_summary
+            FROM session_summary
+            WHERE user_id = ?
+            ORDER BY session_start_time DESC, session_id DESC
+            LIMIT ?
+        """,
+            (g.user["id"], limit),
+        )
 
-    return jsonify([dict(row) for row in recent_sessions])
+    response = jsonify([dict(row) for row in recent_sessions])
+    if len(recent_sessions) == limit:
+        last = recent_sessions[-1]
+        next_url = url_for(
+            ".get_recent_sessions",
+            before=f"{last['session_start_time']},{last['session_id']}",
+            limit=limit,
+        )
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
 
 
 # New API endpoint for completed session message, accepts session_id
 # Renamed from /api/motivational-message
-@app.route("/api/session/<int:session_id>/completed-message", methods=["GET"])
+@bp.route("/api/session/<int:session_id>/completed-message", methods=["GET"])
 def get_completed_session_message(session_id):
-    # In the future, this could use the session_id to fetch session data
-    # and generate a dynamic message based on performance.
-    # For now, let's call the OpenAI service.
-    username = "Dale"  # Hardcoded username for now
-
-    # Call the OpenAI service function, passing the current session_id and the query function
-    # Pass the query_db function from the current scope
-    motivational_message = openai_service.generate_motivational_message_for_session(
-        username, session_id, query_db
+    # Messages are generated in the background and cached per session, so
+    # this never waits on the OpenAI round trip. While the message is being
+    # generated the client gets a 202 and polls again.
+    session = query_db(
+        "SELECT id FROM session WHERE id = ? AND user_id = ?",
+        (session_id, g.user["id"]),
+        one=True,
+    )
+    if session is None:
+        return jsonify({"error": "Session not found"}), 404
+
+    session_message = message_worker.get_session_message(session_id)
+    if session_message is not None and session_message["status"] == "ready":
+        session_personal_records = personal_records.get_session_personal_records(
+            query_db, session_id
+        )
+        return jsonify(
+            {
+                "message": session_message["message"],
+                "personal_records": [dict(pr) for pr in session_personal_records],
+                # Estimated prompt size, before and after history compaction
+                "prompt_metrics": {
+                    "history_sessions": session_message["history_sessions"],
+                    "included_sessions": session_message["included_sessions"],
+                    "raw_history_tokens": session_message["raw_history_tokens"],
+                    "history_tokens": session_message["history_tokens"],
+                    "prompt_tokens": session_message["prompt_tokens"],
+                },
+            }
+        )
+
+    queued = message_worker.request_session_message(g.user["name"], session_id)
+    if session_message is not None and session_message["status"] == "failed" and not queued:
+        # OpenAI failed recently, show a fallback until the message is retried
+        session_personal_records = personal_records.get_session_personal_records(
+            query_db, session_id
+        )
+        return jsonify(
+            {
+                "status": "failed",
+                "message": message_worker.FALLBACK_MESSAGE,
+                "personal_records": [dict(pr) for pr in session_personal_records],
+            }
+        )
+
+    response = jsonify({"status": "pending"})
+    response.status_code = 202
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+# Progression of one exercise: per session top set, estimated 1RM, tonnage
+# and PRs, optionally limited to ?from=YYYY-MM-DD&to=YYYY-MM-DD
+@bp.route("/api/exercise/<int:exercise_id>/progress", methods=["GET"])
+def get_exercise_progress(exercise_id):
+    formula = request.args.get("formula", "epley")
+    if formula not in analytics.E1RM_FORMULAS:
+        return jsonify({"error": "Unknown formula"}), 400
+    try:
+        start, end = analytics.parse_date_range(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid date, expected YYYY-MM-DD"}), 400
+
+    exercise = query_db("SELECT * FROM exercise WHERE id = ?", (exercise_id,), one=True)
+    if not exercise:
+        return jsonify({"error": "Exercise not found"}), 404
+
+    progress = analytics.get_exercise_progress(
+        query_db, g.user["id"], exercise_id, start, end, formula
+    )
+    sessions = [dict(row) for row in progress]
+    for session in sessions:
+        session["is_pr"] = bool(session["is_pr"])
+
+    return jsonify(
+        {
+            "exercise": dict(exercise),
+            "formula": formula,
+            "sessions": sessions,
+        }
+    )
+
+
+# Totals per exercise, optionally limited to ?from=YYYY-MM-DD&to=YYYY-MM-DD
+@bp.route("/api/stats", methods=["GET"])
+def get_stats():
+    formula = request.args.get("formula", "epley")
+    if formula not in analytics.E1RM_FORMULAS:
+        return jsonify({"error": "Unknown formula"}), 400
+    try:
+        start, end = analytics.parse_date_range(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid date, expected YYYY-MM-DD"}), 400
+
+    stats = analytics.get_stats(query_db, g.user["id"], start, end, formula)
+    return jsonify({"formula": formula, "exercises": [dict(row) for row in stats]})
+
+
+# The user's workout history as CSV or JSON Lines (?format=csv|jsonl), optionally
+# only sessions started ?since=<timestamp> or sets ?after_id=<exercise_set id>.
+# The body is streamed in batches; X-Export-Last-Set-Id is the after_id to
+# pass next time.
+@bp.route("/api/export", methods=["GET"])
+def export_history():
+    export_format = request.args.get("format", "csv")
+    if export_format not in export.EXPORT_FORMATS:
+        return jsonify({"error": "Unknown format, expected csv or jsonl"}), 400
+    try:
+        since = export.parse_since(request.args.get("since"))
+    except ValueError:
+        return jsonify({"error": "Invalid since, expected YYYY-MM-DD[THH:MM:SS]"}), 400
+    after_id = request.args.get("after_id", type=int)
+
+    last_set_id, chunks = export.generate_export(
+        get_db(), export_format, since, after_id, g.user["id"]
+    )
+    # stream_with_context keeps the pooled connection until the stream ends
+    response = current_app.response_class(
+        stream_with_context(chunks), mimetype=export.EXPORT_FORMATS[export_format]
     )
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=workouts.{export_format}"
+    )
+    response.headers["X-Export-Last-Set-Id"] = str(last_set_id)
+    return response
+
+
+# Import the user's workout history in the export columns. The body is CSV or
+# JSON Lines (?format=csv|jsonl, otherwise from the Content-Type) and is
+# parsed as it is read. Re-importing the same records is a no-op.
+@bp.route("/api/import", methods=["POST"])
+def import_history():
+    import_format = request.args.get("format")
+    if import_format is None:
+        import_format = "jsonl" if "json" in (request.mimetype or "") else "csv"
+    if import_format not in bulk_import.IMPORT_FORMATS:
+        return jsonify({"error": "Unknown format, expected csv or jsonl"}), 400
+
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    try:
+        stats = bulk_import.import_records(
+            get_db(), g.user["id"], bulk_import.iter_records(stream, import_format)
+        )
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"error": f"Could not parse the import: {e}"}), 400
+    except bulk_import.ImportBatchError as e:
+        # The batches before the failed one stay imported, their stats tell
+        # the client which records landed
+        print(f"Database error importing history: {e}")
+        if e.stats["exercises_created"]:
+            reference_cache.invalidate()
+        return jsonify({"error": "Database error importing history", "stats": e.stats}), 500
+    except sqlite3.Error as e:
+        get_db().rollback()
+        print(f"Database error importing history: {e}")
+        return jsonify({"error": "Database error importing history", "stats": None}), 500
+    if stats["exercises_created"]:
+        reference_cache.invalidate()
+    return jsonify(stats)
+
+
+# Prometheus metrics for this process
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    return current_app.response_class(
+        instrumentation.render_metrics(), mimetype="text/plain; version=0.0.4"
+    )
+
 
-    return jsonify({"message": motivational_message})
+_import_duration = time.perf_counter() - _import_started
 
 
 if __name__ == "__main__":
     # This block is executed when the script is run directly
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,157 @@
+# backend/assets.py
+# Fingerprinted, precompressed static assets. On startup every file in
+# backend/static is read once, named after a hash of its content
+# (home.js -> home.3f2a9c1b7d4e.js) and compressed with gzip and, when the
+# brotli package is installed, brotli. Templates link to the hashed names
+# through asset_url(), and /assets/ serves them with a one year immutable
+# Cache-Control, so a phone only downloads an asset again after it changes.
+#
+# Everything is kept in memory (the assets are a few tens of KB), so there is
+# no build output to keep in sync with the source files. Compressing takes
+# over 100 ms, so it happens on first use rather than at startup, and CLI
+# commands never pay for it.
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import abort, request, url_for
+
+try:
+    import brotli
+except ImportError:  # Optional, gzip is always available
+    brotli = None
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+# Files that are already compressed are served as they are
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()  # Only one thread builds
+_assets = {}  # hashed name -> Asset
+_hashed_names = {}  # file name -> hashed name
+_mtimes = {}  # file name -> mtime when built
+_built = False
+
+
+class Asset:
+    """One static file: its content, mimetype and compressed variants."""
+
+    def __init__(self, data, mimetype, etag):
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = etag
+        self.encodings = {}  # Content-Encoding -> compressed data
+        if mimetype.startswith(COMPRESSIBLE_TYPES):
+            compressed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed["br"] = brotli.compress(data)
+            # Only keep encodings that are actually smaller
+            self.encodings = {
+                encoding: body
+                for encoding, body in compressed.items()
+                if len(body) < len(data)
+            }
+
+
+def _hashed_name(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{digest}{ext}"
+
+
+def build(static_folder):
+    """Reads, fingerprints and compresses every file in static_folder."""
+    global _built
+    assets = {}
+    hashed_names = {}
+    mtimes = {}
+    for dirpath, _, filenames in os.walk(static_folder):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            filename = os.path.relpath(path, static_folder).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            hashed_name = _hashed_name(filename, digest)
+            assets[hashed_name] = Asset(data, mimetype, digest)
+            hashed_names[filename] = hashed_name
+            mtimes[filename] = os.path.getmtime(path)
+
+    with _lock:
+        _built = True
+        _assets.clear()
+        _assets.update(assets)
+        _hashed_names.clear()
+        _hashed_names.update(hashed_names)
+        _mtimes.clear()
+        _mtimes.update(mtimes)
+
+
+def _ensure_built(static_folder):
+    if not _built:
+        with _build_lock:
+            if not _built:
+                build(static_folder)
+
+
+def _is_stale(static_folder):
+    for filename, mtime in list(_mtimes.items()):
+        path = os.path.join(static_folder, filename)
+        if not os.path.exists(path) or os.path.getmtime(path) != mtime:
+            return True
+    return False
+
+
+def _choose_encoding(asset):
+    """The smallest encoding the client accepts, or None for identity."""
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in asset.encodings and accepted[encoding]:
+            return encoding
+    return None
+
+
+def init_app(app):
+    """Registers asset_url() and the /assets/ route. The assets are built on first use."""
+
+    def asset_url(filename):
+        _ensure_built(app.static_folder)
+        # With the debug server, edits are picked up without a restart
+        if app.debug and _is_stale(app.static_folder):
+            build(app.static_folder)
+        hashed_name = _hashed_names.get(filename)
+        if hashed_name is None:
+            return url_for("static", filename=filename)
+        return url_for("assets", filename=hashed_name)
+
+    app.add_template_global(asset_url)
+
+    @app.route("/assets/<path:filename>", endpoint="assets")
+    def serve_asset(filename):
+        _ensure_built(app.static_folder)
+        asset = _assets.get(filename)
+        if asset is None:
+            abort(404)
+
+        # The name changes with the content, so a matching ETag always means
+        # the client's copy is current. The ETag is weak because it is shared
+        # by the encodings of the asset.
+        if request.if_none_match.contains_weak(asset.etag):
+            response = app.response_class(status=304)
+        else:
+            encoding = _choose_encoding(asset)
+            if encoding is None:
+                response = app.response_class(asset.data, mimetype=asset.mimetype)
+            else:
+                response = app.response_class(
+                    asset.encodings[encoding], mimetype=asset.mimetype
+                )
+                response.headers["Content-Encoding"] = encoding
+
+        response.set_etag(asset.etag, weak=True)
+        response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+        if asset.encodings:
+            response.vary.add("Accept-Encoding")
+        return response
@@ -0,0 +1,182 @@
+# backend/auth.py
+# Lightweight per-user identification. Each user has an API token (created
+# with `flask user-token NAME`); only its SHA-256 is stored. A request is
+# identified by an "Authorization: Bearer <token>" header or, for the pages,
+# the token cookie set by /login.
+#
+# Requests without a token act as DEFAULT_USER_ID when it is set. When it is
+# not set they act as the only user while there is exactly one, so a
+# single-user install keeps working as before and adding a second user
+# starts requiring tokens. Set DEFAULT_USER_ID to an empty string to always
+# require a token.
+#
+# Users are looked up in an in-process cache, so identifying a request
+# doesn't query the database. Triggers on the user table bump
+# reference_generation (see migrations/0012_user_generation.sql), which
+# clears the cache at the next reference_cache generation check, so a
+# token replaced in another process stops working within
+# REFERENCE_CACHE_CHECK_INTERVAL seconds.
+import hashlib
+import os
+import secrets
+import threading
+from collections import OrderedDict
+
+from flask import g, jsonify, redirect, request
+
+from .database import query_db
+from . import reference_cache
+
+DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID")
+TOKEN_COOKIE = "auth_token"
+TOKEN_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+# WSGI environ key with the id of the user a request is made as. It can't
+# be sent over HTTP (headers become HTTP_* keys), only set by in-process
+# clients such as the benchmarks' test clients.
+USER_ID_ENVIRON = "myfitnessapp.user_id"
+
+# Most lookups (by token hash and by id) kept, least recently used first out
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+# Endpoints that don't need a user
+PUBLIC_ENDPOINTS = {"static", "assets", "main.metrics", "login"}
+
+_lock = threading.Lock()
+_users = OrderedDict()  # ("token", hash) or ("id", id) -> user, ("only",) -> user or None
+_generation = None
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_token(db, name):
+    """
+    Creates the user if needed and gives them a new token, replacing any
+    previous one. Returns (user_id, token); the token can't be recovered later.
+    """
+    token = secrets.token_urlsafe(32)
+    db.execute("INSERT OR IGNORE INTO user (name) VALUES (?)", (name,))
+    db.execute("UPDATE user SET token_hash = ? WHERE name = ?", (hash_token(token), name))
+    user_id = db.execute("SELECT id FROM user WHERE name = ?", (name,)).fetchone()["id"]
+    invalidate()
+    return user_id, token
+
+
+def invalidate():
+    """Drops every cached user, call after writing to the user table."""
+    with _lock:
+        _users.clear()
+    # The triggers bumped reference_generation, this worker sees it next
+    reference_cache.invalidate()
+
+
+def get_request_token():
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token.strip():
+        return token.strip()
+    return request.cookies.get(TOKEN_COOKIE)
+
+
+def _get_user(key, loader, cache_missing=False):
+    """
+    Returns the cached user for key, calling loader() on a miss. Unknown
+    users are not cached unless cache_missing, so made-up tokens can't
+    fill the cache.
+    """
+    global _generation
+    generation = reference_cache.get_generation()
+    with _lock:
+        if generation != _generation:
+            _users.clear()
+            _generation = generation
+        if key in _users:
+            _users.move_to_end(key)
+            return _users[key]
+
+    row = loader()
+    user = {"id": row["id"], "name": row["name"]} if row is not None else None
+    if user is None and not cache_missing:
+        return None
+    with _lock:
+        # Not stored if the cache was cleared for a newer generation meanwhile
+        if _generation == generation:
+            _users[key] = user
+            while len(_users) > USER_CACHE_MAX_ENTRIES:
+                _users.popitem(last=False)
+    return user
+
+
+def find_user_by_token(token):
+    token_hash = hash_token(token)
+    return _get_user(
+        ("token", token_hash),
+        lambda: query_db(
+            "SELECT id, name FROM user WHERE token_hash = ?", (token_hash,), one=True
+        ),
+    )
+
+
+def find_user_by_id(user_id):
+    return _get_user(
+        ("id", user_id),
+        lambda: query_db("SELECT id, name FROM user WHERE id = ?", (user_id,), one=True),
+    )
+
+
+def _load_only_user():
+    users = query_db("SELECT id, name FROM user LIMIT 2")
+    return users[0] if len(users) == 1 else None
+
+
+def get_default_user():
+    """The user requests without a token act as, None when a token is required."""
+    if DEFAULT_USER_ID:
+        return find_user_by_id(int(DEFAULT_USER_ID))
+    if DEFAULT_USER_ID is None:
+        return _get_user(("only",), _load_only_user, cache_missing=True)
+    return None
+
+
+def _unauthorized():
+    if request.path.startswith("/api/"):
+        return jsonify({"error": "Unknown or missing token"}), 401
+    return "Unknown or missing token, open the login link for your user", 401
+
+
+def init_app(app):
+    """Identifies the user of every request and stores them as g.user."""
+
+    @app.before_request
+    def load_user():
+        if request.endpoint in PUBLIC_ENDPOINTS:
+            return None
+        token = get_request_token()
+        if token:
+            g.user = find_user_by_token(token)
+        elif USER_ID_ENVIRON in request.environ:
+            g.user = find_user_by_id(int(request.environ[USER_ID_ENVIRON]))
+        else:
+            g.user = get_default_user()
+        if g.user is None:
+            return _unauthorized()
+        return None
+
+    # Stores the token in a cookie so the pages and their fetch() calls are
+    # identified, e.g. from a link printed by `flask user-token`
+    @app.route("/login")
+    def login():
+        token = request.args.get("token", "")
+        if not token or find_user_by_token(token) is None:
+            return _unauthorized()
+        response = redirect("/")
+        response.set_cookie(
+            TOKEN_COOKIE,
+            token,
+            max_age=TOKEN_COOKIE_MAX_AGE,
+            httponly=True,
+            samesite="Lax",
+        )
+        return response
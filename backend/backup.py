@@ -0,0 +1,246 @@
+# backend/backup.py
+# Online snapshots of the database using the SQLite backup API.
+#
+# A snapshot copies the live database BACKUP_PAGES_PER_STEP pages at a time,
+# pausing between steps so writers are never blocked for the whole copy,
+# checks the copy, then gzips it to BACKUP_DIR as
+# database-<UTC timestamp>.sqlite.gz. Only the newest BACKUP_RETENTION
+# snapshots are kept.
+#
+# Every process that serves requests runs a scheduler thread: gunicorn
+# workers start it in post_worker_init (see gunicorn_conf.py) and the Flask
+# development server when BACKUP_SCHEDULER is set. CLI commands, benchmarks
+# and tests never run it. A lock file in BACKUP_DIR makes sure only one
+# process takes a snapshot at a time, and a snapshot is only taken when the
+# newest one is older than BACKUP_INTERVAL_HOURS, so gunicorn workers don't
+# each take their own.
+import datetime
+import fcntl
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from .database import DATABASE, connect_db, migrate_db
+from . import instrumentation
+
+BACKUP_DIR = os.getenv(
+    "BACKUP_DIR", os.path.join(os.path.dirname(DATABASE) or ".", "backups")
+)
+# Hours between scheduled snapshots, 0 disables the scheduler
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+# Number of snapshots kept, older ones are deleted
+BACKUP_RETENTION = int(os.getenv("BACKUP_RETENTION", "14"))
+# Pages copied per backup step, and the pause between steps
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.005"))
+# Seconds between scheduler checks
+BACKUP_CHECK_INTERVAL = int(os.getenv("BACKUP_CHECK_INTERVAL", "300"))
+# Starts the scheduler when the app is created, for the Flask development
+# server (docker-entrypoint.sh sets it with SERVER=flask). Gunicorn workers
+# don't need it, and it must not be set for the gunicorn master.
+BACKUP_SCHEDULER = os.getenv("BACKUP_SCHEDULER", "").lower() in ("1", "true", "yes")
+
+SNAPSHOT_PREFIX = "database-"
+SNAPSHOT_SUFFIX = ".sqlite.gz"
+LOCK_FILENAME = ".backup.lock"
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+instrumentation.register_metric(
+    "backup_duration_seconds", "gauge", "Time taken by the last snapshot taken by this process."
+)
+instrumentation.register_metric(
+    "backup_size_bytes", "gauge", "Compressed size of the newest snapshot."
+)
+instrumentation.register_metric(
+    "backup_last_success_timestamp_seconds", "gauge", "When the newest snapshot was written."
+)
+instrumentation.register_metric("backup_snapshots", "gauge", "Snapshots kept in BACKUP_DIR.")
+instrumentation.register_metric("backup_failures_total", "counter", "Snapshots that failed.")
+
+
+def list_snapshots():
+    """Returns the snapshot paths in BACKUP_DIR, oldest first."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    return [
+        os.path.join(BACKUP_DIR, filename)
+        for filename in sorted(os.listdir(BACKUP_DIR))
+        if filename.startswith(SNAPSHOT_PREFIX) and filename.endswith(SNAPSHOT_SUFFIX)
+    ]
+
+
+def _check_database(path):
+    """Raises sqlite3.DatabaseError unless the database at path passes quick_check."""
+    db = sqlite3.connect(path)
+    try:
+        result = db.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        db.close()
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"Snapshot failed quick_check: {result}")
+
+
+def _pause_between_steps(status, remaining, total):
+    # Called by Connection.backup after each step, gives writers a turn
+    time.sleep(BACKUP_STEP_SLEEP)
+
+
+def _evict_old_snapshots():
+    snapshots = list_snapshots()
+    for path in snapshots[: max(len(snapshots) - BACKUP_RETENTION, 0)]:
+        os.remove(path)
+        print(f"Deleted old snapshot: {path}")  # Log for debugging
+
+
+def _update_snapshot_metrics():
+    snapshots = list_snapshots()
+    instrumentation.set_gauge("backup_snapshots", len(snapshots))
+    if snapshots:
+        instrumentation.set_gauge("backup_size_bytes", os.path.getsize(snapshots[-1]))
+        instrumentation.set_gauge(
+            "backup_last_success_timestamp_seconds", int(os.path.getmtime(snapshots[-1]))
+        )
+
+
+def create_snapshot():
+    """
+    Takes a snapshot of the live database and applies the retention limit.
+    Returns the snapshot path. Runs with its own connection, so it does not
+    need an app context.
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    started = time.perf_counter()
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(BACKUP_DIR, f"{SNAPSHOT_PREFIX}{timestamp}{SNAPSHOT_SUFFIX}")
+    copy_path = path + ".tmp"
+
+    try:
+        source = connect_db()
+        destination = sqlite3.connect(copy_path)
+        try:
+            source.backup(
+                destination,
+                pages=BACKUP_PAGES_PER_STEP,
+                progress=_pause_between_steps,
+            )
+        finally:
+            destination.close()
+            source.close()
+        _check_database(copy_path)
+
+        # Compress next to the final name and rename, so a partial snapshot
+        # is never picked up by restore or retention
+        with open(copy_path, "rb") as f_in, gzip.open(copy_path + ".gz", "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.replace(copy_path + ".gz", path)
+    except Exception:
+        instrumentation.inc_counter("backup_failures_total")
+        raise
+    finally:
+        for leftover in (copy_path, copy_path + ".gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    duration = time.perf_counter() - started
+    instrumentation.set_gauge("backup_duration_seconds", round(duration, 3))
+    _evict_old_snapshots()
+    _update_snapshot_metrics()
+    print(f"Wrote snapshot {path} in {duration:.2f}s")  # Log for debugging
+    return path
+
+
+def restore_snapshot(db, path):
+    """
+    Restores a snapshot into the live database through db (the app context's
+    connection), using the backup API in the other direction, so open
+    connections see the restored data instead of a file swapped out from
+    under them. Migrations newer than the snapshot are applied afterwards.
+    """
+    copy_path = os.path.join(BACKUP_DIR, os.path.basename(path) + ".restore.tmp")
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    try:
+        with gzip.open(path, "rb") as f_in, open(copy_path, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        _check_database(copy_path)
+
+        previous_generation = db.execute(
+            "SELECT MAX(generation) FROM reference_generation"
+        ).fetchone()[0] or 0
+        snapshot = sqlite3.connect(copy_path)
+        try:
+            snapshot.backup(db, pages=BACKUP_PAGES_PER_STEP)
+        finally:
+            snapshot.close()
+    finally:
+        if os.path.exists(copy_path):
+            os.remove(copy_path)
+
+    migrate_db()
+    # Move the generation past both values so every worker's reference
+    # cache sees a change, even if the snapshot's counter matches the old one
+    db.execute(
+        "UPDATE reference_generation SET generation = MAX(generation, ?) + 1",
+        (previous_generation,),
+    )
+    db.commit()
+
+
+def _snapshot_is_due():
+    snapshots = list_snapshots()
+    if not snapshots:
+        return True
+    age = time.time() - os.path.getmtime(snapshots[-1])
+    return age >= BACKUP_INTERVAL_HOURS * 3600
+
+
+def run_scheduled_snapshot():
+    """Takes a snapshot if one is due and no other process is taking one."""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    with open(os.path.join(BACKUP_DIR, LOCK_FILENAME), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None  # Another process is taking a snapshot
+        try:
+            if _snapshot_is_due():
+                return create_snapshot()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return None
+
+
+def _scheduler_loop():
+    while True:
+        if os.path.exists(DATABASE):
+            try:
+                run_scheduled_snapshot()
+            except Exception as e:
+                print(f"Scheduled snapshot failed: {e}")  # Log for debugging
+            _update_snapshot_metrics()
+        time.sleep(BACKUP_CHECK_INTERVAL)
+
+
+def start_scheduler():
+    """Starts the scheduler thread once per process, unless disabled."""
+    global _scheduler_started
+    if BACKUP_INTERVAL_HOURS <= 0:
+        return
+    with _scheduler_lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+    threading.Thread(target=_scheduler_loop, name="backup-scheduler", daemon=True).start()
+
+
+def init_app(app):
+    """
+    Starts the scheduler if BACKUP_SCHEDULER is set, unless testing. Gunicorn
+    workers start it themselves, other CLI commands never do.
+    """
+    if BACKUP_SCHEDULER and not app.testing:
+        start_scheduler()
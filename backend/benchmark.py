@@ -0,0 +1,292 @@
+# backend/benchmark.py
+# Benchmark of the API routes. Every /api/ route is requested through the
+# Flask test client against the configured database (normally one filled
+# with `flask seed-synthetic`), and the p50/p95 latency and the number of
+# SQL statements per request (from the Server-Timing header, see
+# instrumentation.py) are reported per route.
+#
+# Results can be saved as a JSON baseline and later runs compared against
+# it. A route regresses when it runs more statements than in the baseline,
+# or when its median latency grows by more than the tolerance. Statement
+# counts don't depend on the machine, so they are compared exactly, while
+# latency gets a margin for noisy CI runners. p95 is reported but not
+# compared, a couple of slow requests (GC, a busy runner) move it too much.
+import json
+import re
+import time
+import uuid
+
+from . import auth, personal_records
+
+BENCHMARK_ITERATIONS = 30
+BENCHMARK_WARMUP = 3
+LATENCY_TOLERANCE = 0.5  # p50 may grow 50%...
+LATENCY_SLACK_MS = 2.0  # ...plus this, so sub-millisecond routes aren't flaky
+
+_queries_pattern = re.compile(r'desc="(\d+) queries"')
+
+
+# Tables the write routes change besides session and exercise_set. They are
+# copied before the routes run and put back afterwards, so e.g. the
+# tombstones of the deleted sets don't stay in sync_change.
+RESTORED_TABLES = ("session_message", "sync_change", "sync_mutation")
+
+
+def get_dataset(db):
+    """Row counts that identify the dataset a benchmark ran against."""
+    return {
+        table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("user", "program", "exercise", "session", "exercise_set")
+        + RESTORED_TABLES
+    }
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def get_routes(db, user_id):
+    """
+    Returns (name, request) pairs for every API route, where request(client)
+    makes one request. Ids come from the user's latest session, so every
+    route does real work.
+    """
+    session = db.execute(
+        """
+        SELECT s.id, s.day_id, d.title AS day_title, p.title AS program_title
+        FROM session s
+        JOIN day d ON s.day_id = d.id
+        JOIN program p ON d.program_id = p.id
+        WHERE s.user_id = ?
+        ORDER BY s.start_time DESC, s.id DESC
+        LIMIT 1
+    """,
+        (user_id,),
+    ).fetchone()
+    if session is None:
+        raise ValueError(f"User {user_id} has no sessions, run `flask seed-synthetic` first")
+    exercise_set = db.execute(
+        """
+        SELECT
+            es.id,
+            es.exercise_id,
+            es.weight,
+            es.reps,
+            es.completed,
+            e.title AS exercise_title,
+            d.program_id
+        FROM exercise_set es
+        JOIN exercise e ON es.exercise_id = e.id
+        JOIN session s ON es.session_id = s.id
+        JOIN day d ON s.day_id = d.id
+        WHERE es.session_id = ? AND es.set_type = 'working'
+        ORDER BY es.id
+        LIMIT 1
+    """,
+        (session["id"],),
+    ).fetchone()
+    session_id = session["id"]
+    program_id = exercise_set["program_id"]
+    exercise_id = exercise_set["exercise_id"]
+    set_id = exercise_set["id"]
+    # Writes store the set's current values, so they don't change the data
+    set_update = {
+        "weight": exercise_set["weight"],
+        "reps": exercise_set["reps"],
+        "completed": bool(exercise_set["completed"]),
+    }
+    # What the user has typed of the exercise's title
+    search_prefix = exercise_set["exercise_title"][:3]
+    # The first request imports the row, later ones find it already there
+    import_body = json.dumps(
+        {
+            "session_start_time": "2000-01-01 08:00:00",
+            "program_title": session["program_title"],
+            "day_title": session["day_title"],
+            "exercise_title": exercise_set["exercise_title"],
+            "set_number": 1,
+            "weight": 20,
+            "reps": 5,
+        }
+    )
+
+    return [
+        ("GET /api/programs", lambda c: c.get("/api/programs")),
+        ("GET /api/program/<id>/days", lambda c: c.get(f"/api/program/{program_id}/days")),
+        (
+            "GET /api/session/<id>/exercises",
+            lambda c: c.get(f"/api/session/{session_id}/exercises"),
+        ),
+        ("GET /api/session/<id>/bundle", lambda c: c.get(f"/api/session/{session_id}/bundle")),
+        (
+            "GET /api/session/<id>/exercise/<id>",
+            lambda c: c.get(f"/api/session/{session_id}/exercise/{exercise_id}"),
+        ),
+        ("GET /api/sessions/recent", lambda c: c.get("/api/sessions/recent")),
+        (
+            "GET /api/session/<id>/completed-message",
+            lambda c: c.get(f"/api/session/{session_id}/completed-message"),
+        ),
+        (
+            "GET /api/exercise/<id>/progress",
+            lambda c: c.get(f"/api/exercise/{exercise_id}/progress"),
+        ),
+        ("GET /api/stats", lambda c: c.get("/api/stats")),
+        (
+            "GET /api/exercises/search",
+            lambda c: c.get("/api/exercises/search", query_string={"q": search_prefix}),
+        ),
+        ("GET /api/export", lambda c: c.get("/api/export?format=jsonl")),
+        ("GET /api/sync", lambda c: c.get("/api/sync?since=0")),
+        ("PUT /api/sets/<id>", lambda c: c.put(f"/api/sets/{set_id}", json=set_update)),
+        (
+            "PATCH /api/sets",
+            lambda c: c.patch("/api/sets", json=[{"id": set_id, **set_update}]),
+        ),
+        (
+            "POST /api/sync",
+            lambda c: c.post(
+                "/api/sync",
+                json={"mutations": [{"id": uuid.uuid4().hex, "set_id": set_id, **set_update}]},
+            ),
+        ),
+        (
+            "POST /api/import",
+            lambda c: c.post(
+                "/api/import?format=jsonl",
+                data=import_body,
+                content_type="application/x-ndjson",
+            ),
+        ),
+        (
+            "POST /api/sessions",
+            lambda c: c.post("/api/sessions", json={"day_id": session["day_id"]}),
+        ),
+    ]
+
+
+def _save_tables(db):
+    """Copies RESTORED_TABLES to temporary tables, returns sync_change's AUTOINCREMENT counter."""
+    for table in RESTORED_TABLES:
+        db.execute(f"DROP TABLE IF EXISTS temp.benchmark_{table}")
+        db.execute(f"CREATE TEMP TABLE benchmark_{table} AS SELECT * FROM main.{table}")
+    row = db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'sync_change'").fetchone()
+    return row["seq"] if row else 0
+
+
+def _remove_created_rows(db, user_id, last_session_id, last_set_id, sync_seq):
+    """
+    Deletes the sessions and sets the write routes created and restores
+    RESTORED_TABLES, so the dataset stays the same.
+    """
+    # The imported set is history older than the user's sessions, so it can
+    # change the records and flags at its rep count until it is deleted
+    record_keys = [
+        (row["exercise_id"], row["reps"])
+        for row in db.execute(
+            """
+            SELECT DISTINCT exercise_id, reps FROM exercise_set
+            WHERE id > ? AND set_type = 'working' AND completed
+              AND weight IS NOT NULL AND reps > 0
+        """,
+            (last_set_id,),
+        )
+    ]
+    db.execute("DELETE FROM exercise_set WHERE id > ?", (last_set_id,))
+    db.execute("DELETE FROM session_message WHERE session_id > ?", (last_session_id,))
+    db.execute("DELETE FROM session WHERE id > ?", (last_session_id,))
+    personal_records.rebuild_personal_records(db, user_id, record_keys)
+    # After the deletes and the rebuild, which add their own sync changes
+    for table in RESTORED_TABLES:
+        db.execute(f"DELETE FROM main.{table}")
+        db.execute(f"INSERT INTO main.{table} SELECT * FROM temp.benchmark_{table}")
+    db.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'sync_change'", (sync_seq,))
+    db.commit()
+    for table in RESTORED_TABLES:
+        db.execute(f"DROP TABLE temp.benchmark_{table}")
+
+
+def run_benchmark(app, db, user_id, iterations=BENCHMARK_ITERATIONS, warmup=BENCHMARK_WARMUP):
+    """
+    Requests every route warmup + iterations times. Returns
+    {"dataset": ..., "iterations": ..., "routes": {name: {"p50_ms", "p95_ms", "queries"}}}.
+    Raises RuntimeError if the dataset isn't the same afterwards.
+    """
+    results = {"dataset": get_dataset(db), "iterations": iterations, "routes": {}}
+    last_session_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM session").fetchone()[0]
+    last_set_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM exercise_set").fetchone()[0]
+    routes = get_routes(db, user_id)
+    sync_seq = _save_tables(db)
+    db.commit()  # Don't hold a read transaction open while the routes write
+
+    client = app.test_client()
+    client.environ_base[auth.USER_ID_ENVIRON] = user_id
+    try:
+        for name, make_request in routes:
+            durations = []
+            queries = []
+            for i in range(warmup + iterations):
+                started = time.perf_counter()
+                response = make_request(client)
+                response.get_data()  # Streamed responses are generated while reading
+                elapsed = time.perf_counter() - started
+                if response.status_code >= 400:
+                    raise RuntimeError(
+                        f"{name} returned {response.status_code}: "
+                        f"{response.get_data(as_text=True)[:200]}"
+                    )
+                if i < warmup:
+                    continue
+                durations.append(elapsed * 1000)
+                match = _queries_pattern.search(response.headers.get("Server-Timing", ""))
+                queries.append(int(match.group(1)) if match else 0)
+            results["routes"][name] = {
+                "p50_ms": round(_percentile(durations, 50), 3),
+                "p95_ms": round(_percentile(durations, 95), 3),
+                # Statements run while a streamed body is generated, e.g. the
+                # export's rows, are not counted
+                "queries": max(queries),
+            }
+    finally:
+        _remove_created_rows(db, user_id, last_session_id, last_set_id, sync_seq)
+
+    dataset = get_dataset(db)
+    if dataset != results["dataset"]:
+        raise RuntimeError(
+            f"The benchmark changed the dataset from {results['dataset']} to {dataset}"
+        )
+    return results
+
+
+def compare(results, baseline, tolerance=LATENCY_TOLERANCE, slack_ms=LATENCY_SLACK_MS):
+    """Returns a description of every route that regressed against the baseline."""
+    regressions = []
+    for name, route in results["routes"].items():
+        base = baseline["routes"].get(name)
+        if base is None:
+            continue  # New route, nothing to compare with
+        if route["queries"] > base["queries"]:
+            regressions.append(
+                f"{name}: {route['queries']} queries per request, baseline {base['queries']}"
+            )
+        allowed_ms = base["p50_ms"] * (1 + tolerance) + slack_ms
+        if route["p50_ms"] > allowed_ms:
+            regressions.append(
+                f"{name}: p50 {route['p50_ms']:.1f} ms, baseline {base['p50_ms']:.1f} ms "
+                f"(allowed {allowed_ms:.1f} ms)"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
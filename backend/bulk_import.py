@@ -0,0 +1,318 @@
+# backend/bulk_import.py
+# Bulk import of historical workouts from CSV or JSON Lines, in the same
+# columns that export.py writes. Records are parsed as a stream, exercise
+# and day titles are resolved through in-memory lookups (ids are only used
+# when a record has no titles, they differ between databases), and sets are
+# inserted with executemany in one transaction per IMPORT_BATCH_SIZE rows.
+#
+# Records are imported into one user's history, on days of their own or
+# shared programs. Importing is idempotent: a session is identified by
+# (user_id, start_time, day_id) and a set by (session_id, exercise_id, set_number, set_type), so records
+# that already exist are skipped and an interrupted import can be re-run.
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import time
+
+from . import personal_records
+
+IMPORT_FORMATS = ("csv", "jsonl")
+SET_TYPES = ("warmup", "working")
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+MAX_REPORTED_ERRORS = 20
+
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+
+class ImportRecordError(ValueError):
+    """A record that cannot be imported, it is skipped and reported."""
+
+
+class ImportBatchError(Exception):
+    """
+    A batch could not be written to the database. stats are those of the
+    batches committed before it, which stay imported.
+    """
+
+    def __init__(self, error, stats):
+        super().__init__(str(error))
+        self.stats = stats
+
+
+def iter_records(stream, import_format):
+    """Yields (line_number, dict) for each record in a text stream."""
+    if import_format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, None
+
+
+def _value(record, key):
+    """A field with surrounding whitespace removed, "" and missing as None."""
+    value = record.get(key)
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            return None
+    return value
+
+
+def _text(record, key):
+    """A title field, which must be a string if present."""
+    value = _value(record, key)
+    if value is not None and not isinstance(value, str):
+        raise ImportRecordError(f"{key} must be text")
+    return value
+
+
+def _parse_timestamp(value):
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(str(value)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_bool(value, default):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.lower() in TRUE_VALUES
+    return bool(value)
+
+
+def _parse_number(value, convert):
+    return None if value is None else convert(value)
+
+
+class Importer:
+    """Resolves and inserts records, one batch per transaction."""
+
+    def __init__(self, db, user_id):
+        self.db = db
+        self.user_id = user_id
+        self.exercises = {
+            row["title"].lower(): row["id"]
+            for row in db.execute("SELECT id, title FROM exercise")
+        }
+        self.exercise_ids = set(self.exercises.values())
+        self.days = {}  # (program title, day title) -> day id
+        self.days_by_title = {}  # day title -> [day ids]
+        self.day_ids = set()
+        for row in db.execute(
+            """
+            SELECT d.id, d.title, p.title AS program_title
+            FROM day d JOIN program p ON d.program_id = p.id
+            WHERE p.user_id IS NULL OR p.user_id = ?
+        """,
+            (user_id,),
+        ):
+            self.days[(row["program_title"].lower(), row["title"].lower())] = row["id"]
+            self.days_by_title.setdefault(row["title"].lower(), []).append(row["id"])
+            self.day_ids.add(row["id"])
+        self.sessions = {
+            (row["start_time"], row["day_id"]): row["id"]
+            for row in db.execute(
+                "SELECT id, start_time, day_id FROM session WHERE user_id = ?", (user_id,)
+            )
+        }
+        self.stats = {
+            "rows": 0,
+            "inserted": 0,
+            "skipped": 0,
+            "failed": 0,
+            "sessions_created": 0,
+            "exercises_created": 0,
+            "errors": [],
+        }
+        # (exercise_id, reps) of the completed working sets imported, the
+        # only personal records the import can change
+        self.record_keys = set()
+
+    def _resolve_day(self, record, day_id):
+        day_title = _text(record, "day_title")
+        if day_title is None:
+            if day_id is None:
+                raise ImportRecordError("Missing day_title or day_id")
+            if day_id not in self.day_ids:
+                raise ImportRecordError(f"Unknown day_id {day_id}")
+            return day_id
+        program_title = _text(record, "program_title")
+        if program_title is not None:
+            day_id = self.days.get((program_title.lower(), day_title.lower()))
+            if day_id is None:
+                raise ImportRecordError(f"Unknown day {program_title} / {day_title}")
+            return day_id
+        day_ids = self.days_by_title.get(day_title.lower(), [])
+        if len(day_ids) != 1:
+            raise ImportRecordError(
+                f"Day {day_title} is {'ambiguous' if day_ids else 'unknown'}, add program_title"
+            )
+        return day_ids[0]
+
+    def _resolve_exercise(self, record, exercise_id):
+        title = _text(record, "exercise_title")
+        if title is None:
+            if exercise_id is None:
+                raise ImportRecordError("Missing exercise_title or exercise_id")
+            if exercise_id not in self.exercise_ids:
+                raise ImportRecordError(f"Unknown exercise_id {exercise_id}")
+            return exercise_id
+        exercise_id = self.exercises.get(title.lower())
+        if exercise_id is None:
+            # Exercises from other apps are created on first use
+            exercise_id = self.db.execute(
+                "INSERT INTO exercise (title, warmup_sets, working_sets) VALUES (?, 0, 0)",
+                (title,),
+            ).lastrowid
+            self.exercises[title.lower()] = exercise_id
+            self.exercise_ids.add(exercise_id)
+            self.stats["exercises_created"] += 1
+        return exercise_id
+
+    def _resolve_session(self, start_time, day_id):
+        key = (start_time, day_id)
+        session_id = self.sessions.get(key)
+        if session_id is None:
+            session_id = self.db.execute(
+                "INSERT INTO session (start_time, day_id, user_id) VALUES (?, ?, ?)",
+                (start_time, day_id, self.user_id),
+            ).lastrowid
+            self.sessions[key] = session_id
+            self.stats["sessions_created"] += 1
+        return session_id
+
+    def _to_set_row(self, record):
+        if not isinstance(record, dict):
+            raise ImportRecordError("Not a JSON object")
+        try:
+            start_time = _parse_timestamp(_value(record, "session_start_time"))
+            set_number = _parse_number(_value(record, "set_number"), int)
+            weight = _parse_number(_value(record, "weight"), float)
+            reps = _parse_number(_value(record, "reps"), int)
+            set_start_time = _parse_timestamp(_value(record, "start_time"))
+            set_end_time = _parse_timestamp(_value(record, "end_time"))
+            # Only used when the record has no day_title / exercise_title
+            day_id = _parse_number(_value(record, "day_id"), int)
+            exercise_id = _parse_number(_value(record, "exercise_id"), int)
+        except (TypeError, ValueError) as e:
+            raise ImportRecordError(f"Invalid value: {e}")
+        if start_time is None:
+            raise ImportRecordError("Missing session_start_time")
+        if set_number is None:
+            raise ImportRecordError("Missing set_number")
+        set_type = _value(record, "set_type") or "working"
+        if set_type not in SET_TYPES:
+            raise ImportRecordError(f"Unknown set_type {set_type!r}, expected warmup or working")
+        completed = _parse_bool(_value(record, "completed"), True)
+
+        day_id = self._resolve_day(record, day_id)
+        exercise_id = self._resolve_exercise(record, exercise_id)
+        session_id = self._resolve_session(start_time, day_id)
+
+        return (
+            session_id,
+            exercise_id,
+            set_number,
+            set_type,
+            weight,
+            reps,
+            completed,
+            set_start_time,
+            set_end_time,
+            # Natural key for the NOT EXISTS check
+            session_id,
+            exercise_id,
+            set_number,
+            set_type,
+        )
+
+    def import_batch(self, batch):
+        """Resolves and inserts one batch of (line_number, record) in one transaction."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = []
+            for line_number, record in batch:
+                try:
+                    rows.append(self._to_set_row(record))
+                except ImportRecordError as e:
+                    self.stats["failed"] += 1
+                    if len(self.stats["errors"]) < MAX_REPORTED_ERRORS:
+                        self.stats["errors"].append({"line": line_number, "error": str(e)})
+            cur = self.db.executemany(
+                """
+                INSERT INTO exercise_set (
+                    session_id, exercise_id, set_number, set_type,
+                    weight, reps, completed, start_time, end_time
+                )
+                SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM exercise_set
+                    WHERE session_id = ? AND exercise_id = ? AND set_number = ? AND set_type = ?
+                )
+            """,
+                rows,
+            )
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        self.stats["rows"] += len(batch)
+        self.stats["inserted"] += cur.rowcount
+        if cur.rowcount:
+            self.record_keys.update(
+                (exercise_id, reps)
+                for _, exercise_id, _, set_type, weight, reps, completed, *_ in rows
+                if set_type == "working" and completed and weight is not None and (reps or 0) > 0
+            )
+        self.stats["skipped"] += len(rows) - cur.rowcount
+
+
+def _replay_records(db, user_id, record_keys):
+    # Imported history can predate existing sets, so the user's records at
+    # the imported exercises and rep counts are replayed
+    if record_keys:
+        personal_records.rebuild_personal_records(db, user_id, record_keys)
+        db.commit()
+
+
+def import_records(db, user_id, records, batch_size=None):
+    """
+    Imports (line_number, record) pairs from iter_records into a user's
+    history. Batches that were committed are kept if a later batch fails,
+    a database error raises ImportBatchError with their stats. Returns the
+    import stats, including rows_per_second.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    started = time.perf_counter()
+    importer = Importer(db, user_id)
+
+    try:
+        batch = []
+        for item in records:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                importer.import_batch(batch)
+                batch = []
+        if batch:
+            importer.import_batch(batch)
+    except sqlite3.Error as e:
+        # The batches committed before it still need their records
+        _replay_records(db, user_id, importer.record_keys)
+        raise ImportBatchError(e, importer.stats) from e
+
+    stats = importer.stats
+    _replay_records(db, user_id, importer.record_keys)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["rows_per_second"] = (
+        round(stats["rows"] / stats["seconds"]) if stats["seconds"] else stats["rows"]
+    )
+    return stats
@@ -0,0 +1,153 @@
+# backend/catalog.py
+# Exercise catalog search for as-you-type autocomplete. Titles are matched
+# through the exercise_fts full-text index (see
+# migrations/0011_exercise_fts.sql), every word of the query as a prefix, so
+# "ben pr" finds "Bench press". Matches are ranked by bm25, by how often the
+# user has trained the exercise and by whether the title starts with the
+# query.
+#
+# Results are cached per user and query in an LRU. Entries are dropped when
+# the reference data changes (a new or renamed exercise bumps
+# reference_generation, see reference_cache.py) and expire after
+# EXERCISE_SEARCH_CACHE_TTL, so new training shows up in the ranking.
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from . import reference_cache
+
+EXERCISE_SEARCH_LIMIT = 10
+EXERCISE_SEARCH_MAX_LIMIT = 50
+EXERCISE_SEARCH_MAX_WORDS = 8
+EXERCISE_SEARCH_CACHE_SIZE = int(os.getenv("EXERCISE_SEARCH_CACHE_SIZE", "2048"))
+EXERCISE_SEARCH_CACHE_TTL = float(os.getenv("EXERCISE_SEARCH_CACHE_TTL", "300"))
+
+# Ranking: -bm25 (higher is better) plus these
+USAGE_WEIGHT = 1.0  # Per log(1 + sessions the user trained the exercise in)
+TITLE_PREFIX_BOOST = 2.0  # The title starts with the query
+
+_words = re.compile(r"\w+")
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (user_id, words, limit) -> (generation, stored_at, body, etag)
+
+
+def parse_query(query):
+    """The lowercased words of a search query, at most EXERCISE_SEARCH_MAX_WORDS."""
+    return tuple(_words.findall(query.lower()))[:EXERCISE_SEARCH_MAX_WORDS]
+
+
+def _match_expression(words):
+    # Each word is quoted, so FTS5 operators typed by the user (AND, NEAR,
+    # column filters) are searched for as text
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _starts_with(title_words, words):
+    """True when the title starts with the query, each word a prefix: "ben pr" and "Bench press"."""
+    return len(title_words) >= len(words) and all(
+        title_word.startswith(word) for title_word, word in zip(title_words, words)
+    )
+
+
+def _load_usage(query_db_func, user_id, exercise_ids):
+    """Sessions the user trained each exercise in, from the exercise_session_stats rollup."""
+    rows = query_db_func(
+        """
+        SELECT exercise_id, COUNT(*) AS sessions
+        FROM exercise_session_stats
+        WHERE user_id = ?
+          AND exercise_id IN (SELECT value FROM json_each(?))
+        GROUP BY exercise_id
+    """,
+        (user_id, json.dumps(exercise_ids)),
+    )
+    return {row["exercise_id"]: row["sessions"] for row in rows}
+
+
+def _search(query_db_func, user_id, words, limit):
+    if not words:
+        # Nothing typed yet: the user's most trained exercises
+        rows = query_db_func(
+            """
+            SELECT e.id, e.title, e.warmup_sets, e.working_sets,
+                   COUNT(ess.session_id) AS sessions
+            FROM exercise e
+            LEFT JOIN exercise_session_stats ess
+                ON ess.exercise_id = e.id AND ess.user_id = ?
+            GROUP BY e.id
+            ORDER BY sessions DESC, e.title COLLATE NOCASE
+            LIMIT ?
+        """,
+            (user_id, limit),
+        )
+        return [dict(row) for row in rows]
+
+    matches = query_db_func(
+        """
+        SELECT e.id, e.title, e.warmup_sets, e.working_sets, bm25(exercise_fts) AS rank
+        FROM exercise_fts
+        JOIN exercise e ON e.id = exercise_fts.rowid
+        WHERE exercise_fts MATCH ?
+    """,
+        (_match_expression(words),),
+    )
+    if not matches:
+        return []
+
+    usage = _load_usage(query_db_func, user_id, [row["id"] for row in matches])
+    results = []
+    for row in matches:
+        sessions = usage.get(row["id"], 0)
+        score = -row["rank"] + USAGE_WEIGHT * math.log1p(sessions)
+        if _starts_with(parse_query(row["title"]), words):
+            score += TITLE_PREFIX_BOOST
+        result = dict(row)
+        del result["rank"]
+        result["sessions"] = sessions
+        results.append((-score, row["title"].lower(), result))
+    results.sort(key=lambda item: item[:2])
+    return [result for _, _, result in results[:limit]]
+
+
+def search(query_db_func, user_id, query, limit=EXERCISE_SEARCH_LIMIT):
+    """
+    Returns (body, etag) of the JSON list of exercises matching query for
+    the user, best first. Each exercise has id, title, warmup_sets,
+    working_sets and sessions, the number of sessions the user trained it in.
+    """
+    words = parse_query(query)
+    key = (user_id, words, limit)
+    generation = reference_cache.get_generation()
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if (
+            entry is not None
+            and entry[0] == generation
+            and now - entry[1] < EXERCISE_SEARCH_CACHE_TTL
+        ):
+            _entries.move_to_end(key)
+            return entry[2], entry[3]
+
+    body = current_app.json.dumps(_search(query_db_func, user_id, words, limit))
+    etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    with _lock:
+        _entries[key] = (generation, now, body, etag)
+        _entries.move_to_end(key)
+        while len(_entries) > EXERCISE_SEARCH_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return body, etag
+
+
+def invalidate():
+    """Drops every cached search, e.g. after adding an exercise."""
+    with _lock:
+        _entries.clear()
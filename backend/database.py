@@ -2,24 +2,87 @@
 import sqlite3
 from flask import g, current_app
 import os
+import queue
+
+from .instrumentation import ProfiledConnection
 
 # Get the database path from an environment variable,
 # defaulting to a local path relative to the project root if not set.
 DATABASE = os.getenv("DATABASE_PATH", "./data/database.sqlite")
 
+# Connection settings. Connections are kept open in a bounded pool and the
+# pragmas below are applied once when a connection is created.
+POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "8"))
+JOURNAL_MODE = os.getenv("DATABASE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL")
+MMAP_SIZE = int(os.getenv("DATABASE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE = int(os.getenv("DATABASE_CACHE_SIZE", "-16000"))  # Negative is KiB
+BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", "5000"))
+
+# Idle connections, most recently used first so warm connections are reused
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Versioned migrations, applied in filename order and tracked in PRAGMA user_version
+MIGRATIONS_DIR = "migrations"
+
+
+def connect_db():
+    """
+    Opens a new connection and applies the connection-level pragmas once.
+    Connections are long-lived and reused through the pool, so none of this
+    is repeated per request.
+    """
+    db = sqlite3.connect(
+        DATABASE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        factory=ProfiledConnection,  # Times every statement, see instrumentation
+    )
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA foreign_keys = ON;")
+    db.execute(f"PRAGMA journal_mode = {JOURNAL_MODE};")
+    db.execute(f"PRAGMA synchronous = {SYNCHRONOUS};")
+    db.execute(f"PRAGMA mmap_size = {MMAP_SIZE};")
+    db.execute(f"PRAGMA cache_size = {CACHE_SIZE};")
+    db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+    return db
+
 
 def get_db():
     db = getattr(g, "_database", None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-    db.execute("PRAGMA foreign_keys = ON;")
-    db.row_factory = sqlite3.Row
+        # Reuse an idle pooled connection, or open a new one if none is free
+        try:
+            db = _pool.get_nowait()
+        except queue.Empty:
+            db = connect_db()
+        g._database = db
     return db
 
 
 def close_db(e=None):
-    db = getattr(g, "_database", None)
+    db = g.pop("_database", None)
     if db is not None:
+        # Never hand out a connection with a half-finished transaction
+        if db.in_transaction:
+            db.rollback()
+        # Return the connection to the pool, closing it if the pool is full
+        try:
+            _pool.put_nowait(db)
+        except queue.Full:
+            db.close()
+
+
+def close_pool():
+    """
+    Closes every idle pooled connection. Used before forking worker processes
+    so each worker opens its own connections instead of sharing the parent's.
+    """
+    while True:
+        try:
+            db = _pool.get_nowait()
+        except queue.Empty:
+            break
         db.close()
 
 
@@ -30,9 +93,84 @@ def init_db():
         os.makedirs(db_dir)
         print(f"Created database directory: {db_dir}")  # Log for debugging
     db = get_db()
-    with current_app.open_resource("schema.sql", mode="r") as f:
-        db.cursor().executescript(f.read())
-    db.commit()
+    # Only load schema.sql (tables and seed data) into a new database, the
+    # seed inserts would fail against an existing one
+    has_schema = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'session'"
+    ).fetchone()
+    if not has_schema:
+        with current_app.open_resource("schema.sql", mode="r") as f:
+            db.cursor().executescript(f.read())
+        db.commit()
+    migrate_db()
+
+
+def get_migrations():
+    """
+    Returns (version, filename) pairs for the migrations in backend/migrations,
+    ordered by version. The version is the number the filename starts with,
+    e.g. 0001_hot_path_indexes.sql is version 1.
+    """
+    migrations_dir = os.path.join(current_app.root_path, MIGRATIONS_DIR)
+    migrations = []
+    for filename in os.listdir(migrations_dir):
+        if filename.endswith(".sql"):
+            migrations.append((int(filename.split("_", 1)[0]), filename))
+    return sorted(migrations)
+
+
+def split_sql_statements(script):
+    """
+    Splits a SQL script into complete statements. sqlite3.complete_statement
+    understands trigger bodies, so BEGIN ... END blocks are kept whole.
+    """
+    statements = []
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ""
+    if statement.strip():
+        statements.append(statement.strip())
+    return statements
+
+
+def migrate_db():
+    """
+    Applies any migrations newer than the database's PRAGMA user_version.
+    The version is read and all pending migrations are applied inside one
+    BEGIN IMMEDIATE transaction, so concurrent startups (e.g. several
+    workers) apply each migration exactly once and a failure leaves the
+    database at its previous version.
+    Returns the filenames of the migrations that were applied.
+    """
+    db = get_db()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        current_version = db.execute("PRAGMA user_version").fetchone()[0]
+
+        applied = []
+        for version, filename in get_migrations():
+            if version <= current_version:
+                continue
+            with current_app.open_resource(
+                os.path.join(MIGRATIONS_DIR, filename), mode="r"
+            ) as f:
+                script = f.read()
+            for statement in split_sql_statements(script):
+                db.execute(statement)
+            db.execute(f"PRAGMA user_version = {version}")
+            applied.append(filename)
+
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+
+    for filename in applied:
+        print(f"Applied database migration: {filename}")  # Log for debugging
+    return applied
 
 
 def query_db(query, args=(), one=False):
@@ -0,0 +1,136 @@
+# backend/export.py
+# Streaming export of the full workout history, one row per exercise_set
+# joined with its session, exercise, day and program titles. Rows are read
+# from a single SELECT in fetchmany batches and written out batch by batch,
+# so memory use stays flat however large the history is.
+import csv
+import datetime
+import io
+import json
+import os
+
+EXPORT_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+EXPORT_COLUMNS = [
+    "set_id",
+    "session_id",
+    "session_start_time",
+    "program_id",
+    "program_title",
+    "day_id",
+    "day_title",
+    "exercise_id",
+    "exercise_title",
+    "set_number",
+    "set_type",
+    "weight",
+    "reps",
+    "completed",
+    "is_personal_record",
+    "start_time",
+    "end_time",
+]
+
+
+def parse_since(value):
+    """
+    Parses an optional since timestamp (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)
+    into the session.start_time format. Raises ValueError when malformed.
+    """
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def get_last_set_id(db):
+    """
+    The newest exercise_set id, read before exporting. The export stops at
+    this id, so it is the after_id to resume from next time.
+    """
+    return db.execute("SELECT COALESCE(MAX(id), 0) FROM exercise_set").fetchone()[0]
+
+
+def iter_export_rows(
+    db, last_set_id, since=None, after_id=None, user_id=None, batch_size=None
+):
+    """
+    Yields lists of rows in exercise_set id order, batch_size rows at a time.
+    since limits the export to sessions started at or after that time,
+    after_id to sets created after a previous export and user_id to one
+    user's sessions.
+    """
+    cur = db.execute(
+        """
+        SELECT
+            es.id AS set_id,
+            s.id AS session_id,
+            s.start_time AS session_start_time,
+            p.id AS program_id,
+            p.title AS program_title,
+            d.id AS day_id,
+            d.title AS day_title,
+            e.id AS exercise_id,
+            e.title AS exercise_title,
+            es.set_number,
+            es.set_type,
+            es.weight,
+            es.reps,
+            es.completed,
+            es.is_personal_record,
+            es.start_time,
+            es.end_time
+        FROM exercise_set es
+        JOIN session s ON es.session_id = s.id
+        JOIN day d ON s.day_id = d.id
+        JOIN program p ON d.program_id = p.id
+        JOIN exercise e ON es.exercise_id = e.id
+        WHERE es.id > ?
+          AND es.id <= ?
+          AND (? IS NULL OR s.start_time >= ?)
+          AND (? IS NULL OR s.user_id = ?)
+        ORDER BY es.id
+    """,
+        (after_id or 0, last_set_id, since, since, user_id, user_id),
+    )
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size or EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+
+def format_csv(batches):
+    """Yields CSV text, a header line then one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows(tuple(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # The header alone when there was nothing to export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def format_jsonl(batches):
+    """Yields JSON Lines text, one object per row and one chunk per batch."""
+    for rows in batches:
+        yield "".join(json.dumps(dict(row)) + "\n" for row in rows)
+
+
+def generate_export(db, export_format, since=None, after_id=None, user_id=None):
+    """
+    Returns (last_set_id, chunks) where chunks is a generator of text in
+    export_format ("csv" or "jsonl"). user_id None exports every user.
+    """
+    last_set_id = get_last_set_id(db)
+    batches = iter_export_rows(db, last_set_id, since, after_id, user_id)
+    if export_format == "csv":
+        return last_set_id, format_csv(batches)
+    return last_set_id, format_jsonl(batches)
@@ -0,0 +1,50 @@
+# backend/gunicorn_conf.py
+# Gunicorn settings for the production serving mode, used by
+# docker-entrypoint.sh as: gunicorn --config python:backend.gunicorn_conf 'backend.app:create_app()'
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Worker processes and threads per worker. SQLite serialises writers anyway,
+# so a couple of processes with a few threads each is plenty for this app.
+workers = int(os.getenv("WEB_WORKERS", "2"))
+threads = int(os.getenv("WEB_THREADS", "4"))
+worker_class = "gthread"
+
+# Seconds to hold idle keep-alive connections open (phones reuse them between sets)
+keepalive = int(os.getenv("WEB_KEEPALIVE", "5"))
+# Seconds a silent worker is allowed before it is killed and restarted
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+# Seconds workers get to finish in-flight requests on SIGTERM (docker stop)
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "20"))
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """
+    Runs once in the master process before any workers are forked: creates
+    the database if it does not exist, otherwise applies pending migrations.
+    """
+    from backend.app import create_app
+    from backend.database import init_db, close_pool
+
+    with create_app().app_context():
+        init_db()
+    # Don't let workers inherit the master's SQLite connections
+    close_pool()
+
+
+def post_fork(server, worker):
+    """Each worker starts with an empty connection pool of its own."""
+    from backend.database import close_pool
+
+    close_pool()
+
+
+def post_worker_init(worker):
+    """Once the app is loaded in a worker, starts its backup scheduler."""
+    from backend import backup
+
+    backup.start_scheduler()
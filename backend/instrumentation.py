@@ -0,0 +1,185 @@
+# backend/instrumentation.py
+# Per-request SQL profiling and process-wide metrics.
+#
+# Every connection from database.connect_db is a ProfiledConnection, which
+# times each statement. Statements run during a request are collected on g
+# and reported in a Server-Timing header, statements slower than
+# SLOW_QUERY_MS are logged, and totals are exported in Prometheus text format
+# by the /metrics route. Metrics are per process, so each gunicorn worker
+# reports its own.
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask import g, has_app_context, request
+
+# Statements slower than this many milliseconds are logged
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+METRIC_PREFIX = "myfitnessapp_"
+
+_lock = threading.Lock()
+_metric_types = {}  # name -> (type, help)
+_metric_values = {}  # (name, labels) -> value
+
+
+# --- Metrics registry ---
+
+
+def register_metric(name, metric_type, help_text):
+    """Declares a counter or gauge so /metrics can print its TYPE and HELP."""
+    _metric_types[METRIC_PREFIX + name] = (metric_type, help_text)
+
+
+def inc_counter(name, value=1, **labels):
+    key = (METRIC_PREFIX + name, tuple(sorted(labels.items())))
+    with _lock:
+        _metric_values[key] = _metric_values.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    key = (METRIC_PREFIX + name, tuple(sorted(labels.items())))
+    with _lock:
+        _metric_values[key] = value
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics():
+    """Returns every metric in the Prometheus text exposition format."""
+    with _lock:
+        values = sorted(_metric_values.items())
+
+    lines = []
+    described = set()
+    for (name, labels), value in values:
+        if name not in described and name in _metric_types:
+            metric_type, help_text = _metric_types[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            described.add(name)
+        label_text = ""
+        if labels:
+            label_text = (
+                "{"
+                + ",".join(f'{key}="{_escape_label_value(val)}"' for key, val in labels)
+                + "}"
+            )
+        lines.append(f"{name}{label_text} {value}")
+    return "\n".join(lines) + "\n"
+
+
+register_metric("http_requests_total", "counter", "HTTP requests handled.")
+register_metric(
+    "http_request_duration_seconds_total", "counter", "Time spent handling HTTP requests."
+)
+register_metric("sql_statements_total", "counter", "SQL statements executed.")
+register_metric(
+    "sql_statement_duration_seconds_total", "counter", "Time spent executing SQL statements."
+)
+register_metric("sql_slow_statements_total", "counter", "SQL statements slower than SLOW_QUERY_MS.")
+
+
+# --- SQL profiling ---
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r"\b\d+(?:\.\d+)?\b")
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Collapses whitespace and replaces literals with ? so similar statements group together."""
+    sql = _string_literal.sub("?", sql)
+    sql = _number_literal.sub("?", sql)
+    return _whitespace.sub(" ", sql).strip()
+
+
+def record_statement(sql, duration):
+    """Records one executed statement against the current request and the metrics."""
+    statement = normalize_sql(sql)
+    endpoint = "background"
+    if has_app_context():
+        stats = g.get("_query_stats")
+        if stats is not None:
+            stats.append((statement, duration))
+            endpoint = g.get("_metrics_endpoint", endpoint)
+
+    inc_counter("sql_statements_total", endpoint=endpoint)
+    inc_counter("sql_statement_duration_seconds_total", duration, statement=statement)
+
+    if duration * 1000 >= SLOW_QUERY_MS:
+        inc_counter("sql_slow_statements_total", endpoint=endpoint)
+        print(f"Slow query ({duration * 1000:.1f} ms, {endpoint}): {statement}")
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection that times every execute/executemany/executescript."""
+
+    def execute(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            record_statement(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            record_statement(sql, time.perf_counter() - started)
+
+    def executescript(self, sql):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql)
+        finally:
+            record_statement(sql, time.perf_counter() - started)
+
+
+# --- Request hooks ---
+
+
+def _start_request():
+    g._request_started = time.perf_counter()
+    g._query_stats = []
+    g._metrics_endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _finish_request(response):
+    started = g.get("_request_started")
+    stats = g.get("_query_stats")
+    if started is None or stats is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    total_sql = sum(duration for _, duration in stats)
+    slowest_sql = max((duration for _, duration in stats), default=0.0)
+
+    # e.g. Server-Timing: db;dur=3.1;desc="7 queries", db-slowest;dur=1.2, app;dur=9.8
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={total_sql * 1000:.2f};desc="{len(stats)} queries", '
+        f"db-slowest;dur={slowest_sql * 1000:.2f}, "
+        f"app;dur={elapsed * 1000:.2f}",
+    )
+
+    endpoint = g._metrics_endpoint
+    inc_counter(
+        "http_requests_total",
+        endpoint=endpoint,
+        method=request.method,
+        status=response.status_code,
+    )
+    inc_counter("http_request_duration_seconds_total", elapsed, endpoint=endpoint)
+    return response
+
+
+def init_app(app):
+    """Registers the request hooks that collect per-request SQL stats."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
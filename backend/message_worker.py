@@ -0,0 +1,149 @@
+# backend/message_worker.py
+# Generates completed-session messages in background threads and caches
+# them in the session_message table, so HTTP workers never wait on OpenAI.
+# A message is 'pending' while it is generated, then 'ready', or 'failed' if
+# OpenAI could not be reached; failed messages are generated again when the
+# session's message is next requested after MESSAGE_RETRY_INTERVAL.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .database import get_db, query_db
+from . import openai_service
+
+# Number of messages that can be generated at the same time
+MESSAGE_WORKERS = int(os.getenv("MESSAGE_WORKERS", "2"))
+
+# A message still pending after this many seconds is assumed lost (e.g. the
+# process restarted mid-generation) and is queued again
+MESSAGE_PENDING_TIMEOUT = int(os.getenv("MESSAGE_PENDING_TIMEOUT", "120"))
+
+# Seconds before a failed message is generated again
+MESSAGE_RETRY_INTERVAL = int(os.getenv("MESSAGE_RETRY_INTERVAL", "60"))
+
+# Shown instead of a failed message until it is retried
+FALLBACK_MESSAGE = "Awesome work today! Keep up the effort. 💪"
+
+_executor = ThreadPoolExecutor(
+    max_workers=MESSAGE_WORKERS, thread_name_prefix="session-message"
+)
+
+
+def get_session_message(session_id):
+    """Returns the session_message row for a session, or None."""
+    return query_db(
+        """
+        SELECT session_id, status, message, history_sessions, included_sessions,
+               raw_history_tokens, history_tokens, prompt_tokens
+        FROM session_message
+        WHERE session_id = ?
+    """,
+        (session_id,),
+        one=True,
+    )
+
+
+def request_session_message(username, session_id):
+    """
+    Queues generation of the message for a session unless one is already
+    ready, pending, or failed less than MESSAGE_RETRY_INTERVAL ago. Returns
+    True if it was queued. Safe to call repeatedly, e.g. on every page reload.
+    """
+    db = get_db()
+    cursor = db.execute(
+        "INSERT OR IGNORE INTO session_message (session_id, status) VALUES (?, 'pending')",
+        (session_id,),
+    )
+    queued = cursor.rowcount > 0
+    if not queued:
+        # Re-queue a pending message whose generation was lost, or a failed
+        # message once the retry interval has passed
+        cursor = db.execute(
+            """
+            UPDATE session_message
+            SET status = 'pending',
+                created_at = datetime('now','localtime')
+            WHERE session_id = ?
+              AND (
+                (status = 'pending' AND created_at < datetime('now','localtime', ?))
+                OR (status = 'failed' AND updated_at <= datetime('now','localtime', ?))
+              )
+        """,
+            (
+                session_id,
+                f"-{MESSAGE_PENDING_TIMEOUT} seconds",
+                f"-{MESSAGE_RETRY_INTERVAL} seconds",
+            ),
+        )
+        queued = cursor.rowcount > 0
+    db.commit()
+
+    if queued:
+        app = current_app._get_current_object()
+        _executor.submit(_generate_session_message, app, username, session_id)
+    return queued
+
+
+def _generate_session_message(app, username, session_id):
+    """Background task: generate the message and store it as ready or failed."""
+    with app.app_context():
+        try:
+            # OPENAI_CHAT_CLIENT lets a stub chat completions client stand in
+            # for the real OpenAI client
+            prompt_metrics = {}
+            message = openai_service.generate_motivational_message_for_session(
+                username,
+                session_id,
+                query_db,
+                chat_client=app.config.get("OPENAI_CHAT_CLIENT"),
+                prompt_metrics=prompt_metrics,
+            )
+            db = get_db()
+            db.execute(
+                """
+                UPDATE session_message
+                SET status = 'ready',
+                    message = ?,
+                    history_sessions = ?,
+                    included_sessions = ?,
+                    raw_history_tokens = ?,
+                    history_tokens = ?,
+                    prompt_tokens = ?,
+                    updated_at = datetime('now','localtime')
+                WHERE session_id = ?
+            """,
+                (
+                    message,
+                    prompt_metrics.get("history_sessions"),
+                    prompt_metrics.get("included_sessions"),
+                    prompt_metrics.get("raw_history_tokens"),
+                    prompt_metrics.get("history_tokens"),
+                    prompt_metrics.get("prompt_tokens"),
+                    session_id,
+                ),
+            )
+            db.commit()
+        except Exception as e:
+            print(f"Error generating message for session {session_id}: {e}")
+            _store_failed(session_id)
+
+
+def _store_failed(session_id):
+    """Marks a message as failed, so it is retried instead of showing a fallback forever."""
+    try:
+        db = get_db()
+        db.rollback()
+        db.execute(
+            """
+            UPDATE session_message
+            SET status = 'failed',
+                message = NULL,
+                updated_at = datetime('now','localtime')
+            WHERE session_id = ?
+        """,
+            (session_id,),
+        )
+        db.commit()
+    except Exception as e:
+        print(f"Error storing the failed message of session {session_id}: {e}")
@@ -0,0 +1,22 @@
+-- backend/migrations/0001_hot_path_indexes.sql
+--
+-- Secondary indexes for the exercise_set/session lookups done on every
+-- request (session exercise details, previous session prefill, AI history,
+-- recent sessions).
+--
+
+-- Sets of one session, optionally narrowed to one exercise, in set order
+CREATE INDEX IF NOT EXISTS idx_exercise_set_session_exercise
+    ON exercise_set (session_id, exercise_id, set_number);
+
+-- History of one exercise across sessions (previous session prefill)
+CREATE INDEX IF NOT EXISTS idx_exercise_set_exercise_session
+    ON exercise_set (exercise_id, session_id);
+
+-- Most recent sessions first
+CREATE INDEX IF NOT EXISTS idx_session_start_time
+    ON session (start_time DESC, id DESC);
+
+-- Exercises of one day in sequence
+CREATE INDEX IF NOT EXISTS idx_day_exercise_day_sequence
+    ON day_exercise (day_id, exercise_sequence);
@@ -0,0 +1,18 @@
+-- backend/migrations/0002_session_message.sql
+--
+-- Completed-session messages generated in the background, so the
+-- workout complete page is served from here instead of waiting on OpenAI.
+--
+
+-- Table: session_message
+-- status is 'pending' while the message is being generated, then 'ready'
+CREATE TABLE IF NOT EXISTS session_message (
+    session_id  INTEGER PRIMARY KEY
+                        NOT NULL
+                        REFERENCES session (id),
+    status      TEXT    NOT NULL,
+    message     TEXT,
+    created_at  TEXT    NOT NULL
+                        DEFAULT (datetime('now','localtime')),
+    updated_at  TEXT
+);
@@ -0,0 +1,10 @@
+-- backend/migrations/0003_session_message_prompt_metrics.sql
+--
+-- Prompt size metrics recorded with each generated session message.
+--
+
+ALTER TABLE session_message ADD COLUMN history_sessions INTEGER;
+ALTER TABLE session_message ADD COLUMN included_sessions INTEGER;
+ALTER TABLE session_message ADD COLUMN raw_history_tokens INTEGER;
+ALTER TABLE session_message ADD COLUMN history_tokens INTEGER;
+ALTER TABLE session_message ADD COLUMN prompt_tokens INTEGER;
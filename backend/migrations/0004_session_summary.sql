@@ -0,0 +1,126 @@
+-- backend/migrations/0004_session_summary.sql
+--
+-- Materialized per-session summary for /api/sessions/recent, so the home
+-- page reads the newest rows straight from an index instead of joining and
+-- grouping every session ever recorded. Triggers keep it up to date when
+-- sessions are created and when days, programs or exercises are edited.
+--
+
+-- View: session_summary_source
+-- How a summary row is computed. The triggers below refresh rows from it.
+CREATE VIEW IF NOT EXISTS session_summary_source AS
+SELECT
+    s.id AS session_id,
+    s.start_time AS session_start_time,
+    DATE(s.start_time) AS session_date_display,
+    s.day_id AS day_id,
+    d.title AS day_title,
+    p.title AS program_title,
+    (
+        SELECT GROUP_CONCAT(title, ', ')
+        FROM (
+            SELECT e.title
+            FROM day_exercise de
+            JOIN exercise e ON de.exercise_id = e.id
+            WHERE de.day_id = s.day_id
+            ORDER BY de.exercise_sequence
+        )
+    ) AS exercise_summary
+FROM session s
+JOIN day d ON s.day_id = d.id
+JOIN program p ON d.program_id = p.id;
+
+-- Table: session_summary
+CREATE TABLE IF NOT EXISTS session_summary (
+    session_id            INTEGER PRIMARY KEY
+                                  NOT NULL,
+    session_start_time    TEXT    NOT NULL,
+    session_date_display  TEXT,
+    day_id                INTEGER NOT NULL,
+    day_title             TEXT,
+    program_title         TEXT,
+    exercise_summary      TEXT
+);
+
+-- Newest first, with session_id as the tie-breaker for cursor pagination
+CREATE INDEX IF NOT EXISTS idx_session_summary_start_time
+    ON session_summary (session_start_time DESC, session_id DESC);
+
+-- Sessions of one day, for refreshing summaries after day/exercise edits
+CREATE INDEX IF NOT EXISTS idx_session_summary_day
+    ON session_summary (day_id);
+
+-- Sessions of one day, used by the day_exercise/exercise triggers below
+CREATE INDEX IF NOT EXISTS idx_session_day
+    ON session (day_id);
+
+-- Backfill existing sessions
+INSERT OR REPLACE INTO session_summary
+SELECT * FROM session_summary_source;
+
+-- Triggers: session
+CREATE TRIGGER IF NOT EXISTS session_summary_session_insert
+AFTER INSERT ON session
+BEGIN
+    INSERT OR REPLACE INTO session_summary
+    SELECT * FROM session_summary_source WHERE session_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS session_summary_session_update
+AFTER UPDATE OF start_time, day_id ON session
+BEGIN
+    INSERT OR REPLACE INTO session_summary
+    SELECT * FROM session_summary_source WHERE session_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS session_summary_session_delete
+AFTER DELETE ON session
+BEGIN
+    DELETE FROM session_summary WHERE session_id = OLD.id;
+END;
+
+-- Triggers: day and program titles
+CREATE TRIGGER IF NOT EXISTS session_summary_day_update
+AFTER UPDATE OF title, program_id ON day
+BEGIN
+    INSERT OR REPLACE INTO session_summary
+    SELECT * FROM session_summary_source WHERE day_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS session_summary_program_update
+AFTER UPDATE OF title ON program
+BEGIN
+    UPDATE session_summary
+    SET program_title = NEW.title
+    WHERE day_id IN (SELECT id FROM day WHERE program_id = NEW.id);
+END;
+
+-- Triggers: exercises of a day
+CREATE TRIGGER IF NOT EXISTS session_summary_day_exercise_insert
+AFTER INSERT ON day_exercise
+BEGIN
+    INSERT OR REPLACE INTO session_summary
+    SELECT * FROM session_summary_source WHERE day_id = NEW.day_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS session_summary_day_exercise_update
+AFTER UPDATE ON day_exercise
+BEGIN
+    INSERT OR REPLACE INTO session_summary
+    SELECT * FROM session_summary_source WHERE day_id IN (OLD.day_id, NEW.day_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS session_summary_day_exercise_delete
+AFTER DELETE ON day_exercise
+BEGIN
+    INSERT OR REPLACE INTO session_summary
+    SELECT * FROM session_summary_source WHERE day_id = OLD.day_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS session_summary_exercise_update
+AFTER UPDATE OF title ON exercise
+BEGIN
+    INSERT OR REPLACE INTO session_summary
+    SELECT * FROM session_summary_source
+    WHERE day_id IN (SELECT day_id FROM day_exercise WHERE exercise_id = NEW.id);
+END;
@@ -0,0 +1,96 @@
+-- backend/migrations/0005_reference_generation.sql
+--
+-- Generation counter for the reference data (program, day, day_exercise,
+-- exercise). Triggers bump it on every write, so the in-process reference
+-- cache in each worker can tell when its entries are stale, including after
+-- edits made outside the app (e.g. in SQLiteStudio).
+--
+
+-- Table: reference_generation
+-- Always holds exactly one row
+CREATE TABLE IF NOT EXISTS reference_generation (
+    generation INTEGER NOT NULL
+);
+
+INSERT INTO reference_generation (generation)
+SELECT 0
+WHERE NOT EXISTS (SELECT 1 FROM reference_generation);
+
+-- Triggers: program
+CREATE TRIGGER IF NOT EXISTS reference_generation_program_insert
+AFTER INSERT ON program
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_program_update
+AFTER UPDATE ON program
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_program_delete
+AFTER DELETE ON program
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+
+-- Triggers: day
+CREATE TRIGGER IF NOT EXISTS reference_generation_day_insert
+AFTER INSERT ON day
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_day_update
+AFTER UPDATE ON day
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_day_delete
+AFTER DELETE ON day
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+
+-- Triggers: day_exercise
+CREATE TRIGGER IF NOT EXISTS reference_generation_day_exercise_insert
+AFTER INSERT ON day_exercise
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_day_exercise_update
+AFTER UPDATE ON day_exercise
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_day_exercise_delete
+AFTER DELETE ON day_exercise
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+
+-- Triggers: exercise
+CREATE TRIGGER IF NOT EXISTS reference_generation_exercise_insert
+AFTER INSERT ON exercise
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_exercise_update
+AFTER UPDATE ON exercise
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_exercise_delete
+AFTER DELETE ON exercise
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
@@ -0,0 +1,126 @@
+-- backend/migrations/0006_exercise_session_stats.sql
+--
+-- Per exercise, per session rollup of completed working sets (top set,
+-- estimated 1RM, tonnage), maintained incrementally by triggers so the
+-- progress and stats endpoints read one small row per session instead of
+-- aggregating every set ever logged.
+--
+
+-- View: exercise_session_stats_source
+-- How a rollup row is computed. Only completed working sets with a weight
+-- and at least one rep count. Estimated 1RM uses the Epley
+-- (w * (1 + r / 30)) and Brzycki (w * 36 / (37 - r)) formulas; a single rep
+-- is the 1RM itself.
+CREATE VIEW IF NOT EXISTS exercise_session_stats_source AS
+SELECT
+    es.session_id,
+    es.exercise_id,
+    s.start_time,
+    MAX(es.weight) AS top_weight,
+    (
+        SELECT t.reps
+        FROM exercise_set t
+        WHERE t.session_id = es.session_id
+          AND t.exercise_id = es.exercise_id
+          AND t.set_type = 'working'
+          AND t.completed
+          AND t.weight IS NOT NULL
+          AND t.reps > 0
+        ORDER BY t.weight DESC, t.reps DESC
+        LIMIT 1
+    ) AS top_reps,
+    MAX(CASE WHEN es.reps = 1 THEN es.weight
+             ELSE es.weight * (1 + es.reps / 30.0) END) AS e1rm_epley,
+    MAX(CASE WHEN es.reps < 37 THEN es.weight * 36.0 / (37 - es.reps) END) AS e1rm_brzycki,
+    SUM(es.weight * es.reps) AS tonnage,
+    SUM(es.reps) AS total_reps,
+    COUNT(*) AS set_count
+FROM exercise_set es
+JOIN session s ON es.session_id = s.id
+WHERE es.set_type = 'working'
+  AND es.completed
+  AND es.weight IS NOT NULL
+  AND es.reps > 0
+GROUP BY es.session_id, es.exercise_id;
+
+-- Table: exercise_session_stats
+CREATE TABLE IF NOT EXISTS exercise_session_stats (
+    session_id    INTEGER NOT NULL,
+    exercise_id   INTEGER NOT NULL,
+    start_time    TEXT    NOT NULL,
+    top_weight    REAL,
+    top_reps      INTEGER,
+    e1rm_epley    REAL,
+    e1rm_brzycki  REAL,
+    tonnage       REAL,
+    total_reps    INTEGER,
+    set_count     INTEGER,
+    PRIMARY KEY (session_id, exercise_id)
+);
+
+-- Progress of one exercise over time
+CREATE INDEX IF NOT EXISTS idx_exercise_session_stats_exercise_time
+    ON exercise_session_stats (exercise_id, start_time);
+
+-- All exercises over a date range
+CREATE INDEX IF NOT EXISTS idx_exercise_session_stats_time
+    ON exercise_session_stats (start_time);
+
+-- Backfill existing sessions
+INSERT OR REPLACE INTO exercise_session_stats
+SELECT * FROM exercise_session_stats_source;
+
+-- Triggers: exercise_set
+-- Sets that are not completed never count, so most inserts and edits of
+-- sets in progress skip the refresh
+CREATE TRIGGER IF NOT EXISTS exercise_session_stats_set_insert
+AFTER INSERT ON exercise_set
+WHEN NEW.completed
+BEGIN
+    DELETE FROM exercise_session_stats
+    WHERE session_id = NEW.session_id AND exercise_id = NEW.exercise_id;
+    INSERT INTO exercise_session_stats
+    SELECT * FROM exercise_session_stats_source
+    WHERE session_id = NEW.session_id AND exercise_id = NEW.exercise_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS exercise_session_stats_set_update
+AFTER UPDATE OF session_id, exercise_id, set_type, weight, reps, completed ON exercise_set
+WHEN OLD.completed OR NEW.completed
+BEGIN
+    DELETE FROM exercise_session_stats
+    WHERE (session_id = OLD.session_id AND exercise_id = OLD.exercise_id)
+       OR (session_id = NEW.session_id AND exercise_id = NEW.exercise_id);
+    INSERT INTO exercise_session_stats
+    SELECT * FROM exercise_session_stats_source
+    WHERE session_id = OLD.session_id AND exercise_id = OLD.exercise_id;
+    INSERT OR REPLACE INTO exercise_session_stats
+    SELECT * FROM exercise_session_stats_source
+    WHERE session_id = NEW.session_id AND exercise_id = NEW.exercise_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS exercise_session_stats_set_delete
+AFTER DELETE ON exercise_set
+WHEN OLD.completed
+BEGIN
+    DELETE FROM exercise_session_stats
+    WHERE session_id = OLD.session_id AND exercise_id = OLD.exercise_id;
+    INSERT INTO exercise_session_stats
+    SELECT * FROM exercise_session_stats_source
+    WHERE session_id = OLD.session_id AND exercise_id = OLD.exercise_id;
+END;
+
+-- Triggers: session
+CREATE TRIGGER IF NOT EXISTS exercise_session_stats_session_update
+AFTER UPDATE OF start_time ON session
+BEGIN
+    UPDATE exercise_session_stats
+    SET start_time = NEW.start_time
+    WHERE session_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS exercise_session_stats_session_delete
+AFTER DELETE ON session
+BEGIN
+    DELETE FROM exercise_session_stats WHERE session_id = OLD.id;
+END;
@@ -0,0 +1,27 @@
+-- backend/migrations/0007_personal_record.sql
+--
+-- Personal records: the heaviest completed working set for each exercise
+-- and rep count, kept up to date as sets are completed (see
+-- personal_records.py). Existing history is indexed by running
+-- `flask rebuild-prs`.
+--
+
+-- Table: personal_record
+CREATE TABLE IF NOT EXISTS personal_record (
+    exercise_id  INTEGER NOT NULL
+                         REFERENCES exercise (id),
+    reps         INTEGER NOT NULL,
+    weight       REAL    NOT NULL,
+    set_id       INTEGER NOT NULL
+                         REFERENCES exercise_set (id),
+    session_id   INTEGER NOT NULL,
+    PRIMARY KEY (exercise_id, reps)
+) WITHOUT ROWID;
+
+-- Records held by a set, for when that set is edited or un-completed
+CREATE INDEX IF NOT EXISTS idx_personal_record_set
+    ON personal_record (set_id);
+
+-- Whether the set beat the previous record for its exercise and rep count
+-- when it was completed
+ALTER TABLE exercise_set ADD COLUMN is_personal_record BOOLEAN DEFAULT FALSE;
@@ -0,0 +1,144 @@
+-- backend/migrations/0008_multi_user.sql
+--
+-- Multiple users on one instance. Sessions belong to a user and programs
+-- either to a user or, with a NULL user_id, to everyone. The rollup tables
+-- (session_summary, exercise_session_stats, personal_record) carry the
+-- session's user_id and every index used by a per-user query leads on
+-- user_id, so a user's queries only read that user's rows however many
+-- users share the database. Existing data belongs to user 1.
+--
+
+-- Table: user
+-- token_hash is the SHA-256 of the user's API token, see auth.py
+CREATE TABLE IF NOT EXISTS user (
+    id          INTEGER PRIMARY KEY
+                        NOT NULL,
+    name        TEXT    NOT NULL
+                        UNIQUE,
+    token_hash  TEXT    UNIQUE,
+    created_at  TEXT    NOT NULL
+                        DEFAULT (datetime('now','localtime'))
+);
+
+INSERT INTO user (id, name)
+SELECT 1, 'Dale'
+WHERE NOT EXISTS (SELECT 1 FROM user WHERE id = 1);
+
+-- A column added with a non-NULL default can't have a REFERENCES clause
+-- while foreign keys are enforced, so session.user_id is not a foreign key
+ALTER TABLE session ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+
+-- NULL is a program shared by every user
+ALTER TABLE program ADD COLUMN user_id INTEGER REFERENCES user (id);
+
+-- One user's sessions, newest first
+DROP INDEX IF EXISTS idx_session_start_time;
+CREATE INDEX IF NOT EXISTS idx_session_user_start_time
+    ON session (user_id, start_time DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_program_user
+    ON program (user_id);
+
+-- session_summary
+-- user_id is the last column of both the view and the table, so the
+-- triggers' SELECT * refreshes keep lining up
+DROP VIEW IF EXISTS session_summary_source;
+CREATE VIEW IF NOT EXISTS session_summary_source AS
+SELECT
+    s.id AS session_id,
+    s.start_time AS session_start_time,
+    DATE(s.start_time) AS session_date_display,
+    s.day_id AS day_id,
+    d.title AS day_title,
+    p.title AS program_title,
+    (
+        SELECT GROUP_CONCAT(title, ', ')
+        FROM (
+            SELECT e.title
+            FROM day_exercise de
+            JOIN exercise e ON de.exercise_id = e.id
+            WHERE de.day_id = s.day_id
+            ORDER BY de.exercise_sequence
+        )
+    ) AS exercise_summary,
+    s.user_id AS user_id
+FROM session s
+JOIN day d ON s.day_id = d.id
+JOIN program p ON d.program_id = p.id;
+
+ALTER TABLE session_summary ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+
+DROP INDEX IF EXISTS idx_session_summary_start_time;
+CREATE INDEX IF NOT EXISTS idx_session_summary_user_start_time
+    ON session_summary (user_id, session_start_time DESC, session_id DESC);
+
+-- exercise_session_stats
+DROP VIEW IF EXISTS exercise_session_stats_source;
+CREATE VIEW IF NOT EXISTS exercise_session_stats_source AS
+SELECT
+    es.session_id,
+    es.exercise_id,
+    s.start_time,
+    MAX(es.weight) AS top_weight,
+    (
+        SELECT t.reps
+        FROM exercise_set t
+        WHERE t.session_id = es.session_id
+          AND t.exercise_id = es.exercise_id
+          AND t.set_type = 'working'
+          AND t.completed
+          AND t.weight IS NOT NULL
+          AND t.reps > 0
+        ORDER BY t.weight DESC, t.reps DESC
+        LIMIT 1
+    ) AS top_reps,
+    MAX(CASE WHEN es.reps = 1 THEN es.weight
+             ELSE es.weight * (1 + es.reps / 30.0) END) AS e1rm_epley,
+    MAX(CASE WHEN es.reps < 37 THEN es.weight * 36.0 / (37 - es.reps) END) AS e1rm_brzycki,
+    SUM(es.weight * es.reps) AS tonnage,
+    SUM(es.reps) AS total_reps,
+    COUNT(*) AS set_count,
+    s.user_id
+FROM exercise_set es
+JOIN session s ON es.session_id = s.id
+WHERE es.set_type = 'working'
+  AND es.completed
+  AND es.weight IS NOT NULL
+  AND es.reps > 0
+GROUP BY es.session_id, es.exercise_id;
+
+ALTER TABLE exercise_session_stats ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+
+DROP INDEX IF EXISTS idx_exercise_session_stats_exercise_time;
+CREATE INDEX IF NOT EXISTS idx_exercise_session_stats_user_exercise_time
+    ON exercise_session_stats (user_id, exercise_id, start_time);
+
+DROP INDEX IF EXISTS idx_exercise_session_stats_time;
+CREATE INDEX IF NOT EXISTS idx_exercise_session_stats_user_time
+    ON exercise_session_stats (user_id, start_time);
+
+-- personal_record
+-- Records are per user, so user_id joins the primary key and the table is
+-- rebuilt
+CREATE TABLE IF NOT EXISTS personal_record_by_user (
+    user_id      INTEGER NOT NULL,
+    exercise_id  INTEGER NOT NULL
+                         REFERENCES exercise (id),
+    reps         INTEGER NOT NULL,
+    weight       REAL    NOT NULL,
+    set_id       INTEGER NOT NULL
+                         REFERENCES exercise_set (id),
+    session_id   INTEGER NOT NULL,
+    PRIMARY KEY (user_id, exercise_id, reps)
+) WITHOUT ROWID;
+
+INSERT INTO personal_record_by_user (user_id, exercise_id, reps, weight, set_id, session_id)
+SELECT 1, exercise_id, reps, weight, set_id, session_id
+FROM personal_record;
+
+DROP TABLE personal_record;
+
+ALTER TABLE personal_record_by_user RENAME TO personal_record;
+
+CREATE INDEX IF NOT EXISTS idx_personal_record_set
+    ON personal_record (set_id);
@@ -0,0 +1,52 @@
+-- backend/migrations/0009_progression_rule.sql
+--
+-- Progression rules, evaluated when a session is created to prescribe the
+-- weight and reps of its working sets (see progression.py). A rule belongs
+-- to a program and applies to every exercise of the program, or only to one
+-- day_exercise when day_exercise_id is set. Rules are tried in priority
+-- order and the first one that applies wins; exercises without a matching
+-- rule repeat their previous session.
+--
+-- rule_type and parameters (JSON):
+--   linear       {"increment": 2.5, "reps": 5}
+--   deload       {"after_failures": 3, "percent": 10, "reps": 5}
+--   percent_1rm  {"training_max": 90, "weeks": [{"percent": [65, 75, 85], "reps": [5, 5, 5]}, ...]}
+-- Every rule also accepts "round_to" (default 2.5).
+--
+
+-- Table: progression_rule
+CREATE TABLE IF NOT EXISTS progression_rule (
+    id               INTEGER PRIMARY KEY
+                             NOT NULL,
+    program_id       INTEGER NOT NULL
+                             REFERENCES program (id),
+    day_exercise_id  INTEGER REFERENCES day_exercise (id),
+    rule_type        TEXT    NOT NULL,
+    parameters       TEXT    NOT NULL
+                             DEFAULT '{}',
+    priority         INTEGER NOT NULL
+                             DEFAULT 0
+);
+
+-- Rules of one program in evaluation order
+CREATE INDEX IF NOT EXISTS idx_progression_rule_program
+    ON progression_rule (program_id, priority, id);
+
+-- Rules are reference data, cached per program like days and exercises
+CREATE TRIGGER IF NOT EXISTS reference_generation_progression_rule_insert
+AFTER INSERT ON progression_rule
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_progression_rule_update
+AFTER UPDATE ON progression_rule
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_progression_rule_delete
+AFTER DELETE ON progression_rule
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
@@ -0,0 +1,103 @@
+-- backend/migrations/0010_sync.sql
+--
+-- Change log for offline sync (see sync.py). Triggers record every insert,
+-- update and delete of a session or exercise_set in sync_change under a new,
+-- ever increasing seq, replacing the row's previous entry, so
+-- GET /api/sync?since=<seq> returns each changed row once however often it
+-- was edited. SQLite has a single writer, so changes commit in seq order and
+-- a client that has seen seq N has seen every change up to N.
+--
+-- Only changes made after this migration are logged. Clients start from the
+-- sync_seq of a session bundle, not from 0.
+--
+
+-- Table: sync_change
+-- AUTOINCREMENT so a seq is never reused, even after the newest row is replaced
+CREATE TABLE IF NOT EXISTS sync_change (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT
+                        NOT NULL,
+    user_id     INTEGER,
+    table_name  TEXT    NOT NULL,
+    row_id      INTEGER NOT NULL,
+    deleted     BOOLEAN NOT NULL
+                        DEFAULT FALSE
+);
+
+-- One entry per row, replaced on every change
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_change_row
+    ON sync_change (table_name, row_id);
+
+-- One user's changes after a seq
+CREATE INDEX IF NOT EXISTS idx_sync_change_user_seq
+    ON sync_change (user_id, seq);
+
+
+-- Table: sync_mutation
+-- Client mutation ids already applied by POST /api/sync, so a batch that is
+-- sent again (e.g. the response was lost) is not applied twice
+CREATE TABLE IF NOT EXISTS sync_mutation (
+    user_id      INTEGER NOT NULL,
+    mutation_id  TEXT    NOT NULL,
+    applied_at   TEXT    NOT NULL
+                         DEFAULT (datetime('now','localtime')),
+    PRIMARY KEY (user_id, mutation_id)
+);
+
+-- Old ids are pruned by applied_at
+CREATE INDEX IF NOT EXISTS idx_sync_mutation_applied_at
+    ON sync_mutation (applied_at);
+
+
+-- Triggers: session
+-- The previous entry is deleted rather than using INSERT OR REPLACE, which
+-- the conflict clause of the outer statement (e.g. INSERT OR IGNORE) would override
+CREATE TRIGGER IF NOT EXISTS sync_change_session_insert
+AFTER INSERT ON session
+BEGIN
+    DELETE FROM sync_change WHERE table_name = 'session' AND row_id = NEW.id;
+    INSERT INTO sync_change (user_id, table_name, row_id)
+    VALUES (NEW.user_id, 'session', NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sync_change_session_update
+AFTER UPDATE ON session
+BEGIN
+    DELETE FROM sync_change WHERE table_name = 'session' AND row_id = NEW.id;
+    INSERT INTO sync_change (user_id, table_name, row_id)
+    VALUES (NEW.user_id, 'session', NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sync_change_session_delete
+AFTER DELETE ON session
+BEGIN
+    DELETE FROM sync_change WHERE table_name = 'session' AND row_id = OLD.id;
+    INSERT INTO sync_change (user_id, table_name, row_id, deleted)
+    VALUES (OLD.user_id, 'session', OLD.id, TRUE);
+END;
+
+
+-- Triggers: exercise_set
+-- A set's user is the user of its session
+CREATE TRIGGER IF NOT EXISTS sync_change_exercise_set_insert
+AFTER INSERT ON exercise_set
+BEGIN
+    DELETE FROM sync_change WHERE table_name = 'exercise_set' AND row_id = NEW.id;
+    INSERT INTO sync_change (user_id, table_name, row_id)
+    SELECT user_id, 'exercise_set', NEW.id FROM session WHERE id = NEW.session_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sync_change_exercise_set_update
+AFTER UPDATE ON exercise_set
+BEGIN
+    DELETE FROM sync_change WHERE table_name = 'exercise_set' AND row_id = NEW.id;
+    INSERT INTO sync_change (user_id, table_name, row_id)
+    SELECT user_id, 'exercise_set', NEW.id FROM session WHERE id = NEW.session_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sync_change_exercise_set_delete
+AFTER DELETE ON exercise_set
+BEGIN
+    DELETE FROM sync_change WHERE table_name = 'exercise_set' AND row_id = OLD.id;
+    INSERT INTO sync_change (user_id, table_name, row_id, deleted)
+    SELECT user_id, 'exercise_set', OLD.id, TRUE FROM session WHERE id = OLD.session_id;
+END;
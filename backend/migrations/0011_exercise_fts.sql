@@ -0,0 +1,41 @@
+-- backend/migrations/0011_exercise_fts.sql
+--
+-- Full-text index of the exercise catalog for /api/exercises/search (see
+-- catalog.py). exercise_fts is an external content FTS5 table: it indexes
+-- exercise.title without storing a second copy, and the triggers below keep
+-- it in sync with every insert, update and delete, including edits made
+-- outside the app. The prefix index makes the prefix queries of
+-- autocomplete ("squ"*) index lookups instead of scans of the term list.
+--
+
+-- Table: exercise_fts
+CREATE VIRTUAL TABLE IF NOT EXISTS exercise_fts USING fts5(
+    title,
+    content = 'exercise',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '1 2 3'
+);
+
+-- Index the existing exercises
+INSERT INTO exercise_fts (exercise_fts) VALUES ('rebuild');
+
+-- Triggers: exercise
+CREATE TRIGGER IF NOT EXISTS exercise_fts_insert
+AFTER INSERT ON exercise
+BEGIN
+    INSERT INTO exercise_fts (rowid, title) VALUES (NEW.id, NEW.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS exercise_fts_update
+AFTER UPDATE OF title ON exercise
+BEGIN
+    INSERT INTO exercise_fts (exercise_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+    INSERT INTO exercise_fts (rowid, title) VALUES (NEW.id, NEW.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS exercise_fts_delete
+AFTER DELETE ON exercise
+BEGIN
+    INSERT INTO exercise_fts (exercise_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+END;
@@ -0,0 +1,26 @@
+-- backend/migrations/0012_user_generation.sql
+--
+-- Users are cached in each worker like the reference data (see auth.py),
+-- so writes to the user table bump reference_generation too. A token that
+-- is replaced, or a user added (which can end the single-user fallback),
+-- is then seen by every worker at its next generation check.
+--
+
+-- Triggers: user
+CREATE TRIGGER IF NOT EXISTS reference_generation_user_insert
+AFTER INSERT ON user
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_user_update
+AFTER UPDATE ON user
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reference_generation_user_delete
+AFTER DELETE ON user
+BEGIN
+    UPDATE reference_generation SET generation = generation + 1;
+END;
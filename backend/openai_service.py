@@ -1,101 +1,169 @@
 # backend/openai_service.py
+import csv
+import io
 import os
-from openai import OpenAI
+import threading
+import time
 
-# Optional: load environment variables from a .env file
-from dotenv import load_dotenv
+from . import personal_records
+from . import prompt_compaction
 
-# Load environment variables from a .env file if it exists
-load_dotenv()
-
-# Ensure the OpenAI API key is available
-# The OpenAI client constructor will automatically pick up OPENAI_API_KEY
-# from the environment, but checking here provides a clearer error message
+# The OpenAI client constructor picks up OPENAI_API_KEY from the environment,
+# it is read here to skip creating a client that can't work. A .env file is
+# loaded by app.py before this module is imported.
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    # In a real app, you might raise a specific exception or log this
-    print("Error: OPENAI_API_KEY environment variable not set.")
-    # Set client to None if key is missing so we don't try to use it
-    client = None
-else:
-    # Initialize the OpenAI client
+OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4.1-nano")
+
+# The openai SDK takes most of a second to import, so it is imported and the
+# client created when the first message is generated, not at startup
+_client_lock = threading.Lock()
+_client = None
+_client_loaded = False
+
+
+class MessageGenerationError(Exception):
+    """The AI service could not generate a message, it can be retried later."""
+
+
+def get_client():
+    """Returns the shared OpenAI client, or None if it can't be created."""
+    global _client, _client_loaded
+    if not _client_loaded:
+        with _client_lock:
+            if not _client_loaded:
+                _client = _create_client()
+                _client_loaded = True
+    return _client
+
+
+def _create_client():
+    if not OPENAI_API_KEY:
+        # In a real app, you might raise a specific exception or log this
+        print("Error: OPENAI_API_KEY environment variable not set.")
+        return None
+    started = time.perf_counter()
     try:
+        from openai import OpenAI
+
         client = OpenAI()
-        # Optional: You could add a small call here to test the API key
-        # For example: client.models.list() # Note: this adds startup time
     except Exception as e:
         print(f"Error initializing OpenAI client: {e}")
-        client = None  # Set client to None if initialization fails
+        return None
+    print(f"Loaded the OpenAI client in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return client
 
 
-def get_workout_history_csv_for_ai(current_session_id, query_db_func):
+# Number of most recent sessions, including the current one, sent to the AI
+HISTORY_SESSIONS = int(os.getenv("OPENAI_HISTORY_SESSIONS", "5"))
+
+
+def get_working_set_history(
+    current_session_id,
+    query_db_func,
+    num_sessions=HISTORY_SESSIONS,
+    since=None,
+    until=None,
+):
     """
-    Fetches working set data for the last few sessions relative to the current one
-    and formats it as a CSV string for the OpenAI prompt.
+    Fetches the working sets of the num_sessions most recent sessions of the
+    current session's user, up to and including the current one, ordered by
+    session start time (most recent first). since/until are start_time
+    strings that limit the window to a date range, and num_sessions=None
+    removes the session count limit.
     """
-    # Define how many previous sessions to fetch data for
-    num_previous_sessions = 4  # Including the current session, this makes it the last 5
-    min_session_id = max(1, current_session_id - num_previous_sessions)
-
-    # SQL query to fetch working set data for the last few sessions
-    # Order by session_id descending then exercise_set.id descending
-    # to get the most recent workouts first in the CSV, and sets within them
-    workout_history_data = query_db_func(
-        f"""
+    # Sessions are chosen by start_time through idx_session_user_start_time,
+    # not by id, so gaps or out-of-order ids don't change the window
+    return query_db_func(
+        """
+        WITH current_session AS (
+            SELECT id, start_time, user_id FROM session WHERE id = ?
+        ),
+        recent_sessions AS (
+            SELECT s.id, s.start_time
+            FROM session s, current_session cs
+            WHERE s.user_id = cs.user_id
+              AND (s.start_time < cs.start_time
+                   OR (s.start_time = cs.start_time AND s.id <= cs.id))
+              AND (? IS NULL OR s.start_time >= ?)
+              AND (? IS NULL OR s.start_time <= ?)
+            ORDER BY s.start_time DESC, s.id DESC
+            LIMIT ?
+        )
         SELECT
-            session_id,
-            s.start_time workout_time,
+            rs.id session_id,
+            rs.start_time workout_time,
             e.title exercise,
-            es.set_number, -- Use set_number
-            es.weight weight_kg, -- Use weight
+            es.set_number,
+            es.weight weight_kg,
             es.reps reps
-        FROM exercise_set es
+        FROM recent_sessions rs
+        JOIN exercise_set es ON es.session_id = rs.id
         JOIN exercise e ON es.exercise_id = e.id
-        JOIN session s ON es.session_id = s.id
-        WHERE es.set_type = "working" AND
-              s.id BETWEEN {min_session_id} AND {current_session_id} -- Filter for the last few sessions by ID range
-        ORDER BY s.start_time DESC, es.id DESC -- Order by session start time (most recent first)
+        WHERE es.set_type = 'working'
+        ORDER BY rs.start_time DESC, rs.id DESC, es.id DESC
+    """,
+        (
+            current_session_id,
+            since,
+            since,
+            until,
+            until,
+            num_sessions if num_sessions is not None else -1,  # -1 is no limit
+        ),
+    )
+
+
+def get_workout_history_csv_for_ai(
+    current_session_id,
+    query_db_func,
+    num_sessions=HISTORY_SESSIONS,
+    since=None,
+    until=None,
+):
+    """
+    Fetches working set data for the last few sessions relative to the current one
+    and formats it as a CSV string for the OpenAI prompt.
     """
+    workout_history_data = get_working_set_history(
+        current_session_id, query_db_func, num_sessions, since, until
     )
+    return format_history_csv(workout_history_data)
+
 
+def format_history_csv(workout_history_data):
+    """Formats working set history rows as CSV, one line per set."""
     if not workout_history_data:
         return "No workout history available."  # Return a message if no data
 
-    # Format the data as a CSV string
-    csv_lines = [
-        "session_id,workout_time,exercise,set_number,weight_kg,reps"
-    ]  # Header row
-
-    for row in workout_history_data:
-        # Format row values, handle None for weight/reps, enclose exercise in quotes
-        formatted_row = [
-            str(row["session_id"]),
-            str(row["workout_time"]),
-            f'"{row["exercise"]}"',  # Enclose exercise title in quotes
-            str(row["set_number"]),
-            (
-                str(row["weight_kg"]) if row["weight_kg"] is not None else ""
-            ),  # Use empty string for None
-            (
-                str(row["reps"]) if row["reps"] is not None else ""
-            ),  # Use empty string for None
-        ]
-        csv_lines.append(",".join(formatted_row))
-
-    return "\n".join(csv_lines)
-
-
-def generate_motivational_message_for_session(username, session_id, query_db_func):
+    # Write the rows straight through the csv module, which takes care of
+    # quoting titles and writes None (missing weight/reps) as an empty field
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["session_id", "workout_time", "exercise", "set_number", "weight_kg", "reps"])
+    writer.writerows(
+        (
+            row["session_id"],
+            row["workout_time"],
+            row["exercise"],
+            row["set_number"],
+            row["weight_kg"],
+            row["reps"],
+        )
+        for row in workout_history_data
+    )
+
+    return output.getvalue().rstrip("\n")
+
+
+def build_session_prompt(username, session_id, query_db_func):
     """
-    Calls the OpenAI API to generate a motivational message for a completed session.
+    Builds the chat messages for a completed session. The workout history is
+    compacted to one line per exercise per session and trimmed to the token
+    budget (see prompt_compaction). Returns (messages, metrics), where metrics
+    reports the prompt size before and after compaction.
     """
-    # Check if the OpenAI client was successfully initialized
-    if client is None:
-        print("OpenAI client is not initialized. Returning fallback message.")
-        return "Failed to connect to AI service. Awesome work today! 💪"
-
-    # Get workout history in CSV format
-    workout_history_csv = get_workout_history_csv_for_ai(session_id, query_db_func)
+    workout_history = get_working_set_history(session_id, query_db_func)
+    history_text, metrics = prompt_compaction.compact_history(workout_history)
 
     # Construct the prompt for the AI
     # Using the structure provided by the user
@@ -109,12 +177,26 @@ def generate_motivational_message_for_session(username, session_id, query_db_fun
         ],
     }
 
+    # Personal records are tracked as sets are completed, so the AI doesn't
+    # have to spot them in the history
+    session_personal_records = personal_records.get_session_personal_records(
+        query_db_func, session_id
+    )
+    personal_records_text = "None"
+    if session_personal_records:
+        personal_records_text = ", ".join(
+            f"{pr['title']} {pr['weight']:g}kg x {pr['reps']}"
+            for pr in session_personal_records
+        )
+
     user_prompt_text = f"""Your client "{username}" has just completed workout number {session_id}.
 Generate a short motivational message to congratulate them, highlighting any notable achievements from the provided workout history (including this latest session).
 
-Here are the working sets from recent sessions:
+Personal records set in this session: {personal_records_text}
+
+Here is a summary of the working sets from recent sessions, one line per exercise per session (top set is the heaviest set):
 
-{workout_history_csv}
+{history_text}
 """
 
     user_prompt = {
@@ -122,15 +204,43 @@ Here are the working sets from recent sessions:
         "content": [{"type": "text", "text": user_prompt_text}],
     }
 
-    messages = [system_prompt, user_prompt]
+    # Size of the same history as one CSV line per set, for comparison
+    metrics["raw_history_tokens"] = prompt_compaction.estimate_tokens(
+        format_history_csv(workout_history)
+    )
+    metrics["prompt_tokens"] = prompt_compaction.estimate_tokens(
+        system_prompt["content"][0]["text"] + user_prompt_text
+    )
+
+    return [system_prompt, user_prompt], metrics
+
+
+def generate_motivational_message_for_session(
+    username, session_id, query_db_func, chat_client=None, prompt_metrics=None
+):
+    """
+    Calls the OpenAI API to generate a motivational message for a completed session.
+    Raises MessageGenerationError if no message could be generated.
+    chat_client replaces the shared OpenAI client, e.g. with a local stub
+    that implements chat.completions.create. If prompt_metrics is a dict it
+    is filled with the prompt size metrics.
+    """
+    chat_client = chat_client or get_client()
+
+    # Check if the OpenAI client was successfully initialized
+    if chat_client is None:
+        raise MessageGenerationError("OpenAI client is not initialized")
+
+    messages, metrics = build_session_prompt(username, session_id, query_db_func)
+    print(f"Prompt metrics for session {session_id}: {metrics}")  # Log for debugging
+    if prompt_metrics is not None:
+        prompt_metrics.update(metrics)
 
     # --- Make the API Call ---
     try:
         # Using the standard chat completions endpoint
-        response = client.chat.completions.create(
-            model=os.getenv(
-                "OPENAI_MODEL_NAME", "gpt-4.1-nano"
-            ),  # Get model name from env var or use default
+        response = chat_client.chat.completions.create(
+            model=OPENAI_MODEL_NAME,
             messages=messages,
             temperature=1.0,  # Controls randomness. 1.0 is default.
             max_tokens=150,  # Maximum tokens for the response
@@ -138,31 +248,21 @@ Here are the working sets from recent sessions:
             frequency_penalty=0.0,  # Controls repetition. 0.0 is default.
             presence_penalty=0.0,  # Controls topic novelty. 0.0 is default.
         )
-
-        # Extract the message from the response
-        # Accessing the content from the response object
-        if (
-            response.choices
-            and response.choices[0].message
-            and response.choices[0].message.content
-        ):
-            generated_message = response.choices[0].message.content.strip()
-            # Add a fallback if the generated message is empty or problematic
-            if not generated_message:
-                generated_message = "Great job completing your session!"
-        else:
-            generated_message = (
-                "Couldn't generate a specific message, but great session!"
-            )
-            print("Warning: OpenAI API returned unexpected response structure.")
-            # print(response) # Uncomment for debugging the response structure
-
-        return generated_message
-
     except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        # Return a fallback message in case of API errors
-        return "Awesome work today! Keep up the effort. 💪"
+        raise MessageGenerationError(f"Error calling OpenAI API: {e}") from e
+
+    # Extract the message from the response
+    # Accessing the content from the response object
+    if (
+        response.choices
+        and response.choices[0].message
+        and response.choices[0].message.content
+    ):
+        generated_message = response.choices[0].message.content.strip()
+        if generated_message:
+            return generated_message
+    # print(response) # Uncomment for debugging the response structure
+    raise MessageGenerationError("OpenAI API returned an empty or unexpected response")
 
 
 # Example usage (for testing the service file directly)
@@ -0,0 +1,341 @@
+# backend/personal_records.py
+# Personal record (PR) index: the heaviest completed working set for each
+# (user_id, exercise_id, reps), stored in the personal_record table. Completing a set
+# checks it against the one record for its rep count with a primary key
+# lookup, instead of rescanning the exercise's history.
+#
+# A set is flagged as a PR (exercise_set.is_personal_record) when it beats
+# the record as it stood when the set was done, replaying sets in start
+# time order. The first set at a rep count only establishes the record and
+# is not flagged. Edits to the latest set at a rep count, i.e. logging the
+# current session, only compare it with the record; other edits can change
+# the flags of the sets after it, so its rep counts are replayed.
+import json
+
+
+def _qualifies(exercise_set):
+    return (
+        exercise_set["set_type"] == "working"
+        and exercise_set["completed"]
+        and exercise_set["weight"] is not None
+        and (exercise_set["reps"] or 0) > 0
+    )
+
+
+def get_set_before_update(db, set_id, user_id):
+    """
+    The fields of a set that decide its records, read before it is updated
+    and passed to record_set_update. None if the user has no such set.
+    """
+    return db.execute(
+        """
+        SELECT es.set_type, es.weight, es.reps, es.completed
+        FROM exercise_set es
+        JOIN session s ON es.session_id = s.id
+        WHERE es.id = ? AND s.user_id = ?
+    """,
+        (set_id, user_id),
+    ).fetchone()
+
+
+def _is_latest_at_reps(db, exercise_set):
+    """Whether no completed working set of the user at the set's rep count comes after it."""
+    later = db.execute(
+        """
+        SELECT 1
+        FROM session s
+        JOIN exercise_set es ON es.session_id = s.id
+        WHERE s.user_id = ?
+          AND s.start_time >= ?
+          AND (s.start_time > ? OR s.id > ? OR (s.id = ? AND es.id > ?))
+          AND es.exercise_id = ?
+          AND es.reps = ?
+          AND es.set_type = 'working'
+          AND es.completed
+          AND es.weight IS NOT NULL
+        LIMIT 1
+    """,
+        (
+            exercise_set["user_id"],
+            exercise_set["start_time"],
+            exercise_set["start_time"],
+            exercise_set["session_id"],
+            exercise_set["session_id"],
+            exercise_set["id"],
+            exercise_set["exercise_id"],
+            exercise_set["reps"],
+        ),
+    ).fetchone()
+    return later is None
+
+
+def _get_record(db, exercise_set):
+    return db.execute(
+        """
+        SELECT weight, set_id FROM personal_record
+        WHERE user_id = ? AND exercise_id = ? AND reps = ?
+    """,
+        (exercise_set["user_id"], exercise_set["exercise_id"], exercise_set["reps"]),
+    ).fetchone()
+
+
+def _record_latest_set(db, exercise_set):
+    """Checks the latest set at its rep count against the record."""
+    set_id = exercise_set["id"]
+    user_id = exercise_set["user_id"]
+    record = _get_record(db, exercise_set)
+
+    if record is None:
+        # First completed set at this rep count: establishes the record
+        db.execute(
+            """
+            INSERT INTO personal_record (user_id, exercise_id, reps, weight, set_id, session_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            (
+                user_id,
+                exercise_set["exercise_id"],
+                exercise_set["reps"],
+                exercise_set["weight"],
+                set_id,
+                exercise_set["session_id"],
+            ),
+        )
+        return None
+
+    if record["set_id"] == set_id:
+        # Already the record holder (e.g. weight raised or set re-saved)
+        if exercise_set["weight"] > record["weight"]:
+            db.execute(
+                """
+                UPDATE personal_record SET weight = ?
+                WHERE user_id = ? AND exercise_id = ? AND reps = ?
+            """,
+                (
+                    exercise_set["weight"],
+                    user_id,
+                    exercise_set["exercise_id"],
+                    exercise_set["reps"],
+                ),
+            )
+        return None
+
+    if exercise_set["weight"] <= record["weight"]:
+        return None
+
+    db.execute(
+        """
+        UPDATE personal_record
+        SET weight = ?, set_id = ?, session_id = ?
+        WHERE user_id = ? AND exercise_id = ? AND reps = ?
+    """,
+        (
+            exercise_set["weight"],
+            set_id,
+            exercise_set["session_id"],
+            user_id,
+            exercise_set["exercise_id"],
+            exercise_set["reps"],
+        ),
+    )
+    db.execute("UPDATE exercise_set SET is_personal_record = TRUE WHERE id = ?", (set_id,))
+    return {
+        "set_id": set_id,
+        "exercise_id": exercise_set["exercise_id"],
+        "reps": exercise_set["reps"],
+        "weight": exercise_set["weight"],
+        "previous_weight": record["weight"],
+    }
+
+
+def record_set_update(db, set_id, previous):
+    """
+    Updates the PR index after a set was changed. Call inside the same
+    transaction as the set update, with previous from get_set_before_update.
+    Returns a dict describing the new PR when the set beat the previous
+    record, otherwise None.
+    """
+    exercise_set = db.execute(
+        """
+        SELECT es.id, es.session_id, es.exercise_id, es.set_type, es.weight, es.reps,
+               es.completed, es.is_personal_record, s.user_id, s.start_time
+        FROM exercise_set es
+        JOIN session s ON es.session_id = s.id
+        WHERE es.id = ?
+    """,
+        (set_id,),
+    ).fetchone()
+    if exercise_set is None:
+        return None
+    qualifies = _qualifies(exercise_set)
+    qualified = _qualifies(previous)
+
+    if not qualifies and not qualified:
+        # e.g. the weight typed into a set that isn't completed yet
+        return None
+    if all(
+        exercise_set[field] == previous[field]
+        for field in ("set_type", "weight", "reps", "completed")
+    ):
+        # Re-saved as it was, e.g. a sync mutation sent again
+        return None
+
+    # Completing, raising or re-saving the latest set at its rep count leaves
+    # the sets before it as they are
+    if (
+        qualifies
+        and (
+            not qualified
+            or (
+                previous["reps"] == exercise_set["reps"]
+                and exercise_set["weight"] >= previous["weight"]
+            )
+        )
+        and _is_latest_at_reps(db, exercise_set)
+    ):
+        return _record_latest_set(db, exercise_set)
+
+    # Otherwise the flags of later sets and the records at the set's old and
+    # new rep count may change, so those are replayed from history
+    record = _get_record(db, exercise_set) if qualifies else None
+    reps = {exercise_set["reps"]} if qualifies else set()
+    if qualified:
+        reps.add(previous["reps"])
+    if exercise_set["is_personal_record"] and not qualifies:
+        db.execute("UPDATE exercise_set SET is_personal_record = FALSE WHERE id = ?", (set_id,))
+    rebuild_personal_records(
+        db,
+        exercise_set["user_id"],
+        [(exercise_set["exercise_id"], count) for count in reps],
+    )
+
+    if not qualifies or exercise_set["is_personal_record"]:
+        return None
+    new_record = _get_record(db, exercise_set)
+    is_personal_record = db.execute(
+        "SELECT is_personal_record FROM exercise_set WHERE id = ?", (set_id,)
+    ).fetchone()["is_personal_record"]
+    if not is_personal_record or new_record["set_id"] != set_id:
+        return None
+    return {
+        "set_id": set_id,
+        "exercise_id": exercise_set["exercise_id"],
+        "reps": exercise_set["reps"],
+        "weight": exercise_set["weight"],
+        "previous_weight": record["weight"] if record is not None else None,
+    }
+
+
+def get_session_personal_records(query_db_func, session_id):
+    """Returns the PR sets of a session."""
+    return query_db_func(
+        """
+        SELECT es.id AS set_id, es.exercise_id, e.title, es.reps, es.weight
+        FROM exercise_set es
+        JOIN exercise e ON es.exercise_id = e.id
+        WHERE es.session_id = ? AND es.is_personal_record
+        ORDER BY es.id
+    """,
+        (session_id,),
+    )
+
+
+def rebuild_personal_records(db, user_id=None, keys=None):
+    """
+    Recomputes the PR index and the is_personal_record flags from history,
+    replaying completed working sets in chronological order. user_id limits
+    it to one user's records, and keys further to their (exercise_id, reps)
+    pairs. Only flags that change are written. Returns the number of records.
+    """
+    keys = set(keys) if keys is not None else None
+    if keys is not None and user_id is None:
+        raise ValueError("keys need a user_id")
+    if keys == set():
+        return 0
+
+    # History of the records being rebuilt. CROSS JOIN keeps session as the
+    # outer loop, so a user's sets are read through their sessions
+    # (idx_session_user_start_time, then idx_exercise_set_session_exercise
+    # with the keys' exercises) rather than every user's sets of an exercise.
+    scope = ""
+    args = []
+    if user_id is not None:
+        scope += " AND s.user_id = ?"
+        args.append(user_id)
+    if keys is not None:
+        scope += " AND es.exercise_id IN (SELECT value FROM json_each(?))"
+        args.append(json.dumps(sorted({exercise_id for exercise_id, _ in keys})))
+
+    def in_scope(row):
+        return keys is None or (row["exercise_id"], row["reps"]) in keys
+
+    records = {}  # (user_id, exercise_id, reps) -> (weight, set_id, session_id)
+    flagged_set_ids = set()
+    cursor = db.execute(
+        f"""
+        SELECT es.id, es.session_id, es.exercise_id, es.weight, es.reps, s.user_id
+        FROM session s
+        CROSS JOIN exercise_set es ON es.session_id = s.id
+        WHERE es.set_type = 'working'
+          AND es.completed
+          AND es.weight IS NOT NULL
+          AND es.reps > 0
+          {scope}
+        ORDER BY s.start_time, s.id, es.id
+    """,
+        args,
+    )
+    for row in cursor:
+        if not in_scope(row):
+            continue
+        key = (row["user_id"], row["exercise_id"], row["reps"])
+        record = records.get(key)
+        if record is None or row["weight"] > record[0]:
+            if record is not None:
+                flagged_set_ids.add(row["id"])
+            records[key] = (row["weight"], row["id"], row["session_id"])
+
+    # Flags are only changed where they differ, every write fires the sync triggers
+    currently_flagged = {
+        row["id"]
+        for row in db.execute(
+            f"""
+            SELECT es.id, es.exercise_id, es.reps
+            FROM session s
+            CROSS JOIN exercise_set es ON es.session_id = s.id
+            WHERE es.is_personal_record
+              {scope}
+        """,
+            args,
+        )
+        if in_scope(row)
+    }
+    db.executemany(
+        "UPDATE exercise_set SET is_personal_record = FALSE WHERE id = ?",
+        [(set_id,) for set_id in sorted(currently_flagged - flagged_set_ids)],
+    )
+    db.executemany(
+        "UPDATE exercise_set SET is_personal_record = TRUE WHERE id = ?",
+        [(set_id,) for set_id in sorted(flagged_set_ids - currently_flagged)],
+    )
+
+    if keys is not None:
+        db.executemany(
+            "DELETE FROM personal_record WHERE user_id = ? AND exercise_id = ? AND reps = ?",
+            [(user_id, exercise_id, reps) for exercise_id, reps in sorted(keys)],
+        )
+    elif user_id is not None:
+        db.execute("DELETE FROM personal_record WHERE user_id = ?", (user_id,))
+    else:
+        db.execute("DELETE FROM personal_record")
+    db.executemany(
+        """
+        INSERT INTO personal_record (user_id, exercise_id, reps, weight, set_id, session_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+        [
+            (user_id, exercise_id, reps, weight, set_id, session_id)
+            for (user_id, exercise_id, reps), (weight, set_id, session_id) in records.items()
+        ],
+    )
+    return len(records)
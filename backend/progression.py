@@ -0,0 +1,218 @@
+# backend/progression.py
+# Progression rule engine. A program's progression_rule rows (see
+# migrations/0009_progression_rule.sql) are loaded through reference_cache
+# and compiled once into plain Python functions, memoized by the cache
+# entry's ETag, so a program's rules are only parsed again after they change.
+#
+# At session creation the compiled rules of each exercise are evaluated
+# against that exercise's recent history (ExerciseHistory), which the caller
+# loads for all exercises at once. Evaluating rules never queries the
+# database, so the number of queries does not depend on the number of rules
+# or the amount of history.
+import json
+import threading
+
+from . import reference_cache
+
+DEFAULT_ROUND_TO = 2.5
+DEFAULT_REPS = 5
+
+_lock = threading.Lock()
+_compiled = {}  # ETag of the rule rows -> CompiledRules
+
+
+class ExerciseHistory:
+    """
+    What the rules know about one exercise: the working sets of its most
+    recent sessions (newest first, each a list of set rows) and, from the
+    exercise_session_stats rollup, the best estimated 1RM and the number of
+    sessions it was trained in.
+    """
+
+    def __init__(self, sessions, best_e1rm=None, session_count=0):
+        self.sessions = sessions
+        self.best_e1rm = best_e1rm
+        self.session_count = session_count
+
+
+class CompiledRules:
+    """
+    A program's rules grouped by day_exercise_id (None for program-wide
+    rules). lookback is the number of previous sessions the rules need and
+    needs_e1rm whether any rule uses the rollup.
+    """
+
+    def __init__(self, rules_by_day_exercise, lookback, needs_e1rm):
+        self.rules_by_day_exercise = rules_by_day_exercise
+        self.lookback = lookback
+        self.needs_e1rm = needs_e1rm
+
+    def for_day_exercise(self, day_exercise_id):
+        return self.rules_by_day_exercise.get(
+            day_exercise_id
+        ) or self.rules_by_day_exercise.get(None, [])
+
+
+def _round(weight, round_to):
+    return round(weight / round_to) * round_to if round_to else weight
+
+
+def _top_weight(session_sets):
+    weights = [s["weight"] for s in session_sets if s["weight"] is not None]
+    return max(weights) if weights else None
+
+
+def _is_success(session_sets, reps):
+    """Every logged working set completed with at least the target reps."""
+    logged = [s for s in session_sets if s["weight"] is not None]
+    return bool(logged) and all(s["completed"] and (s["reps"] or 0) >= reps for s in logged)
+
+
+def _is_failure(session_sets, reps):
+    """Sets were logged but not all of them hit the target. Skipped sessions don't count."""
+    logged = [s for s in session_sets if s["weight"] is not None]
+    return bool(logged) and not _is_success(logged, reps)
+
+
+# --- Rule types ---
+# Each compiler validates a rule's parameters and returns
+# (evaluate, lookback, needs_e1rm). evaluate(history) returns a function
+# set_number -> (weight, reps) for the working sets, or None when the rule
+# does not apply and the next rule is tried.
+
+
+def _compile_linear(parameters):
+    increment = float(parameters.get("increment", 2.5))
+    reps = int(parameters.get("reps", DEFAULT_REPS))
+    round_to = float(parameters.get("round_to", DEFAULT_ROUND_TO))
+
+    def evaluate(history):
+        if not history.sessions:
+            return None
+        last = history.sessions[0]
+        weight = _top_weight(last)
+        if weight is None:
+            return None
+        if _is_success(last, reps):
+            weight += increment
+        weight = _round(weight, round_to)
+        return lambda set_number: (weight, reps)
+
+    return evaluate, 1, False
+
+
+def _compile_deload(parameters):
+    after_failures = int(parameters.get("after_failures", 3))
+    percent = float(parameters.get("percent", 10))
+    reps = int(parameters.get("reps", DEFAULT_REPS))
+    round_to = float(parameters.get("round_to", DEFAULT_ROUND_TO))
+    if after_failures < 1:
+        raise ValueError("after_failures must be at least 1")
+
+    def evaluate(history):
+        recent = history.sessions[:after_failures]
+        if len(recent) < after_failures or not all(_is_failure(s, reps) for s in recent):
+            return None
+        weight = _top_weight(recent[0])
+        if weight is None:
+            return None
+        weight = _round(weight * (1 - percent / 100), round_to)
+        return lambda set_number: (weight, reps)
+
+    return evaluate, after_failures, False
+
+
+def _compile_percent_1rm(parameters):
+    training_max = float(parameters.get("training_max", 90)) / 100
+    round_to = float(parameters.get("round_to", DEFAULT_ROUND_TO))
+    weeks = parameters.get("weeks")
+    if not weeks:
+        raise ValueError("weeks is required")
+    # Each week is a list of (percent, reps) per set, the last entry repeats
+    # for any further sets
+    waves = []
+    for week in weeks:
+        percents = [float(p) / 100 for p in week["percent"]]
+        reps = week.get("reps", [DEFAULT_REPS] * len(percents))
+        if not percents or len(reps) != len(percents):
+            raise ValueError("each week needs matching percent and reps lists")
+        waves.append(list(zip(percents, [int(r) for r in reps])))
+
+    def evaluate(history):
+        if not history.best_e1rm:
+            return None
+        week = waves[history.session_count % len(waves)]
+        base = history.best_e1rm * training_max
+
+        def prescribe(set_number):
+            percent, reps = week[min(set_number, len(week)) - 1]
+            return _round(base * percent, round_to), reps
+
+        return prescribe
+
+    return evaluate, 0, True
+
+
+RULE_TYPES = {
+    "linear": _compile_linear,
+    "deload": _compile_deload,
+    "percent_1rm": _compile_percent_1rm,
+}
+
+
+def compile_rules(rule_rows):
+    """Compiles rule rows (ordered by priority) into a CompiledRules."""
+    rules_by_day_exercise = {}
+    lookback = 1  # The previous session is always loaded for the fallback copy
+    needs_e1rm = False
+    for row in rule_rows:
+        try:
+            compiler = RULE_TYPES[row["rule_type"]]
+            evaluate, rule_lookback, rule_needs_e1rm = compiler(
+                json.loads(row["parameters"] or "{}")
+            )
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            # A broken rule is skipped rather than failing session creation
+            print(f"Skipping progression rule {row['id']}: {e!r}")  # Log for debugging
+            continue
+        rules_by_day_exercise.setdefault(row["day_exercise_id"], []).append(evaluate)
+        lookback = max(lookback, rule_lookback)
+        needs_e1rm = needs_e1rm or rule_needs_e1rm
+    return CompiledRules(rules_by_day_exercise, lookback, needs_e1rm)
+
+
+def get_program_rules(query_db_func, program_id):
+    """Returns the CompiledRules of a program, compiling them on first use."""
+
+    def load_rules():
+        rows = query_db_func(
+            """
+            SELECT id, day_exercise_id, rule_type, parameters
+            FROM progression_rule
+            WHERE program_id = ?
+            ORDER BY priority, id
+        """,
+            (program_id,),
+        )
+        return [dict(row) for row in rows]
+
+    body, etag = reference_cache.get(("progression_rules", program_id), load_rules)
+    with _lock:
+        compiled = _compiled.get(etag)
+    if compiled is None:
+        compiled = compile_rules(json.loads(body))
+        with _lock:
+            _compiled[etag] = compiled
+    return compiled
+
+
+def prescribe(rules, history):
+    """
+    Evaluates an exercise's rules in order. Returns the first applicable
+    prescription (set_number -> (weight, reps)) or None.
+    """
+    for evaluate in rules:
+        prescription = evaluate(history)
+        if prescription is not None:
+            return prescription
+    return None
@@ -0,0 +1,122 @@
+# backend/prompt_compaction.py
+# Compacts working set history into a short per-exercise summary for the
+# OpenAI prompt, and keeps it within a token budget.
+import os
+
+# Token budget for the workout history part of the prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("OPENAI_HISTORY_TOKEN_BUDGET", "600"))
+
+# Rough characters per token for CSV-like English text. Close enough to
+# budget and report prompt size without shipping a tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Estimates the number of tokens in text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def summarize_sessions(history_rows):
+    """
+    Aggregates working set rows (as returned by get_working_set_history, most
+    recent session first) into one summary per exercise per session: number
+    of sets, top set (heaviest weight and its reps), total reps and volume.
+    Returns a list of sessions in the same order as the rows.
+    """
+    sessions = {}
+    for row in history_rows:
+        session = sessions.setdefault(
+            row["session_id"],
+            {
+                "session_id": row["session_id"],
+                "date": (row["workout_time"] or "")[:10],
+                "exercises": {},
+            },
+        )
+        summary = session["exercises"].setdefault(
+            row["exercise"],
+            {"sets": 0, "top_weight": None, "top_reps": None, "reps": 0, "volume": 0.0},
+        )
+        weight = row["weight_kg"]
+        reps = row["reps"]
+        summary["sets"] += 1
+        summary["reps"] += reps or 0
+        summary["volume"] += (weight or 0) * (reps or 0)
+        if weight is not None and (
+            summary["top_weight"] is None
+            or (weight, reps or 0) > (summary["top_weight"], summary["top_reps"] or 0)
+        ):
+            summary["top_weight"] = weight
+            summary["top_reps"] = reps
+    return list(sessions.values())
+
+
+def _format_number(value):
+    """Formats 100.0 as 100 and 102.5 as 102.5 to save tokens."""
+    if value is None:
+        return ""
+    return f"{value:g}"
+
+
+def _format_session_lines(session, exercise_codes):
+    lines = []
+    for title, summary in session["exercises"].items():
+        top_set = ""
+        if summary["top_weight"] is not None:
+            top_set = f"{_format_number(summary['top_weight'])}x{summary['top_reps'] or 0}"
+        lines.append(
+            ",".join(
+                [
+                    str(session["session_id"]),
+                    session["date"],
+                    exercise_codes[title],
+                    str(summary["sets"]),
+                    top_set,
+                    str(summary["reps"]),
+                    _format_number(summary["volume"]),
+                ]
+            )
+        )
+    return lines
+
+
+def compact_history(history_rows, token_budget=HISTORY_TOKEN_BUDGET):
+    """
+    Builds the compacted history text for the prompt. Exercise titles are
+    dictionary encoded (E1, E2, ...) in a legend line, and the oldest
+    sessions are dropped until the text fits token_budget. The most recent
+    session is always kept.
+    Returns (text, metrics), where metrics describes the prompt size.
+    """
+    sessions = summarize_sessions(history_rows)
+    header = "session,date,exercise,sets,top_set_kg_x_reps,total_reps,volume_kg"
+
+    while True:
+        # Codes are assigned in order of first appearance, most recent first
+        exercise_codes = {}
+        for session in sessions:
+            for title in session["exercises"]:
+                exercise_codes.setdefault(title, f"E{len(exercise_codes) + 1}")
+        legend = "Exercises: " + ", ".join(
+            f"{code}={title}" for title, code in exercise_codes.items()
+        )
+        lines = [legend, header]
+        for session in sessions:
+            lines.extend(_format_session_lines(session, exercise_codes))
+        text = "\n".join(lines)
+
+        if len(sessions) <= 1 or estimate_tokens(text) <= token_budget:
+            break
+        sessions = sessions[:-1]  # Trim the oldest session
+
+    if not sessions:
+        text = "No workout history available."
+
+    metrics = {
+        "history_sets": len(history_rows),
+        "history_sessions": len({row["session_id"] for row in history_rows}),
+        "included_sessions": len(sessions),
+        "history_tokens": estimate_tokens(text),
+        "token_budget": token_budget,
+    }
+    return text, metrics
@@ -0,0 +1,87 @@
+# backend/reference_cache.py
+# In-process cache for the near-static reference data (programs, days and
+# the exercises of a day). Entries are stored as the serialized JSON body and
+# its ETag, so a cache hit needs neither a query nor serialization.
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from .database import query_db
+
+# Seconds between checks of reference_generation in the database. Within
+# this interval cache hits never touch the database; writes made by another
+# worker or outside the app show up at most this late.
+REFERENCE_CACHE_CHECK_INTERVAL = float(
+    os.getenv("REFERENCE_CACHE_CHECK_INTERVAL", "5")
+)
+
+# Most entries kept, least recently used entries are evicted first
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv("REFERENCE_CACHE_MAX_ENTRIES", "1024"))
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (body, etag)
+_generation = None
+_checked_at = 0.0
+
+
+def invalidate():
+    """
+    Drops every cached entry. Call after writing to program, day,
+    day_exercise or exercise so this worker sees the change immediately.
+    """
+    global _checked_at
+    with _lock:
+        _entries.clear()
+        _checked_at = 0.0
+
+
+def _check_generation():
+    """Clears the cache if reference_generation has changed since the last check."""
+    global _generation, _checked_at
+    now = time.monotonic()
+    if _generation is not None and now - _checked_at < REFERENCE_CACHE_CHECK_INTERVAL:
+        return
+    row = query_db("SELECT generation FROM reference_generation", one=True)
+    generation = row["generation"] if row else 0
+    with _lock:
+        if generation != _generation:
+            _entries.clear()
+            _generation = generation
+        _checked_at = now
+
+
+def get_generation():
+    """The current reference_generation, checked at most every REFERENCE_CACHE_CHECK_INTERVAL."""
+    _check_generation()
+    return _generation
+
+
+def get(key, loader):
+    """
+    Returns (body, etag) for key, calling loader() to load the data on a
+    miss. loader returns JSON-serializable data, or None when the data does
+    not exist; missing data is not cached and get returns None.
+    """
+    _check_generation()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+
+    data = loader()
+    if data is None:
+        return None
+
+    body = current_app.json.dumps(data)
+    etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    entry = (body, etag)
+    with _lock:
+        _entries[key] = entry
+        while len(_entries) > REFERENCE_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return entry
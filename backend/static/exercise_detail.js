@@ -179,25 +179,8 @@ document.addEventListener('DOMContentLoaded', () => {
              }
         }
 
-         try {
-            const response = await fetch(`/api/sets/${setId}`, {
-                method: 'PUT',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ [field]: typedValue })
-            });
-            const data = await response.json();
-            if (!response.ok) {
-                console.error(`Failed to update ${field}:`, data.error);
-                alert(`Error updating ${field}: ${data.error}`);
-            } else {
-                 console.log(`${field} updated successfully.`);
-            }
-        } catch (error) {
-            console.error(`Error updating ${field}:`, error);
-             alert(`An error occurred while updating ${field}.`);
-        }
+        // Edits are coalesced and sent in one batch, see queueSetUpdate
+        queueSetUpdate(setId, { [field]: typedValue });
     }
 
 
@@ -237,38 +220,220 @@ document.addEventListener('DOMContentLoaded', () => {
             reps: currentReps
         };
 
+        // Shown straight away, the update is queued and sent with any edits
+        // still waiting in the queue, or later if the phone is offline
+        completeButton.textContent = newState ? '✔️' : '□';
+        console.log(`Set ${setId} queued: completed=${newState}, weight=${currentWeight}, reps=${currentReps}`);
+
+        // Update the completed status in the local currentExerciseSets array
+        const setIndex = currentExerciseSets.findIndex(set => set.id == setId);
+        if (setIndex !== -1) {
+            currentExerciseSets[setIndex].completed = newState;
+        }
+
+        // Check and update the state of the "Complete Workout" button
+        updateCompleteWorkoutButtonState();
+
+        queueSetUpdate(setId, updateData);
+        flushSetUpdates();
+    }
+
+
+    // --- Offline-first set updates ---
+    // Edits are kept in a queue in localStorage, each with its own mutation id,
+    // and sent together in one POST /api/sync request once editing pauses.
+    // While the phone is offline the queue is kept, also across page loads,
+    // and sent when the connection returns. The server skips mutation ids it
+    // has already applied, so a batch whose response was lost is sent again.
+    const syncQueueKey = 'syncQueue';
+    const setUpdateDebounceMs = 800;
+    let setUpdateTimer = null;
+    let flushChain = Promise.resolve(); // Batches are sent one at a time, in order
+    let syncSeq = null; // Last change seen, see GET /api/sync
+    // Set while the page is hidden or offline, when edits made on another
+    // device may have been missed. The page is current when it loads.
+    let missedChanges = false;
+
+    function loadQueue() {
         try {
-            const response = await fetch(`/api/sets/${setId}`, {
-                method: 'PUT',
+            return JSON.parse(localStorage.getItem(syncQueueKey)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    function saveQueue(queue) {
+        localStorage.setItem(syncQueueKey, JSON.stringify(queue));
+    }
+
+    function newMutationId() {
+        // crypto.randomUUID is only available over HTTPS
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    function queueSetUpdate(setId, fields) {
+        const queue = loadQueue();
+        // Merge into the set's queued mutation unless it may already have
+        // reached the server, whose id must then keep meaning the same edit
+        const queued = queue.find(mutation => mutation.set_id == setId && !mutation.sent);
+        if (queued) {
+            Object.assign(queued, fields);
+        } else {
+            queue.push({ id: newMutationId(), set_id: parseInt(setId, 10), ...fields });
+        }
+        saveQueue(queue);
+        clearTimeout(setUpdateTimer);
+        setUpdateTimer = setTimeout(flushSetUpdates, setUpdateDebounceMs);
+    }
+
+    // Sends all queued updates. Resolves to the per-mutation results, or null
+    // if nothing could be sent. keepalive lets the request finish while the page unloads.
+    function flushSetUpdates(keepalive = false) {
+        clearTimeout(setUpdateTimer);
+        flushChain = flushChain.then(() => sendQueuedUpdates(keepalive));
+        return flushChain;
+    }
+
+    async function sendQueuedUpdates(keepalive) {
+        const queue = loadQueue();
+        if (queue.length === 0) {
+            return [];
+        }
+        if (!navigator.onLine) {
+            return null; // Sent by the 'online' handler
+        }
+        queue.forEach(mutation => { mutation.sent = true; });
+        saveQueue(queue);
+        const mutations = queue.map(({ sent, ...mutation }) => mutation);
+        const sentIds = new Set(mutations.map(mutation => mutation.id));
+
+        let data;
+        try {
+            const response = await fetch('/api/sync', {
+                method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify(updateData)
+                body: JSON.stringify(syncSeq === null ? { mutations } : { mutations, since: syncSeq }),
+                keepalive: keepalive
             });
-            const data = await response.json();
-            if (response.ok) {
-                completeButton.textContent = newState ? '✔️' : '□';
-                console.log(`Set ${setId} updated: completed=${newState}, weight=${currentWeight}, reps=${currentReps}`);
-
-                // Update the completed status in the local currentExerciseSets array
-                const setIndex = currentExerciseSets.findIndex(set => set.id == setId);
-                if (setIndex !== -1) {
-                    currentExerciseSets[setIndex].completed = newState;
+            data = await response.json();
+            if (!response.ok) {
+                console.error('Failed to sync sets:', data.error);
+                if (response.status === 400) {
+                    // The batch itself is invalid, sending it again won't help
+                    saveQueue(loadQueue().filter(mutation => !sentIds.has(mutation.id)));
+                    alert('Error updating sets: ' + data.error);
                 }
+                return null;
+            }
+        } catch (error) {
+            console.log('Could not reach the server, set updates stay queued:', error);
+            return null;
+        }
 
-                // Check and update the state of the "Complete Workout" button
-                updateCompleteWorkoutButtonState();
+        // Drop the sent mutations, keeping any queued while the request was in flight
+        saveQueue(loadQueue().filter(mutation => !sentIds.has(mutation.id)));
 
+        const failed = data.results.filter(item => item.status !== 200);
+        if (failed.length > 0) {
+            console.error('Failed to update sets:', failed);
+            alert('Error updating set: ' + failed.map(item => item.error).join(', '));
+        } else {
+            console.log(`${mutations.length} set update(s) synced.`);
+        }
+        if (data.changes) {
+            applyChanges(data.changes);
+        }
+        return data.results;
+    }
+
+    // Fetches the changes made since syncSeq, e.g. on another device
+    async function pullChanges() {
+        if (syncSeq === null || !navigator.onLine) {
+            return;
+        }
+        try {
+            const response = await fetch(`/api/sync?since=${syncSeq}`);
+            const data = await response.json();
+            if (response.ok) {
+                applyChanges(data);
             } else {
-                console.error('Failed to update set:', data.error);
-                alert('Error updating set: ' + data.error);
+                console.error('Failed to fetch changes:', data.error);
             }
         } catch (error) {
-            console.error('Error updating set:', error);
-            alert('An error occurred while updating the set.');
+            console.log('Could not reach the server to fetch changes:', error);
         }
     }
 
+    // Updates the sets shown on this page from a GET /api/sync response
+    function applyChanges(changes) {
+        if (changes.reset) {
+            // The server's data was replaced, e.g. restored from a backup
+            window.location.reload();
+            return;
+        }
+        syncSeq = changes.seq;
+        missedChanges = false;
+        // Local edits that are still queued win over the server's copy
+        const queuedSetIds = new Set(loadQueue().map(mutation => String(mutation.set_id)));
+        changes.sets.forEach(set => {
+            const setIndex = currentExerciseSets.findIndex(current => current.id == set.id);
+            if (setIndex === -1 || queuedSetIds.has(String(set.id))) {
+                return;
+            }
+            currentExerciseSets[setIndex] = { ...currentExerciseSets[setIndex], ...set, completed: !!set.completed };
+            renderSetValues(currentExerciseSets[setIndex]);
+        });
+        updateCompleteWorkoutButtonState();
+        if (changes.more) {
+            pullChanges();
+        }
+    }
+
+    function renderSetValues(set) {
+        const setItemElement = document.querySelector(`.set-item[data-set-id="${set.id}"]`);
+        if (!setItemElement) {
+            return;
+        }
+        const weightInput = setItemElement.querySelector('input[placeholder="Weight"]');
+        const repsInput = setItemElement.querySelector('input[placeholder="Reps"]');
+        // Don't change a value while it is being typed
+        if (weightInput !== document.activeElement) {
+            weightInput.value = set.weight !== null ? set.weight : '';
+        }
+        if (repsInput !== document.activeElement) {
+            repsInput.value = set.reps !== null ? set.reps : '';
+        }
+        setItemElement.querySelector('.complete-set-button').textContent = set.completed ? '✔️' : '□';
+    }
+
+    // Sends queued edits, or if there were none and the page was hidden or
+    // offline fetches the changes made meanwhile
+    async function syncNow() {
+        const results = await flushSetUpdates();
+        if (results !== null && results.length === 0 && missedChanges) {
+            await pullChanges();
+        }
+    }
+
+    // Don't lose edits made just before leaving the page. They are also still
+    // in the queue, which the next page sends if this request doesn't make it.
+    window.addEventListener('pagehide', () => flushSetUpdates(true));
+    // Catch up when the connection returns or the app is reopened
+    window.addEventListener('offline', () => { missedChanges = true; });
+    window.addEventListener('online', syncNow);
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'visible') {
+            syncNow();
+        } else {
+            missedChanges = true;
+        }
+    });
+
 
     // Event handler for adding a new set (remains the same placeholder)
      async function handleAddSet(event) {
@@ -365,9 +530,39 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Initial Load ---
 
-    // Fetch session exercises for navigation first
-    fetchSessionExercisesForNavigation(sessionId);
+    // The page route inlines the whole session (exercises and their sets),
+    // so normally nothing needs to be fetched
+    const sessionBundleElement = document.getElementById('session-bundle');
+    const sessionBundle = sessionBundleElement ? JSON.parse(sessionBundleElement.textContent) : null;
+
+    if (sessionBundle) {
+        sessionExercises = sessionBundle.exercises;
+        currentExerciseIndex = sessionExercises.findIndex(ex => ex.exercise_id == parseInt(exerciseId));
+        updateNavigationButtonDisplay();
+
+        const currentExercise = sessionExercises[currentExerciseIndex];
+        displayExercise(currentExercise, currentExercise.sets);
+        currentExerciseSets = currentExercise.sets;
+        syncSeq = sessionBundle.sync_seq;
+
+        // Show edits that are still queued instead of the older values on the server
+        loadQueue().forEach(({ id, set_id, sent, ...fields }) => {
+            const set = currentExerciseSets.find(current => current.id == set_id);
+            if (set) {
+                Object.assign(set, fields);
+                renderSetValues(set);
+            }
+        });
+        updateCompleteWorkoutButtonState();
+    } else {
+        // Fetch session exercises for navigation first
+        fetchSessionExercisesForNavigation(sessionId);
+
+         // Then fetch exercise details and sets
+         fetchExerciseDetails(sessionId, exerciseId);
+    }
 
-     // Then fetch exercise details and sets
-     fetchExerciseDetails(sessionId, exerciseId);
+    // Send any edits left in the queue by an earlier page, e.g. made offline.
+    // Nothing is fetched otherwise, the page was just loaded with the latest sets.
+    flushSetUpdates();
 });
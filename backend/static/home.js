@@ -106,13 +106,10 @@ document.addEventListener('DOMContentLoaded', () => {
             const data = await response.json();
             if (response.ok) {
                 console.log('New Session created:', data.session_id);
-                // Redirect to the first exercise of the new session
-                 const exercisesResponse = await fetch(`/api/session/${data.session_id}/exercises`);
-                 const exercises = await exercisesResponse.json();
-
-                 if (exercises && exercises.length > 0) {
-                     const firstExerciseId = exercises[0].exercise_id;
-                     window.location.href = `/session/${data.session_id}/exercise/${firstExerciseId}`;
+                // Redirect to the first exercise of the new session, which
+                // the create response already includes
+                 if (data.first_exercise_id) {
+                     window.location.href = `/session/${data.session_id}/exercise/${data.first_exercise_id}`;
                  } else {
                      alert('Session created, but no exercises found for this day.');
                       window.location.reload();
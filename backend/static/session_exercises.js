@@ -16,27 +16,36 @@ document.addEventListener('DOMContentLoaded', () => {
 
     sessionTitle.textContent = `Session ${sessionId} Exercises`; // Placeholder
 
+    function displayExercises(exercises) {
+        if (exercises.length === 0) {
+            exerciseList.innerHTML = '<li>No exercises found for this session.</li>';
+            return;
+        }
+        exercises.forEach(exercise => {
+            const listItem = document.createElement('li');
+            // Link to the exercise detail page
+            listItem.innerHTML = `<a href="/session/${sessionId}/exercise/${exercise.exercise_id}">${exercise.title}</a>`;
+            exerciseList.appendChild(listItem);
+        });
+    }
+
     // Fetch exercises for the session
     async function fetchSessionExercises(sessionId) {
         try {
             const response = await fetch(`/api/session/${sessionId}/exercises`);
             const exercises = await response.json();
-            if (exercises.length === 0) {
-                exerciseList.innerHTML = '<li>No exercises found for this session.</li>';
-                return;
-            }
-            exercises.forEach(exercise => {
-                const listItem = document.createElement('li');
-                // Link to the exercise detail page
-                listItem.innerHTML = `<a href="/session/${sessionId}/exercise/${exercise.exercise_id}">${exercise.title}</a>`;
-                exerciseList.appendChild(listItem);
-            });
+            displayExercises(exercises);
         } catch (error) {
             console.error('Error fetching session exercises:', error);
             exerciseList.innerHTML = '<li>Error loading exercises.</li>';
         }
     }
 
-    // Fetch exercises when the page loads
-    fetchSessionExercises(sessionId);
+    // Use the session data inlined by the page route, fetching only without it
+    const sessionBundleElement = document.getElementById('session-bundle');
+    if (sessionBundleElement) {
+        displayExercises(JSON.parse(sessionBundleElement.textContent).exercises);
+    } else {
+        fetchSessionExercises(sessionId);
+    }
 });
@@ -17,10 +17,23 @@ document.addEventListener('DOMContentLoaded', () => {
 
 
     // --- Fetch and display motivational message ---
-    async function fetchMotivationalMessage(sessionId) {
+    // The message is generated in the background. While it is pending the
+    // API answers 202 with a Retry-After header, so poll until it is ready.
+    const maxMessagePolls = 30;
+
+    async function fetchMotivationalMessage(sessionId, attempt = 1) {
         try {
             // Use the session_id in the API call
             const response = await fetch(`/api/session/${sessionId}/completed-message`);
+            if (response.status === 202) {
+                if (attempt >= maxMessagePolls) {
+                    motivationalMessageElement.textContent = 'Awesome work today! 💪';
+                    return;
+                }
+                const retryAfterSeconds = parseInt(response.headers.get('Retry-After'), 10) || 1;
+                setTimeout(() => fetchMotivationalMessage(sessionId, attempt + 1), retryAfterSeconds * 1000);
+                return;
+            }
             if (!response.ok) {
                 motivationalMessageElement.textContent = 'Error loading message.';
                 console.error('Failed to fetch motivational message:', response.status);
@@ -0,0 +1,136 @@
+# backend/sync.py
+# Delta sync for offline clients. The sync_change log (see
+# migrations/0010_sync.sql) holds the latest change of every session and
+# exercise_set under an increasing seq, so a client that reconnects only
+# fetches the rows that changed since the last seq it saw instead of the
+# whole session. Client edits made while offline are queued and sent as one
+# batch of mutations, each with a client-generated id so that sending a
+# batch again applies it only once.
+import os
+
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+SYNC_MAX_MUTATIONS = int(os.getenv("SYNC_MAX_MUTATIONS", "500"))
+# Applied mutation ids are kept this long, longer than a client stays offline
+SYNC_MUTATION_RETENTION_DAYS = int(os.getenv("SYNC_MUTATION_RETENTION_DAYS", "30"))
+
+SET_COLUMNS = [
+    "session_id",
+    "exercise_id",
+    "set_number",
+    "set_type",
+    "weight",
+    "reps",
+    "completed",
+    "is_personal_record",
+    "start_time",
+    "end_time",
+]
+
+
+def get_current_seq(db):
+    return db.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_change").fetchone()[0]
+
+
+def get_changes(db, user_id, since, limit=None):
+    """
+    Returns a user's sessions and sets changed after seq since, oldest change
+    first, at most limit changes per call:
+
+        {"seq": <resume from>, "more": <another page waiting>,
+         "reset": <since is ahead of the server, reload everything>,
+         "sessions": [...], "sets": [...],
+         "deleted": {"sessions": [ids], "sets": [ids]}}
+
+    The log and the rows are read in one statement, so a page is consistent.
+    """
+    limit = limit or SYNC_PAGE_SIZE
+    rows = db.execute(
+        """
+        SELECT
+            c.seq,
+            c.table_name,
+            c.row_id,
+            c.deleted,
+            s.start_time AS session_start_time,
+            s.day_id,
+            es.session_id,
+            es.exercise_id,
+            es.set_number,
+            es.set_type,
+            es.weight,
+            es.reps,
+            es.completed,
+            es.is_personal_record,
+            es.start_time,
+            es.end_time
+        FROM sync_change c
+        LEFT JOIN session s
+            ON c.table_name = 'session' AND s.id = c.row_id
+        LEFT JOIN exercise_set es
+            ON c.table_name = 'exercise_set' AND es.id = c.row_id
+        WHERE c.user_id = ? AND c.seq > ?
+        ORDER BY c.seq
+        LIMIT ?
+    """,
+        (user_id, since, limit),
+    ).fetchall()
+
+    changes = {
+        "seq": rows[-1]["seq"] if rows else since,
+        "more": len(rows) == limit,
+        "reset": False,
+        "sessions": [],
+        "sets": [],
+        "deleted": {"sessions": [], "sets": []},
+    }
+    if not rows:
+        # A since the server has never handed out, e.g. after a restore from
+        # a backup, means the client's copy can't be trusted
+        current_seq = get_current_seq(db)
+        if since > current_seq:
+            changes.update({"seq": current_seq, "reset": True})
+        return changes
+
+    for row in rows:
+        if row["table_name"] == "session":
+            if row["deleted"]:
+                changes["deleted"]["sessions"].append(row["row_id"])
+            else:
+                changes["sessions"].append(
+                    {
+                        "id": row["row_id"],
+                        "start_time": row["session_start_time"],
+                        "day_id": row["day_id"],
+                    }
+                )
+        elif row["deleted"]:
+            changes["deleted"]["sets"].append(row["row_id"])
+        else:
+            change = {column: row[column] for column in SET_COLUMNS}
+            changes["sets"].append({"id": row["row_id"], **change})
+    return changes
+
+
+def is_mutation_applied(db, user_id, mutation_id):
+    return (
+        db.execute(
+            "SELECT 1 FROM sync_mutation WHERE user_id = ? AND mutation_id = ?",
+            (user_id, mutation_id),
+        ).fetchone()
+        is not None
+    )
+
+
+def record_mutation(db, user_id, mutation_id):
+    """Records a client mutation id as applied, in the transaction that applied it."""
+    db.execute(
+        "INSERT INTO sync_mutation (user_id, mutation_id) VALUES (?, ?)",
+        (user_id, mutation_id),
+    )
+
+
+def prune_mutations(db):
+    db.execute(
+        "DELETE FROM sync_mutation WHERE applied_at < datetime('now', 'localtime', ?)",
+        (f"-{SYNC_MUTATION_RETENTION_DAYS} days",),
+    )
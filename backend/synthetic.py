@@ -0,0 +1,267 @@
+# backend/synthetic.py
+# Synthetic workout history for load testing and benchmarks. Generates
+# programs, days and years of sessions for several users from a seeded
+# random generator, so the same options always produce the same database.
+# Lifters progress like a linear program: a successful session adds weight,
+# three failed sessions in a row drop it 10%, and sessions are sometimes
+# skipped or left partly logged.
+#
+# Rows are written with executemany in a few large transactions. The
+# rollup triggers keep session_summary and exercise_session_stats up to
+# date, and the PR index is rebuilt once at the end.
+import datetime
+import random
+
+from . import personal_records
+
+SYNTHETIC_SEED = 42
+SYNTHETIC_END_DATE = "2025-01-01"  # Fixed so the data doesn't depend on the day it is generated
+SESSIONS_PER_BATCH = 1000
+# Titles of the generated programs, is_synthetic() recognises them by it
+SYNTHETIC_PROGRAM_PREFIX = "Synthetic program "
+
+# title, warmup sets, working sets, starting weight, increment
+EXERCISE_CATALOG = [
+    ("Squat", 3, 3, 60, 2.5),
+    ("Bench press", 3, 3, 50, 2.5),
+    ("Deadlift", 3, 3, 80, 5),
+    ("Military press", 3, 3, 35, 2.5),
+    ("Barbell row", 2, 3, 50, 2.5),
+    ("Bicep curl", 0, 3, 15, 1),
+    ("Front squat", 3, 3, 50, 2.5),
+    ("Incline bench press", 2, 3, 40, 2.5),
+    ("Romanian deadlift", 2, 3, 60, 2.5),
+    ("Pull up", 0, 3, 0, 1.25),
+    ("Dip", 0, 3, 0, 1.25),
+    ("Power clean", 3, 5, 40, 2.5),
+    ("Lunge", 1, 3, 30, 2.5),
+    ("Tricep extension", 0, 3, 15, 1),
+    ("Lat pulldown", 1, 3, 40, 2.5),
+    ("Leg press", 2, 3, 100, 5),
+]
+WARMUP_PERCENTS = [(0.4, 5), (0.6, 3), (0.8, 2)]
+WORKING_REPS = 5
+DAYS_PER_PROGRAM = 3
+EXERCISES_PER_DAY = (3, 6)
+TRAINING_WEEKDAYS = (0, 2, 4)  # Monday, Wednesday, Friday
+SKIP_PROBABILITY = 0.1
+SUCCESS_PROBABILITY = 0.8
+UNLOGGED_SET_PROBABILITY = 0.03
+
+
+def is_synthetic(db):
+    """
+    Whether the database holds generated history and no real workouts:
+    there are generated programs and every session is on one of their days.
+    """
+    return db.execute(
+        """
+        SELECT EXISTS (SELECT 1 FROM program WHERE title LIKE ? || '%')
+           AND NOT EXISTS (
+                SELECT 1
+                FROM session s
+                JOIN day d ON s.day_id = d.id
+                JOIN program p ON d.program_id = p.id
+                WHERE p.title NOT LIKE ? || '%'
+           )
+    """,
+        (SYNTHETIC_PROGRAM_PREFIX, SYNTHETIC_PROGRAM_PREFIX),
+    ).fetchone()[0] == 1
+
+
+def _get_or_create_exercises(db):
+    """Returns {title: (exercise_id, catalog entry)}, reusing existing exercises."""
+    exercises = {}
+    for entry in EXERCISE_CATALOG:
+        title, warmup_sets, working_sets = entry[:3]
+        row = db.execute(
+            "SELECT id FROM exercise WHERE title = ? ORDER BY id LIMIT 1", (title,)
+        ).fetchone()
+        if row is None:
+            exercise_id = db.execute(
+                "INSERT INTO exercise (title, warmup_sets, working_sets) VALUES (?, ?, ?)",
+                (title, warmup_sets, working_sets),
+            ).lastrowid
+        else:
+            exercise_id = row["id"]
+        exercises[title] = (exercise_id, entry)
+    return exercises
+
+
+def _create_programs(db, rng, exercises, program_count):
+    """Creates shared programs and returns [[(day_id, [exercise titles])]] per program."""
+    titles = sorted(exercises)
+    programs = []
+    for program_number in range(1, program_count + 1):
+        program_id = db.execute(
+            "INSERT INTO program (title, type) VALUES (?, 'weight')",
+            (f"{SYNTHETIC_PROGRAM_PREFIX}{program_number}",),
+        ).lastrowid
+        days = []
+        for day_number in range(DAYS_PER_PROGRAM):
+            day_id = db.execute(
+                "INSERT INTO day (program_id, title) VALUES (?, ?)",
+                (program_id, f"Day {chr(ord('A') + day_number)}"),
+            ).lastrowid
+            day_titles = rng.sample(titles, rng.randint(*EXERCISES_PER_DAY))
+            db.executemany(
+                """
+                INSERT INTO day_exercise (day_id, exercise_id, exercise_sequence)
+                VALUES (?, ?, ?)
+            """,
+                [
+                    (day_id, exercises[title][0], sequence)
+                    for sequence, title in enumerate(day_titles, start=1)
+                ],
+            )
+            days.append((day_id, day_titles))
+        programs.append(days)
+    return programs
+
+
+def _create_users(db, user_count):
+    """User 1 plus synthetic-2, synthetic-3, ... Returns their ids."""
+    user_ids = [1]
+    for user_number in range(2, user_count + 1):
+        name = f"synthetic-{user_number}"
+        db.execute("INSERT OR IGNORE INTO user (name) VALUES (?)", (name,))
+        user_ids.append(
+            db.execute("SELECT id FROM user WHERE name = ?", (name,)).fetchone()["id"]
+        )
+    return user_ids
+
+
+def _iter_sessions(rng, user_ids, programs, exercises, years, end_date):
+    """
+    Yields (user_id, day_id, start_time, sets) in chronological order per
+    user, where sets are (exercise_id, set_number, set_type, weight, reps,
+    completed) tuples.
+    """
+    start_date = end_date - datetime.timedelta(days=round(365.25 * years))
+    for user_index, user_id in enumerate(user_ids):
+        strength = 0.7 + 0.6 * rng.random()  # Some users lift more than others
+        weights = {}  # exercise title -> current working weight
+        failures = {}  # exercise title -> failed sessions in a row
+        session_number = 0
+        date = start_date
+        while date < end_date:
+            if date.weekday() in TRAINING_WEEKDAYS and rng.random() >= SKIP_PROBABILITY:
+                # Users switch program once a year
+                year = (date - start_date).days // 365
+                days = programs[(user_index + year) % len(programs)]
+                day_id, day_titles = days[session_number % len(days)]
+                session_number += 1
+                start_time = datetime.datetime.combine(
+                    date, datetime.time(rng.randint(6, 19), rng.randint(0, 59))
+                )
+
+                sets = []
+                for title in day_titles:
+                    exercise_id, (_, warmup_sets, working_sets, start, increment) = exercises[title]
+                    weight = weights.setdefault(title, round(start * strength / 2.5) * 2.5)
+                    for set_number, (percent, reps) in enumerate(
+                        WARMUP_PERCENTS[:warmup_sets], start=1
+                    ):
+                        warmup_weight = round(weight * percent / 2.5) * 2.5
+                        sets.append((exercise_id, set_number, "warmup", warmup_weight, reps, True))
+
+                    success = rng.random() < SUCCESS_PROBABILITY
+                    for set_number in range(1, working_sets + 1):
+                        if rng.random() < UNLOGGED_SET_PROBABILITY:
+                            sets.append((exercise_id, set_number, "working", None, None, False))
+                            continue
+                        reps = WORKING_REPS
+                        if not success and set_number == working_sets:
+                            reps = rng.randint(1, WORKING_REPS - 1)
+                        sets.append((exercise_id, set_number, "working", weight, reps, True))
+
+                    if success:
+                        weights[title] = weight + increment
+                        failures[title] = 0
+                    else:
+                        failures[title] = failures.get(title, 0) + 1
+                        if failures[title] >= 3:
+                            weights[title] = round(weight * 0.9 / 2.5) * 2.5
+                            failures[title] = 0
+
+                yield user_id, day_id, start_time.strftime("%Y-%m-%d %H:%M:%S"), sets
+            date += datetime.timedelta(days=1)
+
+
+def _insert_sessions(db, sessions):
+    """
+    Inserts a batch of generated sessions and their sets in one transaction.
+    Returns the number of sets.
+    """
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        set_count = _insert_session_rows(db, sessions)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return set_count
+
+
+def _insert_session_rows(db, sessions):
+    next_session_id = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM session").fetchone()[0]
+    session_rows = []
+    set_rows = []
+    for offset, (user_id, day_id, start_time, sets) in enumerate(sessions):
+        session_id = next_session_id + offset
+        session_rows.append((session_id, start_time, day_id, user_id))
+        set_rows.extend(
+            (session_id, exercise_id, set_number, set_type, weight, reps, completed)
+            for exercise_id, set_number, set_type, weight, reps, completed in sets
+        )
+    db.executemany(
+        "INSERT INTO session (id, start_time, day_id, user_id) VALUES (?, ?, ?, ?)",
+        session_rows,
+    )
+    db.executemany(
+        """
+        INSERT INTO exercise_set (
+            session_id, exercise_id, set_number, set_type, weight, reps, completed
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+        set_rows,
+    )
+    return len(set_rows)
+
+
+def seed_synthetic(
+    db, users=3, programs=4, years=3, seed=SYNTHETIC_SEED, end_date=SYNTHETIC_END_DATE
+):
+    """
+    Adds synthetic programs, users and sessions to the database and returns
+    counts of what was created.
+    """
+    rng = random.Random(seed)
+    end_date = datetime.date.fromisoformat(end_date)
+    stats = {"users": users, "programs": programs, "sessions": 0, "sets": 0}
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        exercises = _get_or_create_exercises(db)
+        program_days = _create_programs(db, rng, exercises, programs)
+        user_ids = _create_users(db, users)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    batch = []
+    for session in _iter_sessions(rng, user_ids, program_days, exercises, years, end_date):
+        batch.append(session)
+        if len(batch) == SESSIONS_PER_BATCH:
+            stats["sets"] += _insert_sessions(db, batch)
+            stats["sessions"] += len(batch)
+            batch = []
+    if batch:
+        stats["sets"] += _insert_sessions(db, batch)
+        stats["sessions"] += len(batch)
+
+    personal_records.rebuild_personal_records(db)
+    db.commit()
+    return stats
+
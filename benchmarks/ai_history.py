@@ -0,0 +1,115 @@
+# benchmarks/ai_history.py
+# Extracts the AI prompt history (see openai_service.get_working_set_history)
+# for sessions spread over a generated 5-year history, with the id range
+# query and string formatting get_workout_history_csv_for_ai used before,
+# and with the start_time window and csv writer it uses now, for a session
+# count and for a date range.
+#
+#   python -m benchmarks.ai_history [--years 5] [--samples 200] [--repeat 5]
+import argparse
+import datetime
+import tempfile
+import time
+
+from benchmarks import common
+
+
+def get_history_csv_by_id_range(current_session_id, query_db_func):
+    """
+    The extraction get_workout_history_csv_for_ai used before: sessions
+    picked by an id range built into the SQL, formatted by hand.
+    """
+    min_session_id = max(1, current_session_id - 4)
+    workout_history_data = query_db_func(
+        f"""
+        SELECT
+            session_id,
+            s.start_time workout_time,
+            e.title exercise,
+            es.set_number,
+            es.weight weight_kg,
+            es.reps reps
+        FROM exercise_set es
+        JOIN exercise e ON es.exercise_id = e.id
+        JOIN session s ON es.session_id = s.id
+        WHERE es.set_type = 'working' AND
+              s.id BETWEEN {min_session_id} AND {current_session_id}
+        ORDER BY s.start_time DESC, es.id DESC
+    """
+    )
+    if not workout_history_data:
+        return "No workout history available."
+    csv_lines = ["session_id,workout_time,exercise,set_number,weight_kg,reps"]
+    for row in workout_history_data:
+        formatted_row = [
+            str(row["session_id"]),
+            str(row["workout_time"]),
+            f'"{row["exercise"]}"',
+            str(row["set_number"]),
+            str(row["weight_kg"]) if row["weight_kg"] is not None else "",
+            str(row["reps"]) if row["reps"] is not None else "",
+        ]
+        csv_lines.append(",".join(formatted_row))
+    return "\n".join(csv_lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI history extraction.")
+    parser.add_argument("--years", type=float, default=5, help="Years of generated history.")
+    parser.add_argument("--samples", type=int, default=200, help="Sessions to extract for.")
+    parser.add_argument("--repeat", type=int, default=5, help="Extractions per session.")
+    parser.add_argument("--days", type=int, default=90, help="Length of the date range.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory, years=args.years)
+
+        from backend import openai_service
+        from backend.database import query_db
+
+        with app.app_context():
+            sessions = query_db(
+                "SELECT id, start_time FROM session WHERE user_id = 1 ORDER BY start_time"
+            )
+            # Sessions spread evenly from the oldest to the newest
+            step = max(1, len(sessions) // args.samples)
+            samples = sessions[::step][: args.samples]
+
+            def since(session):
+                start_time = datetime.datetime.fromisoformat(session["start_time"])
+                return (start_time - datetime.timedelta(days=args.days)).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+
+            methods = {
+                "id range, f-string (before)": lambda session: (
+                    get_history_csv_by_id_range(session["id"], query_db)
+                ),
+                f"start_time, {openai_service.HISTORY_SESSIONS} sessions": lambda session: (
+                    openai_service.get_workout_history_csv_for_ai(session["id"], query_db)
+                ),
+                f"start_time, last {args.days} days": lambda session: (
+                    openai_service.get_workout_history_csv_for_ai(
+                        session["id"], query_db, num_sessions=None, since=since(session)
+                    )
+                ),
+            }
+            durations = {name: [] for name in methods}
+            lines = {name: 0 for name in methods}
+            for _ in range(args.repeat):
+                for session in samples:
+                    for name, extract in methods.items():
+                        started = time.perf_counter()
+                        history_csv = extract(session)
+                        durations[name].append((time.perf_counter() - started) * 1000)
+                        lines[name] += history_csv.count("\n")
+
+        common.print_header(f"AI history of {len(samples)} sessions over {args.years:g} years")
+        for name, values in durations.items():
+            common.print_row(name, values)
+        for name, count in lines.items():
+            print(f"{name:<44} {count / len(durations[name]):.0f} sets per prompt")
+
+
+if __name__ == "__main__":
+    main()
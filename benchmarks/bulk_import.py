@@ -0,0 +1,171 @@
+# benchmarks/bulk_import.py
+# Importing a large history with bulk_import.import_records, as `flask
+# import` does. A CSV of --sets generated sets (1M by default, 20 per
+# session on the generated programs' days, six hours apart, all before the
+# generated history) is imported for user 1, then imported again, when every
+# record already exists and is skipped. Then a smaller CSV of --small-sets is
+# imported for user 2, e.g. a new user bringing over a year from another app.
+#
+# An import ends by replaying the user's personal records at the imported
+# (exercise, reps) keys. That replay is timed on its own for both imports,
+# against rebuilding every user's records as imports did before, rolled back
+# each time.
+#
+#   python -m benchmarks.bulk_import [--sets 1000000] [--small-sets 2000] [--batch-size 5000]
+import argparse
+import csv
+import datetime
+import os
+import tempfile
+import time
+
+from benchmarks import common
+
+COLUMNS = (
+    "session_start_time",
+    "program_title",
+    "day_title",
+    "exercise_title",
+    "set_number",
+    "set_type",
+    "weight",
+    "reps",
+    "completed",
+)
+SETS_PER_EXERCISE = 5
+
+
+def write_history(app, path, set_count, start_time):
+    """Writes set_count sets to a CSV file, returns their (exercise, reps) keys."""
+    from backend.database import get_db
+
+    with app.app_context():
+        days = {}
+        for row in get_db().execute(
+            """
+            SELECT p.title AS program_title, d.id AS day_id, d.title AS day_title,
+                   e.title AS exercise_title, e.id AS exercise_id
+            FROM program p
+            JOIN day d ON d.program_id = p.id
+            JOIN day_exercise de ON de.day_id = d.id
+            JOIN exercise e ON de.exercise_id = e.id
+            WHERE p.title LIKE 'Synthetic program %'
+            ORDER BY d.id, de.exercise_sequence
+        """
+        ):
+            days.setdefault(row["day_id"], []).append(row)
+    days = [exercises[:4] for exercises in days.values()]
+
+    keys = set()
+    written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        session = 0
+        while written < set_count:
+            exercises = days[session % len(days)]
+            for exercise in exercises:
+                reps = (5, 8, 3)[session % 3]
+                # Slow progression with deloads, so some sets beat the record
+                weight = 40 + (session // 10) % 200 * 0.5
+                for set_number in range(1, SETS_PER_EXERCISE + 1):
+                    if written == set_count:
+                        break
+                    writer.writerow(
+                        (
+                            start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                            exercise["program_title"],
+                            exercise["day_title"],
+                            exercise["exercise_title"],
+                            set_number,
+                            "working",
+                            weight,
+                            reps,
+                            "true",
+                        )
+                    )
+                    keys.add((exercise["exercise_id"], reps))
+                    written += 1
+            session += 1
+            start_time += datetime.timedelta(hours=6)
+    return keys
+
+
+def import_history(db, user_id, path, batch_size):
+    from backend import bulk_import
+
+    with open(path, newline="") as f:
+        stats = bulk_import.import_records(
+            db, user_id, bulk_import.iter_records(f, "csv"), batch_size
+        )
+    if stats["failed"]:
+        raise RuntimeError(f"{stats['failed']} rows failed: {stats['errors']}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark importing a large history.")
+    parser.add_argument("--sets", type=int, default=1_000_000, help="Sets of the large import.")
+    parser.add_argument("--small-sets", type=int, default=2000, help="Sets of the small import.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Sets per transaction.")
+    parser.add_argument("--rebuilds", type=int, default=5, help="Replays per scope.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory)
+
+        from backend import personal_records
+        from backend.database import get_db
+
+        large_path = os.path.join(directory, "large.csv")
+        large_keys = write_history(
+            app, large_path, args.sets, datetime.datetime(1980, 1, 1, 8)
+        )
+        small_path = os.path.join(directory, "small.csv")
+        small_keys = write_history(
+            app, small_path, args.small_sets, datetime.datetime(2015, 1, 1, 8)
+        )
+        print(f"Wrote {args.sets} sets, {os.path.getsize(large_path) / 1e6:.0f} MB of CSV")
+
+        print()
+        print(f"{'':<44} {'rows':>9} {'inserted':>9} {'seconds':>9} {'rows/s':>9}")
+        imports = [
+            ("Import, user 1", 1, large_path),
+            ("Import again, every row skipped", 1, large_path),
+            ("Small import, user 2", 2, small_path),
+        ]
+        with app.app_context():
+            db = get_db()
+            for name, user_id, path in imports:
+                stats = import_history(db, user_id, path, args.batch_size)
+                print(
+                    f"{name:<44} {stats['rows']:>9} {stats['inserted']:>9} "
+                    f"{stats['seconds']:>9.1f} {stats['rows_per_second']:>9}"
+                )
+
+            cases = [
+                (
+                    f"Large import's keys of user 1 ({len(large_keys)})",
+                    lambda: personal_records.rebuild_personal_records(db, 1, large_keys),
+                ),
+                (
+                    f"Small import's keys of user 2 ({len(small_keys)})",
+                    lambda: personal_records.rebuild_personal_records(db, 2, small_keys),
+                ),
+                ("Every user (before)", lambda: personal_records.rebuild_personal_records(db)),
+            ]
+            durations = {name: [] for name, _ in cases}
+            for name, run in cases:
+                for _ in range(args.rebuilds):
+                    started = time.perf_counter()
+                    run()
+                    durations[name].append((time.perf_counter() - started) * 1000)
+                    db.rollback()
+
+        common.print_header("Replaying personal records after an import")
+        for name, values in durations.items():
+            common.print_row(name, values)
+
+
+if __name__ == "__main__":
+    main()
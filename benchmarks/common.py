@@ -0,0 +1,74 @@
+# benchmarks/common.py
+# Shared setup for the benchmark scripts in this directory. Every script
+# runs against its own throwaway database filled with generated history (see
+# backend/synthetic.py), so results don't depend on real data and real data
+# is never written to. Run them from the repository root, e.g.
+#
+#   python -m benchmarks.session_creation
+#
+# backend reads its settings (DATABASE_PATH, DATABASE_JOURNAL_MODE, ...) from
+# the environment once, when it is imported, so scripts call
+# create_database() before importing anything from backend.
+import os
+import sys
+import time
+
+
+def create_database(directory, users=3, programs=4, years=3, seed=42, **settings):
+    """
+    Creates a database in directory, fills it with generated history and
+    returns the app. settings are extra environment variables for backend,
+    e.g. DATABASE_JOURNAL_MODE="DELETE".
+    """
+    if "backend" in sys.modules:
+        raise RuntimeError("create_database() must be called before backend is imported")
+    os.environ["DATABASE_PATH"] = os.path.join(directory, "database.sqlite")
+    os.environ["BACKUP_INTERVAL_HOURS"] = "0"  # No snapshots while timing
+    os.environ.update({key: str(value) for key, value in settings.items()})
+
+    from backend.app import create_app
+    from backend.database import get_db, init_db
+    from backend import synthetic
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+        started = time.perf_counter()
+        stats = synthetic.seed_synthetic(get_db(), users, programs, years, seed)
+    print(
+        f"Generated {stats['sessions']} sessions with {stats['sets']} sets for "
+        f"{users} users in {time.perf_counter() - started:.1f}s"
+    )
+    return app
+
+
+def client_for(app, user_id=1):
+    """A test client whose requests are made as user_id."""
+    from backend import auth
+
+    client = app.test_client()
+    client.environ_base[auth.USER_ID_ENVIRON] = user_id
+    return client
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def print_header(title):
+    print()
+    print(title)
+    print(f"{'':<44} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'total s':>8}")
+
+
+def print_row(name, durations_ms):
+    """Prints the count, mean, p50, p95 and total of a list of durations in ms."""
+    print(
+        f"{name:<44} {len(durations_ms):>7} "
+        f"{sum(durations_ms) / len(durations_ms):>9.3f} "
+        f"{percentile(durations_ms, 50):>9.3f} {percentile(durations_ms, 95):>9.3f} "
+        f"{sum(durations_ms) / 1000:>8.2f}"
+    )
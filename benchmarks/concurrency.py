@@ -0,0 +1,149 @@
+# benchmarks/concurrency.py
+# Readers against a writer. Reader threads load session bundles, first on
+# their own and then while a writer thread keeps committing transactions of
+# --write-batch sets (like an import batch), once with the WAL journal and
+# once with the rollback (DELETE) journal. With WAL the readers keep their
+# latency while the writer commits; with the rollback journal they wait for
+# its locks.
+#
+#   python -m benchmarks.concurrency [--readers 4] [--seconds 5] [--write-batch 200]
+#
+# Without --journal-mode both modes are run, each in its own process, since
+# the journal mode is read from DATABASE_JOURNAL_MODE when backend is imported.
+import argparse
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import common
+
+JOURNAL_MODES = ("WAL", "DELETE")
+
+
+def _run_reader(app, session_id, deadline, durations):
+    client = common.client_for(app)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = client.get(f"/api/session/{session_id}/bundle")
+        durations.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET bundle returned {response.status_code}")
+
+
+def _run_writer(session, deadline, durations, write_batch):
+    from backend.database import connect_db
+
+    db = connect_db()
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            db.execute("BEGIN IMMEDIATE")
+            session_id = db.execute(
+                "INSERT INTO session (day_id, user_id) VALUES (?, 1)", (session["day_id"],)
+            ).lastrowid
+            db.executemany(
+                """
+                INSERT INTO exercise_set (session_id, exercise_id, set_number, set_type, weight, reps, completed)
+                VALUES (?, ?, ?, 'working', 100, 5, TRUE)
+            """,
+                [
+                    (session_id, session["exercise_id"], set_number)
+                    for set_number in range(1, write_batch + 1)
+                ],
+            )
+            db.commit()
+            durations.append((time.perf_counter() - started) * 1000)
+    finally:
+        db.close()
+
+
+def _run_phase(app, session, readers, seconds, write_batch=None):
+    """Runs the reader threads, and the writer if write_batch is set, for seconds."""
+    deadline = time.perf_counter() + seconds
+    read_durations = []
+    write_durations = []
+    threads = [
+        threading.Thread(
+            target=_run_reader, args=(app, session["id"], deadline, read_durations)
+        )
+        for _ in range(readers)
+    ]
+    if write_batch:
+        threads.append(
+            threading.Thread(
+                target=_run_writer, args=(session, deadline, write_durations, write_batch)
+            )
+        )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return read_durations, write_durations
+
+
+def run(journal_mode, readers, seconds, write_batch):
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory, DATABASE_JOURNAL_MODE=journal_mode)
+
+        from backend.database import query_db
+
+        with app.app_context():
+            session = query_db(
+                """
+                SELECT s.id, s.day_id, es.exercise_id
+                FROM session s
+                JOIN exercise_set es ON es.session_id = s.id
+                WHERE s.user_id = 1
+                ORDER BY s.start_time DESC
+                LIMIT 1
+            """,
+                one=True,
+            )
+
+        read_alone, _ = _run_phase(app, session, readers, seconds)
+        read_with_writer, writes = _run_phase(app, session, readers, seconds, write_batch)
+
+        common.print_header(f"{journal_mode} journal, {readers} readers, {seconds:g}s per phase")
+        common.print_row("GET bundle, readers alone", read_alone)
+        common.print_row("GET bundle, with a writer", read_with_writer)
+        common.print_row(f"Writer, {write_batch} sets per transaction", writes)
+        print(
+            f"{'Slowest read, alone / with a writer':<44} "
+            f"{max(read_alone):.1f} ms / {max(read_with_writer):.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark readers against a writer.")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads.")
+    parser.add_argument("--seconds", type=float, default=5, help="Length of each phase.")
+    parser.add_argument("--write-batch", type=int, default=200, help="Sets per write.")
+    parser.add_argument("--journal-mode", choices=JOURNAL_MODES, help="Defaults to both.")
+    args = parser.parse_args()
+
+    if args.journal_mode:
+        run(args.journal_mode, args.readers, args.seconds, args.write_batch)
+        return
+    for journal_mode in JOURNAL_MODES:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.concurrency",
+                "--readers",
+                str(args.readers),
+                "--seconds",
+                str(args.seconds),
+                "--write-batch",
+                str(args.write_batch),
+                "--journal-mode",
+                journal_mode,
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
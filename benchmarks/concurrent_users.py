@@ -0,0 +1,133 @@
+# benchmarks/concurrent_users.py
+# Load test with many users logged in at once. A throwaway database is
+# filled with generated history for --users users, each is given a token,
+# and Gunicorn (with backend/gunicorn_conf.py, as in the container) is
+# started on it with DEFAULT_USER_ID empty, so every request must carry a
+# token. --clients-per-user threads per user then request the route mix of
+# load_test.py with that user's token and ids for --duration seconds.
+#
+# The latency of each user's requests and of all of them together is
+# printed. Users are identified from auth.py's in-process cache, so adding
+# users should not add a query per request.
+#
+#   python -m benchmarks.concurrent_users [--users 8] [--clients-per-user 1] [--duration 10]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import common, load_test
+
+
+def issue_tokens(app):
+    """Gives every user a token, returns {name: token}."""
+    from backend import auth
+    from backend.database import close_pool, get_db
+
+    with app.app_context():
+        db = get_db()
+        names = [row["name"] for row in db.execute("SELECT name FROM user ORDER BY id")]
+        tokens = {name: auth.issue_token(db, name)[1] for name in names}
+        db.commit()
+    # The server opens the database itself
+    close_pool()
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test with many users at once.")
+    parser.add_argument("--users", type=int, default=8, help="Users with generated history.")
+    parser.add_argument("--clients-per-user", type=int, default=1, help="Client threads per user.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run for.")
+    parser.add_argument("--writes", action="store_true", help="Include PUT /api/sets/<id>.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory, users=args.users)
+        tokens = issue_tokens(app)
+
+        env = dict(os.environ, DEFAULT_USER_ID="")
+        port = load_test._get_free_port()
+        url = f"http://127.0.0.1:{port}"
+        print("\nStarting Gunicorn...")
+        # The access log would swamp the results
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--config",
+                "python:backend.gunicorn_conf",
+                "--bind",
+                f"127.0.0.1:{port}",
+                "backend.app:create_app()",
+            ],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            load_test._wait_for_server(url, server)
+
+            client = load_test.Client(url)
+            try:
+                status, _ = client.request("GET", "/api/programs")
+            finally:
+                client.close()
+            if status != 401:
+                raise RuntimeError(f"A request without a token returned {status}, not 401")
+
+            # Each user's routes use the ids of their own latest session
+            routes = {}
+            for name, token in tokens.items():
+                client = load_test.Client(url, token)
+                try:
+                    routes[name] = load_test.get_routes(client, args.writes)
+                finally:
+                    client.close()
+
+            durations = {
+                name: {route[0]: [] for route in user_routes}
+                for name, user_routes in routes.items()
+            }
+            errors = []
+            deadline = time.perf_counter() + args.duration
+            threads = [
+                threading.Thread(
+                    target=load_test._run_client,
+                    args=(url, token, routes[name], offset, deadline, durations[name], errors),
+                )
+                for name, token in tokens.items()
+                for offset in range(args.clients_per_user)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+    per_user = {
+        name: [value for values in user_durations.values() for value in values]
+        for name, user_durations in durations.items()
+    }
+    all_durations = [value for values in per_user.values() for value in values]
+    common.print_header(
+        f"{len(tokens)} users, {len(threads)} clients for {args.duration:g}s: "
+        f"{len(all_durations)} requests, {len(all_durations) / args.duration:.0f} requests/s, "
+        f"{len(errors)} errors"
+    )
+    for name, values in per_user.items():
+        if values:
+            common.print_row(f"User {name}", values)
+    common.print_row("All users", all_durations)
+    for error in sorted(set(errors)):
+        print(f"Error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# benchmarks/load_test.py
+# Load test of the /api/ routes over HTTP. Client threads, each with its own
+# keep-alive connection like a phone, request a mix of routes for --duration
+# seconds, then the requests per second and the latency of every route are
+# printed.
+#
+# Without --url the two ways the app is served are compared: a throwaway
+# database is filled with generated history, then Gunicorn (with
+# backend/gunicorn_conf.py, as in the container) and the Flask development
+# server are started on it in turn and load tested with the same mix.
+#
+#   python -m benchmarks.load_test [--concurrency 8] [--duration 10] [--writes]
+#   python -m benchmarks.load_test --url http://localhost:5000 --token TOKEN
+#
+# --writes adds PUT /api/sets/<id> requests, which save a set's own weight
+# and reps back, so the data is left as it was.
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from benchmarks import common
+
+SERVER_START_TIMEOUT = 30  # Seconds to wait for a started server to answer
+
+
+class Client:
+    """One keep-alive connection to the server."""
+
+    def __init__(self, url, token=None):
+        parsed = urllib.parse.urlsplit(url)
+        self.connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+        self.headers = {"Content-Type": "application/json"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+    def request(self, method, path, data=None):
+        """Returns (status, body)."""
+        body = json.dumps(data) if data is not None else None
+        try:
+            self.connection.request(method, path, body, self.headers)
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server closed an idle keep-alive connection, reconnect once
+            self.connection.close()
+            self.connection.request(method, path, body, self.headers)
+            response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def get_json(self, path):
+        status, body = self.request("GET", path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(body)
+
+    def close(self):
+        self.connection.close()
+
+
+def get_routes(client, writes=False):
+    """
+    Returns (name, method, path, data) tuples for the route mix. Ids come
+    from the user's latest session, so every route does real work.
+    """
+    recent_sessions = client.get_json("/api/sessions/recent?limit=1")
+    if not recent_sessions:
+        raise RuntimeError("The user has no sessions, run `flask seed-synthetic` first")
+    session_id = recent_sessions[0]["session_id"]
+    bundle = client.get_json(f"/api/session/{session_id}/bundle")
+    exercise = bundle["exercises"][0]
+    program_id = client.get_json("/api/programs")[0]["id"]
+
+    routes = [
+        ("GET /api/programs", "GET", "/api/programs", None),
+        ("GET /api/program/<id>/days", "GET", f"/api/program/{program_id}/days", None),
+        ("GET /api/sessions/recent", "GET", "/api/sessions/recent", None),
+        ("GET /api/session/<id>/bundle", "GET", f"/api/session/{session_id}/bundle", None),
+        (
+            "GET /api/session/<id>/exercise/<id>",
+            "GET",
+            f"/api/session/{session_id}/exercise/{exercise['exercise_id']}",
+            None,
+        ),
+        (
+            "GET /api/exercise/<id>/progress",
+            "GET",
+            f"/api/exercise/{exercise['exercise_id']}/progress",
+            None,
+        ),
+        ("GET /api/stats", "GET", "/api/stats", None),
+    ]
+    if writes:
+        exercise_set = exercise["sets"][0]
+        routes.append(
+            (
+                "PUT /api/sets/<id>",
+                "PUT",
+                f"/api/sets/{exercise_set['id']}",
+                {"weight": exercise_set["weight"], "reps": exercise_set["reps"]},
+            )
+        )
+    return routes
+
+
+def _run_client(url, token, routes, offset, deadline, durations, errors):
+    client = Client(url, token)
+    try:
+        i = offset
+        while time.perf_counter() < deadline:
+            name, method, path, data = routes[i % len(routes)]
+            i += 1
+            started = time.perf_counter()
+            status, _ = client.request(method, path, data)
+            durations[name].append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors.append(f"{name} returned {status}")
+    finally:
+        client.close()
+
+
+def run(url, token, concurrency, duration, writes):
+    """Load tests the server at url and prints the results."""
+    client = Client(url, token)
+    try:
+        routes = get_routes(client, writes)
+    finally:
+        client.close()
+
+    durations = {name: [] for name, _, _, _ in routes}
+    errors = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        # Each client starts at a different route, so all routes run at once
+        threading.Thread(
+            target=_run_client,
+            args=(url, token, routes, offset, deadline, durations, errors),
+        )
+        for offset in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = sum(len(values) for values in durations.values())
+    all_durations = [value for values in durations.values() for value in values]
+    common.print_header(
+        f"{url}, {concurrency} clients for {duration:g}s: "
+        f"{total} requests, {total / duration:.0f} requests/s, {len(errors)} errors"
+    )
+    for name, values in durations.items():
+        if values:
+            common.print_row(name, values)
+    common.print_row("All routes", all_durations)
+    for error in sorted(set(errors)):
+        print(f"Error: {error}")
+
+
+def _get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(url, server):
+    parsed = urllib.parse.urlsplit(url)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with {server.returncode}")
+        try:
+            with socket.create_connection((parsed.hostname, parsed.port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The server did not answer on {url} in {SERVER_START_TIMEOUT}s")
+
+
+def compare_servers(concurrency, duration, writes):
+    """Runs the load test against Gunicorn and the Flask development server."""
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            DATABASE_PATH=os.path.join(directory, "database.sqlite"),
+            BACKUP_INTERVAL_HOURS="0",
+            # Requests without a token act as user 1, who has the most history
+            DEFAULT_USER_ID="1",
+        )
+        flask = [sys.executable, "-m", "flask", "--app", "backend.app"]
+        subprocess.run(flask + ["init-db"], env=env, check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(flask + ["seed-synthetic"], env=env, check=True)
+
+        port = _get_free_port()
+        servers = {
+            "Gunicorn": [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--config",
+                "python:backend.gunicorn_conf",
+                "--bind",
+                f"127.0.0.1:{port}",
+                "backend.app:create_app()",
+            ],
+            "the Flask development server": flask + ["run", "--port", str(port)],
+        }
+        url = f"http://127.0.0.1:{port}"
+        for name, command in servers.items():
+            print(f"\nStarting {name}...")
+            # The access logs of both servers would swamp the results
+            server = subprocess.Popen(
+                command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                _wait_for_server(url, server)
+                run(url, None, concurrency, duration, writes)
+            finally:
+                server.terminate()
+                server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /api/ routes over HTTP.")
+    parser.add_argument("--url", help="A running server. Defaults to comparing both servers.")
+    parser.add_argument("--token", help="API token of the user, see `flask user-token`.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run for.")
+    parser.add_argument("--writes", action="store_true", help="Include PUT /api/sets/<id>.")
+    args = parser.parse_args()
+
+    if args.url:
+        run(args.url.rstrip("/"), args.token, args.concurrency, args.duration, args.writes)
+    else:
+        compare_servers(args.concurrency, args.duration, args.writes)
+
+
+if __name__ == "__main__":
+    main()
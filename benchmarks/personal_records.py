@@ -0,0 +1,120 @@
+# benchmarks/personal_records.py
+# Keeping the PR index up to date incrementally against rebuilding it. Sets
+# are saved through personal_records.record_set_update, both the common case
+# of completing a set of the session being logged and an edit deep in the
+# history that replays its rep count, and rebuild_personal_records is timed
+# for one rep count, one user and every user. Each operation is rolled back,
+# so all of them run against the same history.
+#
+#   python -m benchmarks.personal_records [--years 3] [--updates 1000] [--rebuilds 20]
+import argparse
+import tempfile
+import time
+
+from benchmarks import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PR index.")
+    parser.add_argument("--years", type=float, default=3, help="Years of generated history.")
+    parser.add_argument("--updates", type=int, default=1000, help="Set updates per case.")
+    parser.add_argument("--rebuilds", type=int, default=20, help="Rebuilds per scope.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory, years=args.years)
+
+        from backend import personal_records
+        from backend.app import create_session_sets
+        from backend.database import get_db
+
+        with app.app_context():
+            db = get_db()
+            # A new session, as when a workout is being logged, and the PR
+            # sets of the oldest half of the history
+            day_id = db.execute(
+                "SELECT day_id FROM session WHERE user_id = 1 ORDER BY start_time DESC LIMIT 1"
+            ).fetchone()["day_id"]
+            session_id = db.execute(
+                "INSERT INTO session (day_id, user_id) VALUES (?, 1)", (day_id,)
+            ).lastrowid
+            latest_set_ids = [
+                created["id"]
+                for created in create_session_sets(session_id, day_id)
+                if created["set_type"] == "working"
+            ]
+            db.commit()
+            history_set_ids = [
+                row["id"]
+                for row in db.execute(
+                    """
+                    SELECT es.id
+                    FROM exercise_set es
+                    JOIN session s ON es.session_id = s.id
+                    WHERE s.user_id = 1 AND es.is_personal_record
+                    ORDER BY s.start_time
+                """
+                )
+            ]
+            history_set_ids = history_set_ids[: max(1, len(history_set_ids) // 2)]
+            key = tuple(
+                db.execute(
+                    "SELECT exercise_id, reps FROM personal_record WHERE user_id = 1 LIMIT 1"
+                ).fetchone()
+            )
+
+            def save_set(set_id, fields):
+                previous = personal_records.get_set_before_update(db, set_id, 1)
+                db.execute(
+                    "UPDATE exercise_set SET "
+                    + ", ".join(f"{field} = ?" for field in fields)
+                    + " WHERE id = ?",
+                    list(fields.values()) + [set_id],
+                )
+                personal_records.record_set_update(db, set_id, previous)
+
+            cases = [
+                (
+                    "Complete a set of a new session",
+                    args.updates,
+                    lambda i: save_set(
+                        latest_set_ids[i % len(latest_set_ids)],
+                        {"weight": 200 + i % 50, "reps": 5, "completed": True},
+                    ),
+                ),
+                (
+                    "Lower a PR set early in the history",
+                    args.updates,
+                    lambda i: save_set(history_set_ids[i % len(history_set_ids)], {"weight": 1}),
+                ),
+                (
+                    "Rebuild one user's rep count",
+                    args.rebuilds,
+                    lambda i: personal_records.rebuild_personal_records(db, 1, [key]),
+                ),
+                (
+                    "Rebuild one user",
+                    args.rebuilds,
+                    lambda i: personal_records.rebuild_personal_records(db, 1),
+                ),
+                (
+                    "Rebuild every user",
+                    args.rebuilds,
+                    lambda i: personal_records.rebuild_personal_records(db),
+                ),
+            ]
+            durations = {name: [] for name, _, _ in cases}
+            for name, count, run in cases:
+                for i in range(count):
+                    started = time.perf_counter()
+                    run(i)
+                    durations[name].append((time.perf_counter() - started) * 1000)
+                    db.rollback()
+
+        common.print_header("Updating the PR index")
+        for name, values in durations.items():
+            common.print_row(name, values)
+
+
+if __name__ == "__main__":
+    main()
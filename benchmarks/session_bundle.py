@@ -0,0 +1,101 @@
+# benchmarks/session_bundle.py
+# Time to render the data of a 10-exercise session. A day with 10 exercises
+# is created and a session started on it, then the requests an exercise page
+# needs are timed: the page with the session bundle inlined (one round trip,
+# as now), and the page followed by the two fetches exercise_detail.js made
+# before (GET /api/session/<id>/exercises and /exercise/<id>, sent together
+# after the page loaded, so a second round trip).
+#
+# The estimated time to render adds --rtt ms per round trip, e.g. a phone on
+# a mobile network, to the p50 server time of the requests.
+#
+#   python -m benchmarks.session_bundle [--exercises 10] [--requests 500] [--rtt 50]
+import argparse
+import tempfile
+import time
+
+from benchmarks import common
+
+
+def create_session(app, exercise_count):
+    """Creates a day with exercise_count exercises and starts a session on it."""
+    from backend.database import get_db
+
+    with app.app_context():
+        db = get_db()
+        exercise_ids = [
+            row["id"]
+            for row in db.execute("SELECT id FROM exercise ORDER BY id LIMIT ?", (exercise_count,))
+        ]
+        if len(exercise_ids) < exercise_count:
+            raise RuntimeError(f"Only {len(exercise_ids)} exercises in the database")
+        program_id = db.execute(
+            "INSERT INTO program (title, type, user_id) VALUES ('Bundle benchmark', 'Strength', 1)"
+        ).lastrowid
+        day_id = db.execute(
+            "INSERT INTO day (program_id, title) VALUES (?, 'Every exercise')", (program_id,)
+        ).lastrowid
+        db.executemany(
+            "INSERT INTO day_exercise (day_id, exercise_id, exercise_sequence) VALUES (?, ?, ?)",
+            [(day_id, exercise_id, sequence) for sequence, exercise_id in enumerate(exercise_ids, 1)],
+        )
+        db.commit()
+
+    response = common.client_for(app).post("/api/sessions", json={"day_id": day_id})
+    if response.status_code != 201:
+        raise RuntimeError(f"POST /api/sessions returned {response.status_code}")
+    return response.get_json()["session_id"], exercise_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rendering a session's data.")
+    parser.add_argument("--exercises", type=int, default=10, help="Exercises in the session.")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per route.")
+    parser.add_argument("--rtt", type=float, default=50, help="Round trip time in ms.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory)
+        session_id, exercise_ids = create_session(app, args.exercises)
+        client = common.client_for(app)
+
+        # The middle exercise, so navigation has both a previous and a next one
+        exercise_id = exercise_ids[len(exercise_ids) // 2]
+        routes = {
+            "Page, bundle inlined": f"/session/{session_id}/exercise/{exercise_id}",
+            "GET /api/session/<id>/bundle": f"/api/session/{session_id}/bundle",
+            "GET /api/session/<id>/exercises": f"/api/session/{session_id}/exercises",
+            "GET /api/session/<id>/exercise/<id>": (
+                f"/api/session/{session_id}/exercise/{exercise_id}"
+            ),
+        }
+        durations = {name: [] for name in routes}
+        for _ in range(args.requests):
+            for name, url in routes.items():
+                started = time.perf_counter()
+                response = client.get(url)
+                durations[name].append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} returned {response.status_code}")
+
+    common.print_header(f"Requests for a {args.exercises}-exercise session")
+    for name, values in durations.items():
+        common.print_row(name, values)
+
+    p50 = {name: common.percentile(values, 50) for name, values in durations.items()}
+    # The template alone, without building the bundle
+    page_without_data = max(0.0, p50["Page, bundle inlined"] - p50["GET /api/session/<id>/bundle"])
+    waterfall = (
+        page_without_data
+        + max(p50["GET /api/session/<id>/exercises"], p50["GET /api/session/<id>/exercise/<id>"])
+        + 2 * args.rtt
+    )
+    inlined = p50["Page, bundle inlined"] + args.rtt
+    print()
+    print(f"Estimated time to render with {args.rtt:g} ms round trips")
+    print(f"{'Page, then 2 fetches (before)':<44} 2 round trips {waterfall:>9.1f} ms")
+    print(f"{'Page, bundle inlined':<44} 1 round trip  {inlined:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
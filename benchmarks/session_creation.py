@@ -0,0 +1,110 @@
+# benchmarks/session_creation.py
+# Creates thousands of sessions against a populated history. The sets of
+# each session are created alternately by the per-set INSERT loop that
+# create_session used to run and by create_session_sets' single
+# INSERT ... SELECT, then whole POST /api/sessions requests (set creation
+# plus prefill) are timed.
+#
+#   python -m benchmarks.session_creation [--sessions 2000] [--requests 500] [--years 3]
+import argparse
+import tempfile
+import time
+
+from benchmarks import common
+
+
+def create_session_sets_per_row(db, session_id, day_id):
+    """
+    The loop create_session used before create_session_sets: one query per
+    exercise and one INSERT per set. Returns the same payload.
+    """
+    created_sets = []
+    day_exercises = db.execute(
+        "SELECT exercise_id FROM day_exercise WHERE day_id = ? ORDER BY exercise_sequence",
+        (day_id,),
+    ).fetchall()
+    for day_exercise in day_exercises:
+        exercise = db.execute(
+            "SELECT * FROM exercise WHERE id = ?", (day_exercise["exercise_id"],)
+        ).fetchone()
+        for set_type, set_count in (
+            ("warmup", exercise["warmup_sets"]),
+            ("working", exercise["working_sets"]),
+        ):
+            for set_number in range(1, (set_count or 0) + 1):
+                set_id = db.execute(
+                    """
+                    INSERT INTO exercise_set (session_id, exercise_id, set_number, set_type, weight, reps, completed)
+                    VALUES (?, ?, ?, ?, NULL, NULL, FALSE)
+                """,
+                    (session_id, exercise["id"], set_number, set_type),
+                ).lastrowid
+                created_sets.append(
+                    {
+                        "id": set_id,
+                        "exercise_id": exercise["id"],
+                        "set_type": set_type,
+                        "set_number": set_number,
+                    }
+                )
+    return created_sets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark creating sessions.")
+    parser.add_argument("--sessions", type=int, default=2000, help="Sessions per method.")
+    parser.add_argument("--requests", type=int, default=500, help="POST /api/sessions requests.")
+    parser.add_argument("--years", type=float, default=3, help="Years of generated history.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory, years=args.years)
+
+        from backend.app import create_session_sets
+        from backend.database import get_db
+
+        with app.app_context():
+            db = get_db()
+            day_ids = [
+                row["id"]
+                for row in db.execute(
+                    "SELECT DISTINCT day_id AS id FROM day_exercise ORDER BY day_id"
+                )
+            ]
+            methods = {
+                "per-set INSERT loop (before)": lambda session_id, day_id: (
+                    create_session_sets_per_row(db, session_id, day_id)
+                ),
+                "INSERT ... SELECT (create_session_sets)": create_session_sets,
+            }
+            durations = {name: [] for name in methods}
+            for i in range(args.sessions * len(methods)):
+                # Alternate the methods so both see the same history size
+                name = list(methods)[i % len(methods)]
+                day_id = day_ids[i % len(day_ids)]
+                started = time.perf_counter()
+                session_id = db.execute(
+                    "INSERT INTO session (day_id, user_id) VALUES (?, 1)", (day_id,)
+                ).lastrowid
+                methods[name](session_id, day_id)
+                db.commit()
+                durations[name].append((time.perf_counter() - started) * 1000)
+
+        common.print_header("Creating a session and its sets")
+        for name, values in durations.items():
+            common.print_row(name, values)
+
+        client = common.client_for(app)
+        request_durations = []
+        for i in range(args.requests):
+            started = time.perf_counter()
+            response = client.post("/api/sessions", json={"day_id": day_ids[i % len(day_ids)]})
+            request_durations.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 201:
+                raise RuntimeError(f"POST /api/sessions returned {response.status_code}")
+        common.print_header("Whole request, sets and prefill")
+        common.print_row("POST /api/sessions", request_durations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/set_updates.py
+# Saves every set of a session as N PUT /api/sets/<id> requests, one
+# transaction and commit each, and as one PATCH /api/sets request that
+# updates them all in a single transaction, once with the WAL journal and
+# once with the rollback (DELETE) journal, where every commit costs more.
+#
+#   python -m benchmarks.set_updates [--sets 20] [--rounds 200]
+#
+# Without --journal-mode both modes are run, each in its own process, since
+# the journal mode is read from DATABASE_JOURNAL_MODE when backend is imported.
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import common
+
+JOURNAL_MODES = ("WAL", "DELETE")
+
+
+def run(journal_mode, set_count, rounds):
+    with tempfile.TemporaryDirectory() as directory:
+        app = common.create_database(directory, DATABASE_JOURNAL_MODE=journal_mode)
+
+        from backend.database import query_db
+
+        with app.app_context():
+            set_ids = [
+                row["id"]
+                for row in query_db(
+                    """
+                    SELECT es.id
+                    FROM exercise_set es
+                    JOIN session s ON es.session_id = s.id
+                    WHERE s.user_id = 1 AND es.set_type = 'working'
+                    ORDER BY es.id DESC
+                    LIMIT ?
+                """,
+                    (set_count,),
+                )
+            ]
+
+        client = common.client_for(app)
+        durations = {"N x PUT /api/sets/<id>": [], "1 x PATCH /api/sets": []}
+        for i in range(rounds):
+            # Alternate the weights so every round really changes the sets
+            updates = [
+                {"id": set_id, "weight": 100 + i % 2, "reps": 5, "completed": True}
+                for set_id in set_ids
+            ]
+
+            started = time.perf_counter()
+            for update in updates:
+                response = client.put(f"/api/sets/{update['id']}", json=update)
+                if response.status_code != 200:
+                    raise RuntimeError(f"PUT /api/sets returned {response.status_code}")
+            durations["N x PUT /api/sets/<id>"].append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            response = client.patch("/api/sets", json=updates)
+            if response.status_code != 200:
+                raise RuntimeError(f"PATCH /api/sets returned {response.status_code}")
+            durations["1 x PATCH /api/sets"].append((time.perf_counter() - started) * 1000)
+
+        common.print_header(f"{journal_mode} journal, saving {len(set_ids)} sets, ms per round")
+        for name, values in durations.items():
+            common.print_row(name, values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark N set PUTs against one PATCH.")
+    parser.add_argument("--sets", type=int, default=20, help="Sets saved per round.")
+    parser.add_argument("--rounds", type=int, default=200, help="Rounds per method.")
+    parser.add_argument("--journal-mode", choices=JOURNAL_MODES, help="Defaults to both.")
+    args = parser.parse_args()
+
+    if args.journal_mode:
+        run(args.journal_mode, args.sets, args.rounds)
+        return
+    for journal_mode in JOURNAL_MODES:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.set_updates",
+                "--sets",
+                str(args.sets),
+                "--rounds",
+                str(args.rounds),
+                "--journal-mode",
+                journal_mode,
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,25 +2,24 @@
 
 # The DATABASE_PATH environment variable is set by docker-compose.yml
 # if running with Docker Compose, or defaults in database.py if running locally.
+#
+# SERVER selects how the app is served:
+#   gunicorn (default) - multi-worker production WSGI server, see backend/gunicorn_conf.py
+#   flask              - single process Flask development server
 
-# Ensure the directory for the database file exists
-# Extract the directory path from the DATABASE_PATH variable
-DATABASE_DIR=$(dirname "$DATABASE_PATH") # Get the directory part
+SERVER="${SERVER:-gunicorn}"
 
-echo "Checking for existing database at $DATABASE_PATH..."
-
-# Check if the database file exists
-if [ ! -f "$DATABASE_PATH" ]; then
-  echo "Database not found. Initializing database..."
-  # Create the database directory if it doesn't exist on the host (via bind mount)
-  mkdir -p "$DATABASE_DIR"
-  # Run the Flask initialization command
-  # The init_db function in database.py is also updated to create the directory
+if [ "$SERVER" = "flask" ]; then
+  # init-db creates the database if it is missing, otherwise it only applies
+  # pending migrations
+  echo "Checking database at $DATABASE_PATH..."
   flask --app backend.app init-db
-else
-  echo "Database found. Skipping initialization."
+
+  echo "Starting Flask development server..."
+  # Only the server runs the backup scheduler, not the init-db above
+  exec env BACKUP_SCHEDULER=1 flask --app backend.app run --host=0.0.0.0
 fi
 
-echo "Starting Flask application..."
-# The FLASK_APP and FLASK_ENV are set in the Dockerfile or environment
-exec flask --app backend.app run --host=0.0.0.0
+# Gunicorn's on_starting hook does the database check once in the master process
+echo "Starting Gunicorn..."
+exec gunicorn --config python:backend.gunicorn_conf 'backend.app:create_app()'
@@ -0,0 +1,74 @@
+# tests/conftest.py
+# Fixtures shared by the tests. Every test gets a new database in a
+# temporary DATABASE_PATH, created by init_db like a fresh install. backend
+# reads its settings from the environment when it is imported, so they are
+# set before the imports below.
+import os
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix="myfitnessapp-tests-")
+os.environ["DATABASE_PATH"] = os.path.join(_data_dir, "database.sqlite")
+os.environ["BACKUP_DIR"] = os.path.join(_data_dir, "backups")
+os.environ["BACKUP_INTERVAL_HOURS"] = "0"
+os.environ["OPENAI_API_KEY"] = ""  # Never call OpenAI, even with a .env file
+
+import pytest
+
+from backend import catalog, database, reference_cache, synthetic
+from backend.app import create_app
+
+
+def _remove_database():
+    # Pooled connections would keep using the deleted file
+    database.close_pool()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database.DATABASE + suffix):
+            os.remove(database.DATABASE + suffix)
+
+
+def _clear_caches():
+    reference_cache.invalidate()
+    catalog.invalidate()
+
+
+@pytest.fixture
+def app():
+    _remove_database()
+    app = create_app({"TESTING": True})
+    with app.app_context():
+        database.init_db()
+    _clear_caches()
+    yield app
+    _remove_database()
+
+
+@pytest.fixture
+def seeded_app(app):
+    """The app with a year of generated history for user 1."""
+    with app.app_context():
+        synthetic.seed_synthetic(database.get_db(), users=1, programs=2, years=1)
+    _clear_caches()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_log(monkeypatch):
+    """
+    Records the (sql, args) of every query_db call made by the routes in
+    backend.app, so tests can inspect the statements a request runs.
+    """
+    import backend.app
+
+    log = []
+
+    def logged_query_db(query, args=(), one=False):
+        log.append((query, args))
+        return database.query_db(query, args, one)
+
+    monkeypatch.setattr(backend.app, "query_db", logged_query_db)
+    return log
@@ -0,0 +1,56 @@
+# tests/test_assets.py
+# Bytes a phone downloads to load the home page (see assets.py). A cold load
+# fetches the page and its fingerprinted assets, compressed. A warm load
+# only fetches the page: the assets are immutable, so they are used from the
+# browser cache without a request, and revalidating one sends no body.
+import gzip
+import re
+
+ASSET_URL = re.compile(r"""/assets/[^"']+""")
+
+
+def get_asset_urls(page):
+    urls = ASSET_URL.findall(page.get_data(as_text=True))
+    assert urls
+    return urls
+
+
+def test_cold_load_downloads_compressed_assets(client):
+    page = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert page.status_code == 200
+
+    compressed_bytes = len(page.get_data())
+    raw_bytes = len(page.get_data())
+    for url in get_asset_urls(page):
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        raw = client.get(url).get_data()
+        if response.headers.get("Content-Encoding") == "gzip":
+            assert gzip.decompress(response.get_data()) == raw
+        compressed_bytes += len(response.get_data())
+        raw_bytes += len(raw)
+
+    assert compressed_bytes < raw_bytes / 2
+
+
+def test_warm_load_downloads_only_the_page(client):
+    page = client.get("/", headers={"Accept-Encoding": "gzip"})
+    cold_bytes = len(page.get_data())
+    warm_bytes = len(page.get_data())
+    for url in get_asset_urls(page):
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        cold_bytes += len(response.get_data())
+        cache_control = response.headers["Cache-Control"]
+        assert "immutable" in cache_control
+        assert "max-age=31536000" in cache_control
+
+        # Even a forced reload, which revalidates, downloads no body
+        revalidated = client.get(
+            url,
+            headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]},
+        )
+        assert revalidated.status_code == 304
+        warm_bytes += len(revalidated.get_data())
+
+    assert warm_bytes == len(page.get_data())
+    assert warm_bytes < cold_bytes
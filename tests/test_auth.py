@@ -0,0 +1,79 @@
+# tests/test_auth.py
+# Identifying the user of a request (see auth.py): tokens, the fallback for
+# requests without one, and the in-process user cache.
+import pytest
+
+from backend import auth, reference_cache
+from backend.database import get_db
+from tests.test_reference_cache import count_queries
+
+
+def issue_token(app, name):
+    with app.app_context():
+        db = get_db()
+        _, token = auth.issue_token(db, name)
+        db.commit()
+    return token
+
+
+def get_as(client, url, token=None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return client.get(url, headers=headers)
+
+
+def test_single_user_needs_no_token(client):
+    assert client.get("/api/sessions/recent").status_code == 200
+
+
+def test_second_user_requires_tokens(app, client):
+    token = issue_token(app, "Sam")
+    response = client.get("/api/sessions/recent")
+    assert response.status_code == 401
+
+    # Each user only sees their own sessions
+    dale_token = issue_token(app, "Dale")
+    session_id = client.post(
+        "/api/sessions", json={"day_id": 1}, headers={"Authorization": f"Bearer {dale_token}"}
+    ).get_json()["session_id"]
+    dale_sessions = get_as(client, "/api/sessions/recent", dale_token).get_json()
+    assert [session["session_id"] for session in dale_sessions] == [session_id]
+    assert get_as(client, "/api/sessions/recent", token).get_json() == []
+
+
+@pytest.mark.parametrize("default_user_id, status", [("1", 200), ("", 401)])
+def test_default_user_id(app, client, monkeypatch, default_user_id, status):
+    monkeypatch.setattr(auth, "DEFAULT_USER_ID", default_user_id)
+    if default_user_id:
+        issue_token(app, "Sam")  # Opted in, so even with a second user
+    assert client.get("/api/sessions/recent").status_code == status
+
+
+def test_cached_user_runs_no_queries(app, client, monkeypatch):
+    monkeypatch.setattr(reference_cache, "REFERENCE_CACHE_CHECK_INTERVAL", 3600)
+    token = issue_token(app, "Sam")
+    get_as(client, "/api/programs", token)
+
+    response = get_as(client, "/api/programs", token)
+    assert response.status_code == 200
+    assert count_queries(response) == 0
+
+
+def test_replaced_token_is_rejected(app, client, monkeypatch):
+    monkeypatch.setattr(reference_cache, "REFERENCE_CACHE_CHECK_INTERVAL", 3600)
+    token = issue_token(app, "Sam")
+    assert get_as(client, "/api/programs", token).status_code == 200
+
+    # Replaced in this process: the cache is dropped at once
+    new_token = issue_token(app, "Sam")
+    assert get_as(client, "/api/programs", token).status_code == 401
+    assert get_as(client, "/api/programs", new_token).status_code == 200
+
+    # Replaced by another process: the user trigger bumps
+    # reference_generation, seen at the next generation check
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE user SET token_hash = NULL WHERE name = 'Sam'")
+        db.commit()
+    assert get_as(client, "/api/programs", new_token).status_code == 200
+    monkeypatch.setattr(reference_cache, "REFERENCE_CACHE_CHECK_INTERVAL", 0)
+    assert get_as(client, "/api/programs", new_token).status_code == 401
@@ -0,0 +1,32 @@
+# tests/test_benchmark.py
+# `flask benchmark` writes through the API routes (see benchmark.py), so it
+# must only run on generated history and leave it exactly as it was.
+from backend import benchmark, synthetic
+from backend.database import get_db
+
+
+def dump(db):
+    return {
+        table: [tuple(row) for row in db.execute(f"SELECT * FROM {table} ORDER BY 1, 2")]
+        for table in ("session", "exercise_set", "personal_record") + benchmark.RESTORED_TABLES
+    }
+
+
+def test_benchmark_leaves_the_database_as_it_was(seeded_app):
+    with seeded_app.app_context():
+        db = get_db()
+        before = dump(db)
+        results = benchmark.run_benchmark(seeded_app, db, 1, iterations=2, warmup=0)
+        assert results["dataset"] == benchmark.get_dataset(db)
+        assert dump(db) == before
+
+
+def test_only_generated_history_is_benchmarked(app, seeded_app):
+    with app.app_context():
+        db = get_db()
+        assert synthetic.is_synthetic(db)
+
+        # A real workout, on a program of schema.sql
+        db.execute("INSERT INTO session (day_id, user_id) VALUES (1, 1)")
+        assert not synthetic.is_synthetic(db)
+        db.rollback()
@@ -0,0 +1,262 @@
+# tests/test_personal_records.py
+# The PR index is updated incrementally as sets are saved (see
+# personal_records.record_set_update). After any sequence of edits it must
+# hold exactly what rebuild_personal_records derives from the history.
+import json
+import random
+import uuid
+
+import pytest
+
+from backend import bulk_import, personal_records
+from backend.database import get_db
+
+EXERCISE_ID = 4  # The first exercise of day 1
+
+
+def start_sessions(app, count):
+    """Starts count sessions on day 1, a day apart, and returns their working set ids."""
+    client = app.test_client()
+    sessions = []
+    for day in range(count):
+        data = client.post("/api/sessions", json={"day_id": 1}).get_json()
+        with app.app_context():
+            db = get_db()
+            db.execute(
+                "UPDATE session SET start_time = datetime('2025-01-01', ?) WHERE id = ?",
+                (f"+{day} days", data["session_id"]),
+            )
+            db.commit()
+        sessions.append(
+            [
+                created["id"]
+                for created in data["session_sets_created_info"]
+                if created["exercise_id"] == EXERCISE_ID and created["set_type"] == "working"
+            ]
+        )
+    return sessions
+
+
+def save_set(client, method, set_id, **fields):
+    if method == "put":
+        response = client.put(f"/api/sets/{set_id}", json=fields)
+    elif method == "patch":
+        response = client.patch("/api/sets", json=[{"id": set_id, **fields}])
+    else:
+        response = client.post(
+            "/api/sync",
+            json={"mutations": [{"id": str(uuid.uuid4()), "set_id": set_id, **fields}]},
+        )
+    assert response.status_code == 200
+
+
+def get_index(app):
+    """The records and the flagged set ids."""
+    with app.app_context():
+        db = get_db()
+        records = [
+            tuple(row)
+            for row in db.execute(
+                """
+                SELECT user_id, exercise_id, reps, weight, set_id, session_id
+                FROM personal_record
+                ORDER BY user_id, exercise_id, reps
+            """
+            )
+        ]
+        flagged = [
+            row["id"]
+            for row in db.execute("SELECT id FROM exercise_set WHERE is_personal_record ORDER BY id")
+        ]
+    return records, flagged
+
+
+def assert_matches_rebuild(app):
+    incremental = get_index(app)
+    with app.app_context():
+        db = get_db()
+        personal_records.rebuild_personal_records(db)
+        db.commit()
+    assert incremental == get_index(app)
+
+
+@pytest.mark.parametrize("method", ["put", "patch", "sync"])
+def test_lowering_a_pr_clears_its_flag(app, method):
+    (first, *_), (later, *_) = start_sessions(app, 2)
+    client = app.test_client()
+    save_set(client, method, first, weight=100, reps=5, completed=True)
+    save_set(client, method, later, weight=110, reps=5, completed=True)
+    assert get_index(app)[1] == [later]
+
+    save_set(client, method, later, weight=80)
+    records, flagged = get_index(app)
+    assert flagged == []
+    assert [(record[3], record[4]) for record in records] == [(100, first)]
+    assert_matches_rebuild(app)
+
+
+@pytest.mark.parametrize("method", ["put", "patch", "sync"])
+def test_changing_the_reps_of_a_pr_clears_its_flag(app, method):
+    (first, *_), (later, *_) = start_sessions(app, 2)
+    client = app.test_client()
+    save_set(client, method, first, weight=100, reps=5, completed=True)
+    save_set(client, method, later, weight=110, reps=5, completed=True)
+
+    # The first set at 3 reps only establishes that record
+    save_set(client, method, later, reps=3)
+    records, flagged = get_index(app)
+    assert flagged == []
+    assert [(record[2], record[3], record[4]) for record in records] == [
+        (3, 110, later),
+        (5, 100, first),
+    ]
+    assert_matches_rebuild(app)
+
+
+def test_editing_history_updates_later_flags(app):
+    (first, *_), (middle, *_), (later, *_) = start_sessions(app, 3)
+    client = app.test_client()
+    save_set(client, "put", first, weight=100, reps=5, completed=True)
+    save_set(client, "put", later, weight=110, reps=5, completed=True)
+    assert get_index(app)[1] == [later]
+
+    # A heavier set logged afterwards for an earlier session beats the later one
+    save_set(client, "put", middle, weight=120, reps=5, completed=True)
+    assert get_index(app)[1] == [middle]
+    assert_matches_rebuild(app)
+
+    # Un-completing the first set makes the next one the first at 5 reps
+    save_set(client, "put", first, completed=False)
+    assert get_index(app)[1] == []
+    assert_matches_rebuild(app)
+
+
+def test_random_edits_match_rebuild(app):
+    sessions = start_sessions(app, 4)
+    set_ids = [set_id for session in sessions for set_id in session]
+    client = app.test_client()
+    rng = random.Random(7)
+    for _ in range(150):
+        fields = rng.choice(
+            [
+                {"weight": rng.choice([80, 90, 100, 110, 120])},
+                {"reps": rng.choice([3, 5])},
+                {"completed": rng.random() < 0.8},
+                {"weight": rng.choice([100, 110]), "reps": 5, "completed": True},
+            ]
+        )
+        save_set(client, rng.choice(["put", "patch", "sync"]), rng.choice(set_ids), **fields)
+        assert_matches_rebuild(app)
+
+
+def test_import_replays_the_imported_records(app):
+    (first, *_), (later, *_) = start_sessions(app, 2)
+    client = app.test_client()
+    save_set(client, "put", first, weight=100, reps=5, completed=True)
+    save_set(client, "put", later, weight=105, reps=5, completed=True)
+    assert get_index(app)[1] == [later]
+
+    # A heavier set from before the app was used: 105 no longer beats anything
+    with app.app_context():
+        db = get_db()
+        exercise_title = db.execute(
+            "SELECT title FROM exercise WHERE id = ?", (EXERCISE_ID,)
+        ).fetchone()["title"]
+        stats = bulk_import.import_records(
+            db,
+            1,
+            [
+                (
+                    1,
+                    {
+                        "session_start_time": "2024-06-01 08:00:00",
+                        "program_title": "Rough 5x5",
+                        "day_title": "Day A",
+                        "exercise_title": exercise_title,
+                        "set_number": 1,
+                        "weight": 110,
+                        "reps": 5,
+                    },
+                )
+            ],
+        )
+    assert stats["inserted"] == 1
+    records, flagged = get_index(app)
+    assert flagged == []
+    assert [record[3] for record in records] == [110]
+    assert_matches_rebuild(app)
+
+
+def post_import(client, records):
+    body = "\n".join(json.dumps(record) for record in records)
+    return client.post(
+        "/api/import?format=jsonl", data=body, content_type="application/x-ndjson"
+    )
+
+
+def import_record(app, **fields):
+    """A record of a set of the first exercise of day 1, with fields replaced."""
+    with app.app_context():
+        exercise_title = get_db().execute(
+            "SELECT title FROM exercise WHERE id = ?", (EXERCISE_ID,)
+        ).fetchone()["title"]
+    record = {
+        "session_start_time": "2024-06-01 08:00:00",
+        "program_title": "Rough 5x5",
+        "day_title": "Day A",
+        "exercise_title": exercise_title,
+        "set_number": 1,
+        "weight": 100,
+        "reps": 5,
+    }
+    record.update(fields)
+    return record
+
+
+def test_malformed_import_records_are_skipped(app, client):
+    response = post_import(
+        client,
+        [
+            import_record(app, day_title=None, day_id="abc"),
+            import_record(app, day_title=7),
+            import_record(app, exercise_title=5),
+            import_record(app, set_type="bogus"),
+            import_record(app, set_type=[1]),
+            import_record(app),
+        ],
+    )
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert (stats["inserted"], stats["failed"]) == (1, 5)
+    assert [error["line"] for error in stats["errors"]] == [1, 2, 3, 4, 5]
+    with app.app_context():
+        set_types = [
+            row["set_type"] for row in get_db().execute("SELECT DISTINCT set_type FROM exercise_set")
+        ]
+    assert set(set_types) <= {"warmup", "working"}
+
+
+def test_import_database_error_reports_committed_batches(app, client, monkeypatch):
+    monkeypatch.setattr(bulk_import, "IMPORT_BATCH_SIZE", 1)
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            """
+            CREATE TRIGGER reject_weight BEFORE INSERT ON exercise_set
+            WHEN NEW.weight = 999
+            BEGIN
+                SELECT RAISE(ABORT, 'rejected weight');
+            END
+        """
+        )
+        db.commit()
+
+    response = post_import(
+        client, [import_record(app), import_record(app, set_number=2, weight=999)]
+    )
+    assert response.status_code == 500
+    data = response.get_json()
+    assert data["error"] == "Database error importing history"
+    assert data["stats"]["inserted"] == 1
+    records, _ = get_index(app)
+    assert [record[3] for record in records] == [100]
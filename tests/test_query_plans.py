@@ -0,0 +1,118 @@
+# tests/test_query_plans.py
+# Query plans of the hot path queries (see migrations/0001_hot_path_indexes.sql
+# and 0008_multi_user.sql). The statements are captured from real requests
+# and explained against a database with generated history, so a query or
+# migration change that drops an index shows up here instead of as a slow
+# full scan once the history has grown.
+from backend import openai_service
+from backend.database import get_db, query_db
+
+# Tables, and the aliases the queries give them, that must never be scanned
+HISTORY_TABLES = {"exercise_set", "es", "session", "s", "session_summary", "day_exercise", "de"}
+
+
+def explain(sql, args):
+    return [row["detail"] for row in get_db().execute("EXPLAIN QUERY PLAN " + sql, args)]
+
+
+def find_statement(query_log, text):
+    """The (sql, args) of the only logged statement containing text."""
+    matches = [(sql, args) for sql, args in query_log if text in sql]
+    assert len(matches) == 1, f"{len(matches)} statements contain {text!r}"
+    return matches[0]
+
+
+def assert_no_full_scans(plan):
+    scanned = {detail.split()[1] for detail in plan if detail.startswith("SCAN ")}
+    assert not scanned & HISTORY_TABLES, plan
+
+
+def get_latest_session(app):
+    with app.app_context():
+        session = query_db(
+            "SELECT id, day_id FROM session WHERE user_id = 1 ORDER BY start_time DESC LIMIT 1",
+            one=True,
+        )
+        exercise_set = query_db(
+            "SELECT exercise_id FROM exercise_set WHERE session_id = ? LIMIT 1",
+            (session["id"],),
+            one=True,
+        )
+    return session["id"], session["day_id"], exercise_set["exercise_id"]
+
+
+def test_prefill_reads_history_by_exercise(seeded_app, query_log):
+    _, day_id, _ = get_latest_session(seeded_app)
+    response = seeded_app.test_client().post("/api/sessions", json={"day_id": day_id})
+    assert response.status_code == 201
+
+    with seeded_app.app_context():
+        plan = explain(*find_statement(query_log, "DENSE_RANK()"))
+    assert any(
+        detail.startswith("SEARCH es USING INDEX idx_exercise_set_exercise_session")
+        for detail in plan
+    ), plan
+    assert "SEARCH s USING INTEGER PRIMARY KEY (rowid=?)" in plan
+    assert_no_full_scans(plan)
+
+
+def test_session_exercise_sets_use_session_index(seeded_app, query_log):
+    session_id, _, exercise_id = get_latest_session(seeded_app)
+    response = seeded_app.test_client().get(
+        f"/api/session/{session_id}/exercise/{exercise_id}"
+    )
+    assert response.status_code == 200
+
+    with seeded_app.app_context():
+        plan = explain(*find_statement(query_log, "FROM exercise_set"))
+    assert plan == [
+        "SEARCH exercise_set USING INDEX idx_exercise_set_session_exercise "
+        "(session_id=? AND exercise_id=?)"
+    ]
+
+
+def test_ai_history_selects_sessions_by_start_time(seeded_app):
+    session_id, _, _ = get_latest_session(seeded_app)
+    statements = []
+
+    def logged_query_db(query, args=()):
+        statements.append((query, args))
+        return query_db(query, args)
+
+    with seeded_app.app_context():
+        assert openai_service.get_working_set_history(session_id, logged_query_db)
+        (statement,) = statements
+        plan = explain(*statement)
+    assert any(
+        detail.startswith("SEARCH s USING COVERING INDEX idx_session_user_start_time")
+        for detail in plan
+    ), plan
+    assert any(
+        detail.startswith("SEARCH es USING INDEX idx_exercise_set_session_exercise")
+        for detail in plan
+    ), plan
+    assert_no_full_scans(plan)
+
+
+def test_recent_sessions_read_in_index_order(seeded_app, query_log):
+    client = seeded_app.test_client()
+    first_page = client.get("/api/sessions/recent?limit=5")
+    assert first_page.status_code == 200
+    # The Link header holds the before cursor of the next page
+    next_url = first_page.headers["Link"].split(">")[0].lstrip("<")
+    assert client.get(next_url).status_code == 200
+
+    statements = [(sql, args) for sql, args in query_log if "FROM session_summary" in sql]
+    assert len(statements) == 2
+    with seeded_app.app_context():
+        for statement in statements:
+            plan = explain(*statement)
+            assert any(
+                detail.startswith(
+                    "SEARCH session_summary USING INDEX idx_session_summary_user_start_time"
+                )
+                for detail in plan
+            ), plan
+            # The index already returns the rows newest first
+            assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+            assert_no_full_scans(plan)
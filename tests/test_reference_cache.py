@@ -0,0 +1,67 @@
+# tests/test_reference_cache.py
+# Reference data and exercise searches are served from in-process caches
+# (see reference_cache.py and catalog.py). The statements a request ran are
+# counted from its Server-Timing header (see instrumentation.py), so these
+# tests show that cache hits and revalidations don't query the database,
+# including for the user (see auth.py).
+import re
+
+import pytest
+
+from backend import reference_cache
+from backend.database import get_db
+
+
+def count_queries(response):
+    return int(re.search(r'desc="(\d+) queries"', response.headers["Server-Timing"]).group(1))
+
+
+@pytest.fixture(autouse=True)
+def no_generation_checks(monkeypatch):
+    """Checks reference_generation once, so only the cache decides what is queried."""
+    monkeypatch.setattr(reference_cache, "REFERENCE_CACHE_CHECK_INTERVAL", 3600)
+
+
+@pytest.mark.parametrize(
+    "url", ["/api/programs", "/api/program/1/days", "/api/exercises/search?q=ben"]
+)
+def test_cache_hit_runs_no_reference_queries(seeded_app, url):
+    client = seeded_app.test_client()
+    miss = client.get(url)
+    assert miss.status_code == 200
+
+    hit = client.get(url)
+    assert hit.status_code == 200
+    assert hit.get_data() == miss.get_data()
+    # The user of auth.load_user comes from its cache too
+    assert count_queries(hit) == 0
+    assert count_queries(miss) > count_queries(hit)
+
+
+def test_revalidation_is_answered_from_the_cache(seeded_app):
+    client = seeded_app.test_client()
+    etag = client.get("/api/programs").headers["ETag"]
+
+    response = client.get("/api/programs", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert count_queries(response) == 0
+
+
+def test_reference_change_is_picked_up(seeded_app, monkeypatch):
+    client = seeded_app.test_client()
+    etag = client.get("/api/programs").headers["ETag"]
+
+    # Written outside the app, e.g. by another worker: the program trigger
+    # bumps reference_generation, seen at the next generation check
+    with seeded_app.app_context():
+        db = get_db()
+        db.execute(
+            "INSERT INTO program (title, type, user_id) VALUES ('Cached program', 'Strength', 1)"
+        )
+        db.commit()
+    monkeypatch.setattr(reference_cache, "REFERENCE_CACHE_CHECK_INTERVAL", 0)
+
+    response = client.get("/api/programs", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Cached program" in [program["title"] for program in response.get_json()]
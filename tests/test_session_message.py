@@ -0,0 +1,101 @@
+# tests/test_session_message.py
+# Completed-session messages are generated in a background thread (see
+# message_worker.py). A stub chat client stands in for OpenAI through the
+# OPENAI_CHAT_CLIENT setting, so failures can be produced on demand.
+import time
+from types import SimpleNamespace
+
+from backend import message_worker
+from backend.database import query_db
+
+
+class StubChatClient:
+    """Implements chat.completions.create, returning content or raising error."""
+
+    def __init__(self, content=None, error=None):
+        self.content = content
+        self.error = error
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))]
+        )
+
+
+def get_latest_session_id(app):
+    with app.app_context():
+        return query_db(
+            "SELECT id FROM session WHERE user_id = 1 ORDER BY start_time DESC LIMIT 1",
+            one=True,
+        )["id"]
+
+
+def wait_for_message(app, session_id, timeout=10):
+    """Waits for the background thread and returns the session_message row."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with app.app_context():
+            session_message = message_worker.get_session_message(session_id)
+        if session_message is not None and session_message["status"] != "pending":
+            return session_message
+        time.sleep(0.02)
+    raise AssertionError(f"The message of session {session_id} is still pending")
+
+
+def test_generated_message_is_stored_as_ready(seeded_app):
+    seeded_app.config["OPENAI_CHAT_CLIENT"] = StubChatClient(content="Strong session!")
+    session_id = get_latest_session_id(seeded_app)
+    client = seeded_app.test_client()
+    url = f"/api/session/{session_id}/completed-message"
+
+    assert client.get(url).status_code == 202
+    assert wait_for_message(seeded_app, session_id)["status"] == "ready"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json()["message"] == "Strong session!"
+
+
+def test_failed_message_is_retried(seeded_app, monkeypatch):
+    chat_client = StubChatClient(error=ConnectionError("Connection refused"))
+    seeded_app.config["OPENAI_CHAT_CLIENT"] = chat_client
+    session_id = get_latest_session_id(seeded_app)
+    client = seeded_app.test_client()
+    url = f"/api/session/{session_id}/completed-message"
+
+    assert client.get(url).status_code == 202
+    session_message = wait_for_message(seeded_app, session_id)
+    # The fallback is not stored, only the failure
+    assert session_message["status"] == "failed"
+    assert session_message["message"] is None
+
+    # Within the retry interval the fallback is shown and nothing is queued
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "failed"
+    assert response.get_json()["message"] == message_worker.FALLBACK_MESSAGE
+    assert chat_client.calls == 1
+
+    # Once it has passed the message is generated again
+    monkeypatch.setattr(message_worker, "MESSAGE_RETRY_INTERVAL", 0)
+    chat_client.error = None
+    chat_client.content = "Back on track!"
+    assert client.get(url).status_code == 202
+    assert wait_for_message(seeded_app, session_id)["status"] == "ready"
+    assert client.get(url).get_json()["message"] == "Back on track!"
+    assert chat_client.calls == 2
+
+
+def test_empty_response_is_a_failure(seeded_app):
+    seeded_app.config["OPENAI_CHAT_CLIENT"] = StubChatClient(content="  ")
+    session_id = get_latest_session_id(seeded_app)
+
+    assert seeded_app.test_client().get(
+        f"/api/session/{session_id}/completed-message"
+    ).status_code == 202
+    assert wait_for_message(seeded_app, session_id)["status"] == "failed"